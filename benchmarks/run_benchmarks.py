@@ -0,0 +1,226 @@
+"""
+Throughput benchmarks of the engine and the training loop.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --baseline results.json --threshold 10
+
+Every metric is a rate (higher is better). With --baseline the run fails (exit code 1)
+when a metric is more than --threshold percent below the baseline value.
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import numpy as np
+import torch
+from game.GameState_class import GameState
+from helper_functions.helper_functions import simulate_action, get_valid_actions, encode_board_state, evaluate_board_state
+from ml.MultiAgentAzulEnv_class import MultiAgentAzulEnv
+from ml.AzulAgent_class import AzulAgent
+from ml.RandomAgent_class import RandomAgent
+from ml.ReplayBuffer_class import ReplayBuffer
+
+DEFAULT_SEED = 1234
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def benchmark_engine(num_games, seed):
+    """
+    Play random games on a GameState, timing each engine stage separately:
+    simulate_action (moves/s), get_valid_actions, encode_board_state and
+    evaluate_board_state (calls/s).
+    """
+    seed_everything(seed)
+    game_state = GameState(seed=seed)
+    timers = {"simulate_action": 0.0, "get_valid_actions": 0.0, "encode_board_state": 0.0, "evaluate_board_state": 0.0}
+    moves = 0
+
+    for _ in range(num_games):
+        game_state.reset()
+        player_idx = 0
+        while not game_state.is_game_over():
+            start = time.perf_counter()
+            actions = get_valid_actions(game_state, player_idx)
+            timers["get_valid_actions"] += time.perf_counter() - start
+
+            action = random.choice([action for action in actions if action is not None])
+
+            start = time.perf_counter()
+            simulate_action(game_state, player_idx, *action)
+            timers["simulate_action"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            encode_board_state(game_state)
+            timers["encode_board_state"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            evaluate_board_state(game_state, player_idx)
+            timers["evaluate_board_state"] += time.perf_counter() - start
+
+            moves += 1
+            player_idx = (player_idx + 1) % game_state.num_players
+
+    return {
+        "simulate_action_moves_per_s": moves / timers["simulate_action"],
+        "get_valid_actions_calls_per_s": moves / timers["get_valid_actions"],
+        "encode_board_state_calls_per_s": moves / timers["encode_board_state"],
+        "evaluate_board_state_calls_per_s": moves / timers["evaluate_board_state"],
+    }
+
+
+def benchmark_play_game(num_games, seed):
+    """
+    Full MultiAgentAzulEnv.play_game games per second with random agents.
+    """
+    seed_everything(seed)
+    env = MultiAgentAzulEnv(GameState().num_players, seed=seed)
+    env.set_agents([RandomAgent(seed + seat) for seat in range(env.num_players)])
+    start = time.perf_counter()
+    for _ in range(num_games):
+        env.play_game()
+    return {"play_game_games_per_s": num_games / (time.perf_counter() - start)}
+
+
+def benchmark_agent_update(num_updates, seed, batch_size=64):
+    """
+    AzulAgent.update calls per second with a replay buffer (one minibatch update every
+    train_every calls), and AzulAgent.update_batch minibatch steps per second.
+    """
+    seed_everything(seed)
+    game_state = GameState()
+    input_dim = game_state.max_board_size
+    action_dim = game_state.get_action_space_mapper().total_actions
+    rng = np.random.default_rng(seed)
+
+    agent = AzulAgent(input_dim, action_dim, replay_buffer=ReplayBuffer(10_000, input_dim, action_dim, seed=seed), batch_size=batch_size)
+    states = rng.integers(0, 5, size=(num_updates + 1, input_dim)).astype(np.float32)
+    actions = rng.integers(1, action_dim, size=num_updates)
+    rewards = rng.normal(size=num_updates)
+    masks = rng.random((num_updates, action_dim)) < 0.2
+
+    start = time.perf_counter()
+    for step in range(num_updates):
+        agent.update(states[step], int(actions[step]), float(rewards[step]), states[step + 1], False, masks[step])
+    update_rate = num_updates / (time.perf_counter() - start)
+
+    num_batches = max(1, num_updates // agent.train_every)
+    batches = [agent.replay_buffer.sample(batch_size) for _ in range(num_batches)]
+    start = time.perf_counter()
+    for batch in batches:
+        agent.update_batch(batch)
+    batch_rate = num_batches / (time.perf_counter() - start)
+
+    return {"agent_update_steps_per_s": update_rate, "agent_update_batch_steps_per_s": batch_rate}
+
+
+BENCHMARKS = {
+    "engine": (benchmark_engine, {"num_games": 20}, {"num_games": 4}),
+    "play_game": (benchmark_play_game, {"num_games": 20}, {"num_games": 4}),
+    "agent_update": (benchmark_agent_update, {"num_updates": 4000}, {"num_updates": 800}),
+}
+
+
+def run_benchmarks(names=None, repeats=3, seed=DEFAULT_SEED, quick=False):
+    """
+    Run the benchmarks (all by default) `repeats` times each with the same seed and keep
+    the median of every metric. Returns the results dict written by --output.
+    """
+    metrics = {}
+    benchmark_metrics = {}
+    for name in names or BENCHMARKS:
+        benchmark, full_kwargs, quick_kwargs = BENCHMARKS[name]
+        kwargs = quick_kwargs if quick else full_kwargs
+        runs = []
+        for _ in range(repeats):
+            runs.append(benchmark(seed=seed, **kwargs))
+        benchmark_metrics[name] = list(runs[0])
+        for metric in runs[0]:
+            metrics[metric] = statistics.median(run[metric] for run in runs)
+            print(f"{metric:<36}{metrics[metric]:>14.1f}")
+
+    return {
+        "metadata": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "seed": seed,
+            "repeats": repeats,
+            "quick": quick,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "metrics": metrics,
+        "benchmarks": benchmark_metrics,  # Metrics of each benchmark, to compare a subset run
+    }
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Print each metric against the baseline. Returns the metrics that dropped by more
+    than `threshold` percent or are missing from the results.
+    """
+    regressions = []
+    print(f"\n{'metric':<36}{'baseline':>14}{'current':>14}{'change':>10}")
+    for metric, baseline_value in baseline["metrics"].items():
+        value = results["metrics"].get(metric)
+        if value is None:
+            regressions.append(metric)
+            print(f"{metric:<36}{baseline_value:>14.1f}{'missing':>14}{'':>10}  REGRESSION")
+            continue
+        change = (value - baseline_value) / baseline_value * 100
+        flag = ""
+        if change < -threshold:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:<36}{baseline_value:>14.1f}{value:>14.1f}{change:>9.1f}%{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Azul engine and training throughput benchmarks.")
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--baseline", help="Compare against a results JSON written by an earlier run.")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed drop per metric in percent (default 10).")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), help="Subset of benchmarks to run.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per benchmark, the median is reported.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--quick", action="store_true", help="Smaller workloads, for a fast smoke run.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.benchmarks, repeats=args.repeats, seed=args.seed, quick=args.quick)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if args.benchmarks and "benchmarks" in baseline:  # Compare only the benchmarks that ran
+            selected = {metric for name in args.benchmarks for metric in baseline["benchmarks"].get(name, [])}
+            baseline["metrics"] = {
+                metric: value for metric, value in baseline["metrics"].items() if metric in selected
+            }
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) missing or regressed by more than {args.threshold}%: "
+                  f"{', '.join(regressions)}")
+            return 1
+        print(f"\nNo metric regressed by more than {args.threshold}%.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
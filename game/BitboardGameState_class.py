@@ -0,0 +1,456 @@
+import random
+from game.Ruleset_class import load_ruleset
+
+class BitboardGameState:
+    """
+    Integer-backed alternative to GameState for high-throughput self-play.
+
+    Each wall is a single bitmask (bit row * wall_size + column), pattern lines are
+    stored as a color id and a fill count, and floor lines as a tile count. Factories,
+    the center pool and the discard pile are per-color count vectors. Tile colors are
+    integer ids in the order of `tile_colors`; actions still use color names so that
+    the ActionSpaceMapper can be shared with GameState.
+
+    Like GameState, each instance draws tiles from its own generator, see reset.
+    """
+    def __init__(self, settings_path=None, seed=None):
+        self.ruleset = load_ruleset(settings_path)
+        self.settings = self.ruleset.settings
+
+        self.num_players = self.ruleset.num_players
+        self.num_factories = self.ruleset.num_factories
+        self.tile_colors = list(self.ruleset.tile_colors)
+        self.pattern_line_size = self.ruleset.pattern_line_size
+        self.num_colors = self.ruleset.num_colors
+
+        self.tile_color_mapping = self.ruleset.tile_color_mapping
+        self.action_space_mapper = self.ruleset.action_space_mapper
+
+        # Precompute the wall lookup tables
+        self.wall_size = self.ruleset.wall_size
+        self.wall_column = self.ruleset.wall_column  # wall_column[row][color_id] -> column of that color in the row
+        size = self.wall_size
+        self.row_masks = [((1 << size) - 1) << (row * size) for row in range(size)]
+        self.column_masks = [sum(1 << (row * size + col) for row in range(size)) for col in range(size)]
+        self.color_masks = [
+            sum(1 << (row * size + self.wall_column[row][color_id]) for row in range(size))
+            for color_id in range(self.num_colors)
+        ]
+        self.line_wall_bits = [
+            [1 << (row * size + self.wall_column[row][color_id]) for row in range(self.pattern_line_size)]
+            for color_id in range(self.num_colors)
+        ]  # line_wall_bits[color_id][row] -> wall bit that color occupies in the row
+
+        # Action index tables: action_indices[source][color][open line mask] lists the
+        # indices reachable through the open lines, index_to_move decodes an index
+        num_lines = self.pattern_line_size + 1
+        self.index_to_move = [None] * self.action_space_mapper.total_actions
+        self.action_indices = []
+        for source_idx in range(self.num_factories + 1):
+            source = "center" if source_idx == self.num_factories else source_idx
+            color_tables = []
+            for color_id, color in enumerate(self.tile_colors):
+                line_indices = []
+                for line_idx in range(num_lines):
+                    line = "floor" if line_idx == self.pattern_line_size else line_idx
+                    index = self.action_space_mapper.action_to_index((source, color, line))
+                    self.index_to_move[index] = (source_idx, color_id, line_idx)
+                    line_indices.append(index)
+                color_tables.append([
+                    tuple(index for line_idx, index in enumerate(line_indices) if mask >> line_idx & 1)
+                    for mask in range(1 << num_lines)
+                ])
+            self.action_indices.append(color_tables)
+
+        self.floor_penalties = self.ruleset.floor_penalties
+        self.floor_penalty_totals = self.ruleset.floor_penalty_totals
+
+        self.color_ids_in_mask = [
+            tuple(color_id for color_id in range(self.num_colors) if mask >> color_id & 1)
+            for mask in range(1 << self.num_colors)
+        ]
+
+        # Initialize factories, center pool, and player boards
+        self.factories = [[0] * self.num_colors for _ in range(self.num_factories)]
+        self.center_pool = [0] * self.num_colors
+        self.source_colors = [0] * (self.num_factories + 1)  # Bitmask of colors present per factory, center last
+        self.walls = [0] * self.num_players
+        self.line_colors = [[-1] * self.pattern_line_size for _ in range(self.num_players)]
+        self.line_fills = [[0] * self.pattern_line_size for _ in range(self.num_players)]
+        self.floor_counts = [0] * self.num_players
+        self.scores = [0] * self.num_players
+        self.completed_row = False
+        self.open_lines = [self.calculate_open_lines(player_idx) for player_idx in range(self.num_players)]
+
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.round_number = 1
+        self.bag = self.initialize_bag()
+        self.discard_pile = [0] * self.num_colors
+
+    def __str__(self):
+        """
+        Converts the game state to a human-readable string format.
+        """
+        colors = self.tile_colors
+        game_state_str = f"Round {self.round_number}\n"
+        game_state_str += f"Possible Tile Colors: {colors}\n"
+        game_state_str += f"Factories: \n"
+        for idx, factory in enumerate(self.factories):
+            game_state_str += f"  Factory {idx + 1}: {self.counts_to_tiles(factory)}\n"
+        game_state_str += f"Center Pool: {self.counts_to_tiles(self.center_pool)}\n"
+
+        for player_idx in range(self.num_players):
+            pattern_lines = [
+                [colors[color_id]] * fill if color_id >= 0 else []
+                for color_id, fill in zip(self.line_colors[player_idx], self.line_fills[player_idx])
+            ]
+            game_state_str += f"Player {player_idx + 1} Board:\n"
+            game_state_str += f"  Pattern Lines: {pattern_lines}\n"
+            game_state_str += f"  Wall: \n"
+            for row in self.wall_rows(player_idx):
+                game_state_str += f"    {row}\n"
+            game_state_str += f"  Floor Line: {self.floor_counts[player_idx]} tiles\n"
+            game_state_str += f"  Score: {self.scores[player_idx]}\n"
+
+        game_state_str += f"Discard Pile: {self.counts_to_tiles(self.discard_pile)}\n"
+        game_state_str += f"Tiles in Bag: {[colors[color_id] for color_id in self.bag]}\n"
+        return game_state_str
+
+    def counts_to_tiles(self, counts):
+        """
+        Expand a per-color count vector into a list of color names.
+        """
+        tiles = []
+        for color_id, count in enumerate(counts):
+            tiles.extend([self.tile_colors[color_id]] * count)
+        return tiles
+
+    def wall_rows(self, player_idx):
+        """
+        Decode a player's wall bitmask into rows of color names (None for empty spots),
+        matching the layout of GameState walls.
+        """
+        wall = self.walls[player_idx]
+        size = self.wall_size
+        pattern = self.ruleset.wall_pattern
+        return [
+            [pattern[row][col] if wall >> (row * size + col) & 1 else None for col in range(size)]
+            for row in range(size)
+        ]
+
+    def initialize_bag(self):
+        """
+        Initialize the tile bag with 20 tiles of each color id, shuffled.
+        """
+        tile_bag = []
+        for color_id in range(self.num_colors):
+            tile_bag.extend([color_id] * 20)
+        self.rng.shuffle(tile_bag)
+        return tile_bag
+
+    def refill_bag(self):
+        """
+        Move the discard pile back into the bag and shuffle it.
+        """
+        if not any(self.discard_pile):
+            raise ValueError(f"Both bag and discad pile are empty, cannot draw tiles. Game state: {self.__str__()}")
+        self.bag = []
+        for color_id, count in enumerate(self.discard_pile):
+            self.bag.extend([color_id] * count)
+        self.discard_pile = [0] * self.num_colors
+        self.rng.shuffle(self.bag)
+
+    def refill_factories(self):
+        """
+        Refill the factories at the start of a new round.
+        Raise an error if any factory is non-empty.
+        """
+        bag = self.bag
+        for factory_idx, factory in enumerate(self.factories):
+            if any(factory):
+                raise AssertionError("Cannot refill a non-empty factory.")
+            present = 0
+            for _ in range(4):  # Each factory gets 4 tiles
+                if not bag:
+                    self.refill_bag()
+                    bag = self.bag
+                color_id = bag.pop()
+                factory[color_id] += 1
+                present |= 1 << color_id
+            self.source_colors[factory_idx] = present
+
+    def reset(self, seed=None):
+        """
+        Start a new game. See GameState.reset for the seed.
+        """
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        self.seed = seed
+        self.rng.seed(seed)
+        self.round_number = 1
+        self.bag = self.initialize_bag()
+        self.discard_pile = [0] * self.num_colors
+        self.factories = [[0] * self.num_colors for _ in range(self.num_factories)]
+        self.center_pool = [0] * self.num_colors
+        self.source_colors = [0] * (self.num_factories + 1)
+        self.walls = [0] * self.num_players
+        self.line_colors = [[-1] * self.pattern_line_size for _ in range(self.num_players)]
+        self.line_fills = [[0] * self.pattern_line_size for _ in range(self.num_players)]
+        self.floor_counts = [0] * self.num_players
+        self.scores = [0] * self.num_players
+        self.completed_row = False
+        self.open_lines = [self.calculate_open_lines(player_idx) for player_idx in range(self.num_players)]
+        self.refill_factories()
+
+    def is_round_over(self):
+        """
+        Check if the round is over, i.e., all factories and the center pool are empty.
+        """
+        return not any(self.source_colors)
+
+    def calculate_open_lines(self, player_idx):
+        """
+        For each color id, return a bitmask of the pattern lines (bit pattern_line_size
+        for the floor) that can currently take that color.
+        """
+        wall = self.walls[player_idx]
+        line_colors = self.line_colors[player_idx]
+        line_fills = self.line_fills[player_idx]
+        floor_bit = 1 << self.pattern_line_size
+        masks = []
+        for color_id, wall_bits in enumerate(self.line_wall_bits):
+            mask = floor_bit
+            for line_idx, line_color in enumerate(line_colors):
+                if (line_color == -1 or (line_color == color_id and line_fills[line_idx] <= line_idx)) and not wall & wall_bits[line_idx]:
+                    mask |= 1 << line_idx
+            masks.append(mask)
+        return masks
+
+    def update_open_line(self, player_idx, line_idx):
+        """
+        Refresh the open-line bit of a single pattern line after it received tiles.
+        """
+        masks = self.open_lines[player_idx]
+        line_color = self.line_colors[player_idx][line_idx]
+        line_bit = 1 << line_idx
+        still_open = (
+            self.line_fills[player_idx][line_idx] <= line_idx
+            and not self.walls[player_idx] & self.line_wall_bits[line_color][line_idx]
+        )
+        for color_id in range(self.num_colors):
+            if still_open and color_id == line_color:
+                masks[color_id] |= line_bit
+            else:
+                masks[color_id] &= ~line_bit
+
+    def get_valid_action_indices(self, player_idx):
+        """
+        Get the ActionSpaceMapper indices of all valid actions for the player.
+        """
+        masks = self.open_lines[player_idx]
+        color_ids = self.color_ids_in_mask
+        action_indices = self.action_indices
+        indices = []
+        extend = indices.extend
+        for source_idx, present in enumerate(self.source_colors):
+            if present:
+                source_indices = action_indices[source_idx]
+                for color_id in color_ids[present]:
+                    extend(source_indices[color_id][masks[color_id]])
+        return indices
+
+    def get_valid_actions(self, player_idx):
+        """
+        Get all valid actions for the player as (factory_idx, tile, pattern_line_idx)
+        tuples, in the same format as helper_functions.get_valid_actions but without padding.
+        """
+        index_to_action = self.action_space_mapper.index_to_action
+        return [index_to_action(index) for index in self.get_valid_action_indices(player_idx)]
+
+    def simulate_action(self, player_idx, factory_idx, tile, pattern_line_idx):
+        """
+        Take all tiles of one color from a factory or the center pool and place them on a
+        pattern line or the floor, sending factory leftovers to the center pool.
+        Runs the wall tiling phase when the round is over.
+        """
+        color_id = self.tile_color_mapping.get(tile)
+        if color_id < 0:
+            raise ValueError(f"Unknown tile color {tile}.")
+        if factory_idx == "center":
+            source_idx = self.num_factories
+        elif isinstance(factory_idx, int) and factory_idx < self.num_factories:
+            source_idx = factory_idx
+        else:
+            raise ValueError("Invalid action. Either factory or center pool should be selected.")
+        line_idx = self.pattern_line_size if pattern_line_idx == "floor" else pattern_line_idx
+        self.take_tiles(player_idx, source_idx, color_id, line_idx)
+
+    def simulate_action_index(self, player_idx, action_index):
+        """
+        Apply an action given as an ActionSpaceMapper index.
+        """
+        decoded = self.index_to_move[action_index]
+        if decoded is None:
+            raise ValueError(f"Invalid action index {action_index}.")
+        self.take_tiles(player_idx, *decoded)
+
+    def take_tiles(self, player_idx, source_idx, color_id, line_idx):
+        """
+        Move all tiles of `color_id` from a source (factory index, or num_factories for the
+        center pool) to a pattern line (pattern_line_size for the floor).
+        """
+        if line_idx < self.pattern_line_size and self.line_colors[player_idx][line_idx] not in (-1, color_id):
+            raise ValueError(f"Pattern line {line_idx} already holds another color.")
+
+        source_colors = self.source_colors
+        center_idx = self.num_factories
+        color_bit = 1 << color_id
+        if source_idx == center_idx:
+            count = self.center_pool[color_id]
+            if not count:
+                raise ValueError("Tile not available in center pool.")
+            self.center_pool[color_id] = 0
+            source_colors[center_idx] &= ~color_bit
+        else:
+            factory = self.factories[source_idx]
+            count = factory[color_id]
+            if not count:
+                raise ValueError("Tile not available in the selected factory.")
+            factory[color_id] = 0
+            leftover_colors = source_colors[source_idx] & ~color_bit
+            center_pool = self.center_pool
+            for other_id in self.color_ids_in_mask[leftover_colors]:
+                center_pool[other_id] += factory[other_id]
+                factory[other_id] = 0
+            source_colors[source_idx] = 0
+            source_colors[center_idx] |= leftover_colors
+
+        if line_idx < self.pattern_line_size:
+            line_colors = self.line_colors[player_idx]
+            line_fills = self.line_fills[player_idx]
+            placed = min(count, line_idx + 1 - line_fills[line_idx])
+            line_colors[line_idx] = color_id
+            line_fills[line_idx] += placed
+            count -= placed
+            self.update_open_line(player_idx, line_idx)
+
+        # Floor tiles only matter as a count; their colors go straight to the discard pile
+        if count:
+            self.floor_counts[player_idx] += count
+            self.discard_pile[color_id] += count
+
+        if not any(source_colors):
+            self.wall_tiling_phase()
+
+    def wall_tiling_phase(self):
+        """
+        Perform the Wall-tiling phase, including scoring, moving tiles,
+        and discarding leftover tiles.
+        """
+        size = self.wall_size
+        discard_pile = self.discard_pile
+        for player_idx in range(self.num_players):
+            wall = self.walls[player_idx]
+            line_colors = self.line_colors[player_idx]
+            line_fills = self.line_fills[player_idx]
+            score = self.scores[player_idx]
+
+            for row, fill in enumerate(line_fills):
+                if fill == row + 1:  # Pattern line is full
+                    color_id = line_colors[row]
+                    column = self.wall_column[row][color_id]
+                    bit = 1 << (row * size + column)
+                    if wall & bit:
+                        raise ValueError(f"Cannot place {self.tile_colors[color_id]} in row {row}: spot already occupied.")
+                    wall |= bit
+                    score += self.calculate_scoring(wall, row, column)
+                    discard_pile[color_id] += fill - 1  # Leave out the tile placed on the wall
+                    line_colors[row] = -1
+                    line_fills[row] = 0
+
+            score += self.calculate_floor_penalty(self.floor_counts[player_idx])
+            self.floor_counts[player_idx] = 0
+            self.walls[player_idx] = wall
+            self.scores[player_idx] = score
+            self.open_lines[player_idx] = self.calculate_open_lines(player_idx)
+            for row_mask in self.row_masks:
+                if wall & row_mask == row_mask:
+                    self.completed_row = True
+
+        if self.is_game_over():
+            # GameState only awards the bonuses to the last board it tiled; keep scores identical
+            self.apply_end_game_bonuses(self.num_players - 1)
+
+        # Reset for next round
+        self.round_number += 1
+        self.refill_factories()
+
+    def apply_end_game_bonuses(self, player_idx):
+        """
+        Apply end-of-game bonuses for completed horizontal and vertical lines
+        and full color sets.
+        """
+        wall = self.walls[player_idx]
+        bonus = 0
+        for row_mask in self.row_masks:
+            if wall & row_mask == row_mask:
+                bonus += 2
+        for column_mask in self.column_masks:
+            if wall & column_mask == column_mask:
+                bonus += 7
+        for color_mask in self.color_masks:
+            if wall & color_mask == color_mask:
+                bonus += 10
+        self.scores[player_idx] += bonus
+
+    def calculate_scoring(self, wall, row_idx, col_idx):
+        """
+        Calculate the score for a tile already set at (row_idx, col_idx) of the wall
+        bitmask, based on adjacency rules.
+        """
+        size = self.wall_size
+        base = row_idx * size
+
+        horizontal_score = 1
+        col = col_idx - 1
+        while col >= 0 and wall >> (base + col) & 1:
+            horizontal_score += 1
+            col -= 1
+        col = col_idx + 1
+        while col < size and wall >> (base + col) & 1:
+            horizontal_score += 1
+            col += 1
+
+        vertical_score = 1
+        row = row_idx - 1
+        while row >= 0 and wall >> (row * size + col_idx) & 1:
+            vertical_score += 1
+            row -= 1
+        row = row_idx + 1
+        while row < size and wall >> (row * size + col_idx) & 1:
+            vertical_score += 1
+            row += 1
+
+        return horizontal_score + vertical_score - 1  # Subtract 1 to avoid double-counting the placed tile
+
+    def calculate_floor_penalty(self, floor_count):
+        """
+        Calculate penalties for the number of tiles left on the floor line.
+        """
+        max_floor = len(self.floor_penalties)
+        if floor_count <= max_floor:
+            return self.floor_penalty_totals[floor_count]
+        return self.floor_penalty_totals[max_floor] + self.floor_penalties[-1] * (floor_count - max_floor)
+
+    def is_game_over(self):
+        """
+        Check if the game ends. The game ends when a player completes a row on their wall.
+        """
+        return self.completed_row or self.round_number > 100  # Safety net if rounds exceed 100
+
+    def get_action_space_mapper(self):
+        """
+        Provide access to the ActionSpaceMapper.
+        """
+        return self.action_space_mapper
@@ -0,0 +1,82 @@
+import struct
+import numpy as np
+from helper_functions.helper_functions import simulate_action
+
+HEADER = struct.Struct("<QH")  # Seed, number of moves
+
+
+class GameRecord:
+    """
+    A game stored as its seed (see GameState.reset) and the ActionSpaceMapper index of
+    every move, one byte each. Serialized it is a 10-byte header followed by the moves,
+    about a hundred bytes for a full game, and `replay` rebuilds any position from it.
+    """
+    def __init__(self, seed, actions):
+        if not isinstance(seed, int) or not 0 <= seed < 2 ** 64:
+            raise ValueError(f"Game records need an unsigned 64-bit integer seed, got {seed!r}.")
+        actions = np.asarray(actions)
+        if len(actions) and (actions.min() < 0 or actions.max() > np.iinfo(np.uint8).max):
+            raise ValueError("Action indices must fit in one byte (0-255) to be recorded.")
+        if len(actions) > np.iinfo(np.uint16).max:
+            raise ValueError(f"A game record holds at most {np.iinfo(np.uint16).max} moves.")
+        self.seed = seed
+        self.actions = actions.astype(np.uint8)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __eq__(self, other):
+        return isinstance(other, GameRecord) and self.seed == other.seed and np.array_equal(self.actions, other.actions)
+
+    def __repr__(self):
+        return f"GameRecord(seed={self.seed}, moves={len(self.actions)})"
+
+    def to_bytes(self):
+        return HEADER.pack(self.seed, len(self.actions)) + self.actions.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """
+        Parse the record starting at `offset`. Returns (record, offset after the record).
+        """
+        seed, num_moves = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        actions = np.frombuffer(data, dtype=np.uint8, count=num_moves, offset=start)
+        return cls(seed, actions), start + num_moves
+
+    def replay(self, game_state, num_moves=None):
+        """
+        Reset `game_state` to the recorded game and play its first `num_moves` moves
+        (default: all). Players move in turn, as in MultiAgentAzulEnv. Returns the game state.
+        """
+        mapper = game_state.action_space_mapper
+        game_state.reset(self.seed)
+        game_state.current_player = 0
+        for action_index in self.actions[:num_moves].tolist():
+            player_idx = game_state.current_player
+            action = mapper.index_to_action(action_index)
+            if action is None:
+                raise ValueError(f"Invalid action index {action_index} in game record.")
+            factory_idx, tile, pattern_line_idx = action
+            simulate_action(game_state, player_idx, factory_idx, tile, pattern_line_idx)
+            game_state.current_player = (player_idx + 1) % game_state.num_players
+        return game_state
+
+
+def write_game_records(file, records):
+    """
+    Append records to an open binary file, back to back.
+    """
+    for record in records:
+        file.write(record.to_bytes())
+
+
+def read_game_records(data):
+    """
+    Iterate over the records in bytes written by write_game_records (for example a file's
+    contents or an mmap of it).
+    """
+    offset = 0
+    while offset < len(data):
+        record, offset = GameRecord.from_bytes(data, offset)
+        yield record
@@ -1,58 +1,68 @@
 import random
-from helper_functions.helper_functions import load_game_settings
-from helper_functions.TileColorMapping_class import TileColorMapping
-from helper_functions.ActionSpaceMapper_class import ActionSpaceMapper
+from helper_functions.helper_functions import encode_board_state, encode_source, encode_pattern_line, encode_wall_row, encode_floor_line, encode_action_slots
+from game.Ruleset_class import load_ruleset
+from helper_functions.ObservationLayout_class import ObservationLayout
 
 class GameState:
-    def __init__(self, settings_path='game_settings.yaml'):
-        print("Loading game settings...")
-        self.settings = load_game_settings()
-        
-        # Ensure settings are loaded correctly
-        if 'num_players' not in self.settings or 'num_factories' not in self.settings or 'tile_colors' not in self.settings:
-            raise ValueError("Missing essential settings in the configuration.")
-        
-        self.num_players = self.settings["num_players"]
-        self.num_factories = self.settings["num_factories"]
-        self.tile_colors = self.settings["tile_colors"]
-        self.pattern_line_size = self.settings.get("pattern_line_size")
-
-        self.tile_color_mapping = TileColorMapping(self.settings["tile_colors"])
-        # Initialize the ActionSpaceMapper
-        self.action_space_mapper = ActionSpaceMapper(self)
-        
-        print(f"Loaded {self.num_players} players, {self.num_factories} factories, and tile colors: {self.tile_colors}")
-
-        # Ensure the number of factories and players are valid
-        if self.num_factories <= 0:
-            raise ValueError("Number of factories must be greater than zero.")
-        if self.num_players <= 0:
-            raise ValueError("Number of players must be greater than zero.")
-    
-
-        # Initialize factories, center pool, and player boards
-        self.factories = [[] for _ in range(self.num_factories)]
-        self.center_pool = []
+    def __init__(self, settings_path=None, seed=None):
+        """
+        seed: Seed of this game state's tile generator. Each GameState draws tiles from its
+              own random.Random, so games are reproducible and independent of other
+              GameStates and of the global random module. See reset.
+        """
+        # Compiled rules shared with every other GameState built from the same file
+        self.ruleset = load_ruleset(settings_path)
+        self.settings = self.ruleset.settings
+
+        self.num_players = self.ruleset.num_players
+        self.num_factories = self.ruleset.num_factories
+        self.tile_colors = list(self.ruleset.tile_colors)
+        self.pattern_line_size = self.ruleset.pattern_line_size
+        self.num_colors = self.ruleset.num_colors
+
+        self.tile_color_mapping = self.ruleset.tile_color_mapping
+        self.action_space_mapper = self.ruleset.action_space_mapper
+
+        # Initialize factories, center pool, and player boards.
+        # Factories and the center pool hold one tile count per color, in tile_colors order.
+        self.factories = [[0] * self.num_colors for _ in range(self.num_factories)]
+        self.center_pool = [0] * self.num_colors
         self.player_boards = [
             {
                 "pattern_lines": [[] for _ in range(self.pattern_line_size)],
-                "wall": [row[:] for row in self.settings.get("wall_pattern")],
+                "wall": [list(row) for row in self.ruleset.wall_pattern],
                 "floor_line": [],
                 "score": 0,
-                "wall_pattern": self.settings.get("wall_pattern")
+                "wall_pattern": self.ruleset.wall_pattern
             }
             for _ in range(self.num_players)
         ]
         
+        self.observation_layout = ObservationLayout(
+            self.num_factories, self.num_colors, self.num_players,
+            self.pattern_line_size, self.ruleset.wall_size
+        )
         self.max_board_size = self.calculate_max_board_size()
         self.max_actions = self.calculate_max_actions()
+        self.observation = None  # Persistent encoded state, see enable_incremental_observation
+
+        # Change counters for cached evaluations (see mark_board_changed)
+        self.board_versions = [0] * self.num_players
+        self.wall_versions = [0] * self.num_players
+        self.evaluation_cache = [
+            {"wall_key": None, "wall_score": 0, "board_key": None, "line_score": 0}
+            for _ in range(self.num_players)
+        ]
+        self.game_over = None  # Cached is_game_over result, cleared when a wall or the round changes
 
         self.round_number = 1
+        self._current_player = 0
+        self.seed = seed
+        self.rng = random.Random(seed)
         self.bag = self.initialize_bag()
         self.discard_pile = []
+        self.zobrist_hash = self.compute_zobrist_hash()  # Maintained incrementally, see compute_zobrist_hash
 
-        print("GameState initialization complete.")
-    
     def __str__(self):
         """
         Converts the game state to a human-readable string format.
@@ -63,9 +73,9 @@ class GameState:
         
         # Format the factories
         for idx, factory in enumerate(self.factories):
-            game_state_str += f"  Factory {idx + 1}: {factory}\n"
+            game_state_str += f"  Factory {idx + 1}: {self.counts_to_tiles(factory)}\n"
 
-        game_state_str += f"Center Pool: {self.center_pool}\n"
+        game_state_str += f"Center Pool: {self.counts_to_tiles(self.center_pool)}\n"
         
         # Format the player boards
         for player_idx, board in enumerate(self.player_boards):
@@ -82,18 +92,33 @@ class GameState:
 
         return game_state_str
 
+    def counts_to_tiles(self, counts):
+        """
+        Expand a per-color count vector (factory or center pool) into a list of tile colors.
+        """
+        tiles = []
+        for color_idx, count in enumerate(counts):
+            tiles.extend([self.tile_colors[color_idx]] * count)
+        return tiles
+
+    def tiles_to_counts(self, tiles):
+        """
+        Convert a list of tile colors into a per-color count vector.
+        """
+        counts = [0] * self.num_colors
+        for tile in tiles:
+            counts[self.tile_color_mapping.get(tile)] += 1
+        return counts
 
     def initialize_bag(self):
         """
         Initialize the tile bag based on the colors defined in the game settings.
         The number of tiles for each color is fixed to 20 for simplicity.
         """
-        print("Initializing the tile bag...")
         tile_bag = []
         for color in self.tile_colors:
             tile_bag.extend([color] * 20)  # Add 20 tiles of each color to the bag
-        random.shuffle(tile_bag)
-        print(f"Tile bag initialized with {len(tile_bag)} tiles.")
+        self.rng.shuffle(tile_bag)
         return tile_bag
 
     def draw_tiles(self, count):
@@ -105,11 +130,12 @@ class GameState:
             if not self.bag:
                 if not self.discard_pile:
                     raise ValueError(f"Both bag and discad pile are empty, cannot draw tiles. Game state: {self.__str__()}")
-                # Refill the bag from the discard pile if it's empty
-                print("Refilling the tile bag from the discard pile...")
-                self.bag = self.discard_pile[:]
+                # Refill the bag from the discard pile if it's empty. The bag is rebuilt in
+                # color order before shuffling, as BitboardGameState.refill_bag does, so
+                # both engines draw the same tiles from the same seed.
+                self.bag = [color for color in self.tile_colors for _ in range(self.discard_pile.count(color))]
                 self.discard_pile = []
-                random.shuffle(self.bag)
+                self.rng.shuffle(self.bag)
             if self.bag:
                 tiles.append(self.bag.pop())
         #print(f"Tiles drawn: {tiles}")
@@ -123,32 +149,290 @@ class GameState:
         #print("Refilling factories for a new round...")
         
         for factory in self.factories:
-            if factory:  # Check if the factory is not empty
+            if any(factory):  # Check if the factory is not empty
                 raise AssertionError("Cannot refill a non-empty factory.")
-            factory.extend(self.draw_tiles(4))  # Each factory gets 4 tiles
+            for tile in self.draw_tiles(4):  # Each factory gets 4 tiles
+                factory[self.tile_color_mapping.get(tile)] += 1
         
         #print(f"Refilled {len(self.factories)} factories.")
 
-    def reset(self):
-        print("Resetting the game state...")
+    def reset(self, seed=None):
+        """
+        Start a new game whose tiles follow from `seed`. Without a seed, one is drawn from
+        the current generator, so consecutive games differ but still follow from the
+        constructor seed. The seed of the current game is kept in self.seed; it and the
+        moves played reproduce the game (see GameRecord).
+        """
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        self.seed = seed
+        self.rng.seed(seed)
         self.round_number = 1
+        self.current_player = 0
         self.bag = self.initialize_bag()
         self.discard_pile = []
-        self.factories = [[] for _ in range(self.num_factories)]
-        self.center_pool = []
+        self.factories = [[0] * self.num_colors for _ in range(self.num_factories)]
+        self.center_pool = [0] * self.num_colors
         for board in self.player_boards:
             board["pattern_lines"] = [[] for _ in range(self.pattern_line_size)]
             board["wall"] = [[None] * 5 for _ in range(5)]  # Reset to default empty wall
             board["floor_line"] = []
             board["score"] = 0
+        for player_idx in range(self.num_players):
+            self.mark_board_changed(player_idx, wall_changed=True)
         self.refill_factories()
-        print("Game state reset complete.")
+        self.zobrist_hash = self.compute_zobrist_hash()
+        if self.observation is not None:
+            encode_board_state(self, self.observation)
+
+    def enable_incremental_observation(self):
+        """
+        Keep an encoded copy of the state in `self.observation`. simulate_action and
+        wall_tiling_phase then rewrite only the slots they change instead of the whole
+        vector being rebuilt with encode_board_state after every move.
+        """
+        self.observation = encode_board_state(self)
+        return self.observation
+
+    def disable_incremental_observation(self):
+        self.observation = None
+
+    def mark_board_changed(self, player_idx, wall_changed=False):
+        """
+        Record that a player's board changed so cached evaluations of it are recomputed.
+        Call with wall_changed=True when the wall changed too (this also clears the
+        cached is_game_over result). Code that edits boards directly must call this.
+        """
+        self.board_versions[player_idx] += 1
+        if wall_changed:
+            self.wall_versions[player_idx] += 1
+            self.game_over = None
+
+    def take_tiles(self, player_idx, factory_idx, tile, pattern_line_idx):
+        """
+        Move the tiles of one action: take every tile of the chosen color from the factory
+        or center pool, send a factory's remaining tiles to the center pool and place the
+        taken tiles on the pattern line, overflowing to the floor line.
+        Raises ValueError, before changing anything, if the tile is not available.
+
+        Returns (tile_idx, count, source_before, placed): the color id, the number of tiles
+        taken, the factory's counts before the move (None for the center pool) and the
+        number of tiles that went to the pattern line.
+        """
+        tile_idx = self.tile_color_mapping.get(tile)
+
+        if factory_idx == "center":  # Action from the center pool
+            count = self.center_pool[tile_idx] if tile_idx >= 0 else 0
+            if not count:
+                raise ValueError("Tile not available in center pool.")
+            old_hash = self.move_hash(player_idx, factory_idx, pattern_line_idx)
+            source_before = None
+            self.center_pool[tile_idx] = 0
+
+        elif isinstance(factory_idx, int) and factory_idx < len(self.factories):  # Valid factory index
+            factory = self.factories[factory_idx]
+            count = factory[tile_idx] if tile_idx >= 0 else 0
+            if not count:
+                raise ValueError("Tile not available in the selected factory.")
+            old_hash = self.move_hash(player_idx, factory_idx, pattern_line_idx)
+            source_before = factory[:]
+            factory[tile_idx] = 0
+
+            # Send the remaining tiles to the center pool
+            for color_idx, leftover in enumerate(factory):
+                self.center_pool[color_idx] += leftover
+                factory[color_idx] = 0
+
+        else:
+            raise ValueError("Invalid action. Either factory or center pool should be selected.")
+
+        player_board = self.player_boards[player_idx]
+        placed = 0
+        if pattern_line_idx != "floor":
+            pattern_line = player_board["pattern_lines"][pattern_line_idx]
+            placed = max(0, min(count, pattern_line_idx + 1 - len(pattern_line)))  # Capacity is line index + 1
+            pattern_line.extend([tile] * placed)
+
+        # Any remaining tiles go to the floor line
+        player_board["floor_line"].extend([tile] * (count - placed))
+
+        self.zobrist_hash ^= old_hash ^ self.move_hash(player_idx, factory_idx, pattern_line_idx)
+        return tile_idx, count, source_before, placed
+
+    def apply_action(self, action, player_idx=None, resolve_round=False):
+        """
+        Play `action` (factory_idx, tile, pattern_line_idx) for a player (default: the
+        current player) and pass the turn. Returns an undo token for `undo`.
+
+        resolve_round: If the move empties the last source, also run the wall tiling phase
+                       and refill (what simulate_action does). The boards, bag, discard pile
+                       and round number are then snapshotted so undo can restore them.
+                       Without it, the round end is left to the caller.
+        """
+        if player_idx is None:
+            player_idx = self.current_player
+        factory_idx, tile, pattern_line_idx = action
+        zobrist_hash = self.zobrist_hash
+
+        tile_idx, count, source_before, placed = self.take_tiles(player_idx, factory_idx, tile, pattern_line_idx)
+        if self.observation is not None:
+            encode_action_slots(self, self.observation, player_idx, factory_idx, pattern_line_idx)
+        self.mark_board_changed(player_idx)
+
+        previous_player = self.current_player
+        self.current_player = (player_idx + 1) % self.num_players
+
+        round_snapshot = None
+        if resolve_round and self.is_round_over():
+            round_snapshot = self.snapshot_round_state()
+            self.wall_tiling_phase()
+
+        return (player_idx, factory_idx, tile_idx, count, source_before, pattern_line_idx, placed,
+                previous_player, zobrist_hash, round_snapshot)
+
+    def undo(self, undo_token):
+        """
+        Take back a move played with apply_action. Tokens must be undone in reverse order.
+        """
+        (player_idx, factory_idx, tile_idx, count, source_before, pattern_line_idx, placed,
+         previous_player, zobrist_hash, round_snapshot) = undo_token
+
+        if round_snapshot is not None:
+            self.restore_round_state(round_snapshot)
+
+        player_board = self.player_boards[player_idx]
+        floor_added = count - placed
+        if floor_added:
+            del player_board["floor_line"][-floor_added:]
+        if placed:
+            del player_board["pattern_lines"][pattern_line_idx][-placed:]
+
+        if source_before is None:
+            self.center_pool[tile_idx] = count
+        else:
+            factory = self.factories[factory_idx]
+            for color_idx, before in enumerate(source_before):
+                if color_idx != tile_idx:
+                    self.center_pool[color_idx] -= before  # Take back the swept leftovers
+                factory[color_idx] = before
+
+        self.current_player = previous_player
+        self.zobrist_hash = zobrist_hash
+        if self.observation is not None:
+            encode_action_slots(self, self.observation, player_idx, factory_idx, pattern_line_idx)
+        self.mark_board_changed(player_idx)
+
+    def snapshot_round_state(self):
+        """
+        Capture everything the wall tiling phase and the refill change. The factories and
+        the center pool are empty at that point, so they are not stored.
+        """
+        boards = [
+            (
+                [line[:] for line in board["pattern_lines"]],
+                [row[:] for row in board["wall"]],
+                board["floor_line"][:],
+                board["score"],
+            )
+            for board in self.player_boards
+        ]
+        return boards, self.bag[:], self.discard_pile[:], self.round_number, self.rng.getstate()
+
+    def restore_round_state(self, snapshot):
+        boards, bag, discard_pile, round_number, rng_state = snapshot
+        for player_idx, (pattern_lines, wall, floor_line, score) in enumerate(boards):
+            board = self.player_boards[player_idx]
+            board["pattern_lines"] = [line[:] for line in pattern_lines]
+            board["wall"] = [row[:] for row in wall]
+            board["floor_line"] = floor_line[:]
+            board["score"] = score
+            self.mark_board_changed(player_idx, wall_changed=True)
+        self.factories = [[0] * self.num_colors for _ in range(self.num_factories)]
+        self.center_pool = [0] * self.num_colors
+        self.bag = bag[:]
+        self.discard_pile = discard_pile[:]
+        self.round_number = round_number
+        self.rng.setstate(rng_state)
+        self.game_over = None
+        if self.observation is not None:
+            encode_board_state(self, self.observation)
+
+    @property
+    def current_player(self):
+        return self._current_player
+
+    @current_player.setter
+    def current_player(self, player_idx):
+        to_move = self.ruleset.zobrist_to_move
+        self.zobrist_hash ^= to_move[self._current_player] ^ to_move[player_idx]
+        self._current_player = player_idx
+
+    def compute_zobrist_hash(self):
+        """
+        Zobrist hash of the position: factories, center pool, pattern lines, walls, floor
+        line sizes and the player to move (not the bag, discard pile or scores).
+        `zobrist_hash` is kept equal to this by take_tiles, wall_tiling_phase and reset,
+        so it only needs a full recomputation after boards are edited directly.
+        """
+        zobrist_hash = self.ruleset.zobrist_to_move[self._current_player]
+        for factory_idx in range(self.num_factories):
+            zobrist_hash ^= self.source_hash(factory_idx)
+        zobrist_hash ^= self.source_hash("center")
+        wall_keys = self.ruleset.zobrist_wall
+        for player_idx, board in enumerate(self.player_boards):
+            for line_idx in range(self.pattern_line_size):
+                zobrist_hash ^= self.line_hash(player_idx, line_idx)
+            zobrist_hash ^= self.floor_hash(player_idx)
+            for row_idx, row in enumerate(board["wall"]):
+                for col_idx, tile in enumerate(row):
+                    if tile is not None:
+                        zobrist_hash ^= wall_keys[player_idx][row_idx][col_idx]
+        return zobrist_hash
+
+    def source_hash(self, factory_idx):
+        if factory_idx == "center":
+            counts, keys = self.center_pool, self.ruleset.zobrist_center
+        else:
+            counts, keys = self.factories[factory_idx], self.ruleset.zobrist_factory[factory_idx]
+        source_hash = 0
+        for color_idx, count in enumerate(counts):
+            if count:
+                source_hash ^= keys[color_idx][count]
+        return source_hash
+
+    def line_hash(self, player_idx, line_idx):
+        pattern_line = self.player_boards[player_idx]["pattern_lines"][line_idx]
+        if not pattern_line:
+            return 0
+        color_idx = self.tile_color_mapping.get(pattern_line[0])
+        return self.ruleset.zobrist_line[player_idx][line_idx][color_idx][len(pattern_line)]
+
+    def floor_hash(self, player_idx):
+        return self.ruleset.zobrist_floor[player_idx][len(self.player_boards[player_idx]["floor_line"])]
+
+    def move_hash(self, player_idx, factory_idx, pattern_line_idx):
+        """
+        Combined hash of the parts a move changes: its source, the center pool, the
+        pattern line and the floor line.
+        """
+        move_hash = self.source_hash(factory_idx) ^ self.floor_hash(player_idx)
+        if factory_idx != "center":
+            move_hash ^= self.source_hash("center")
+        if pattern_line_idx != "floor":
+            move_hash ^= self.line_hash(player_idx, pattern_line_idx)
+        return move_hash
+
+    def refill_key(self):
+        """
+        Hashable description of the factory contents, identifying the outcome of a refill.
+        """
+        return tuple(tuple(factory) for factory in self.factories)
 
     def is_round_over(self):
         """
         Check if the round is over, i.e., all factories and the center pool are empty.
         """
-        round_over_bool = (all(len(factory) == 0 for factory in self.factories) and len(self.center_pool) == 0)
+        round_over_bool = (not any(self.center_pool) and not any(any(factory) for factory in self.factories))
         return round_over_bool
     
     def wall_tiling_phase(self):
@@ -157,11 +441,13 @@ class GameState:
         and discarding leftover tiles.
         """
         #print("Performing wall tiling phase...")
-        for player_board in self.player_boards:
+        observation = self.observation
+        wall_column = self.ruleset.wall_column
+        wall_keys = self.ruleset.zobrist_wall
+        for player_idx, player_board in enumerate(self.player_boards):
             pattern_lines = player_board["pattern_lines"]
             wall = player_board["wall"]
             floor_line = player_board["floor_line"]
-            wall_pattern = player_board["wall_pattern"]
 
             # Score and move tiles for each pattern line
             for i, pattern_line in enumerate(pattern_lines):
@@ -169,14 +455,14 @@ class GameState:
                     tile_color = pattern_line[0]
 
                     # Find where to place the tile in the wall
-                    row_pattern = wall_pattern[i]  # Get the pattern for the current row
-                    column = self.find_wall_column(row_pattern, tile_color)
+                    column = wall_column[i][self.tile_color_mapping.get(tile_color)]
                     
                     # Check if the wall already has a tile in the column
                     if wall[i][column] is not None:
                         raise ValueError(f"Cannot place {tile_color} in row {i}: spot already occupied.")
 
                     # Place the tile in the correct position on the wall
+                    self.zobrist_hash ^= self.line_hash(player_idx, i) ^ wall_keys[player_idx][i][column]
                     wall[i][column] = tile_color
                     player_board["score"] += self.calculate_scoring(wall, i, tile_color)  # Custom scoring logic
                     
@@ -184,25 +470,37 @@ class GameState:
                     self.discard_pile.extend(pattern_line[:-1])  # Leave out the last tile
                     pattern_line.clear()
 
+                    if observation is not None:
+                        encode_pattern_line(self, observation, player_idx, i)
+                        encode_wall_row(self, observation, player_idx, i)
+
             # Add floor line penalties
             player_board["score"] += self.calculate_floor_penalty(floor_line)
+            self.zobrist_hash ^= self.floor_hash(player_idx)
             self.discard_pile.extend(floor_line)
             floor_line.clear()
+            self.mark_board_changed(player_idx, wall_changed=True)
+            if observation is not None:
+                encode_floor_line(self, observation, player_idx)
 
         if self.is_game_over():
             self.apply_end_game_bonuses(player_board, wall)
 
         # Reset for next round
         self.round_number += 1
+        self.game_over = None
         self.refill_factories()
+        for factory_idx in range(self.num_factories):
+            self.zobrist_hash ^= self.source_hash(factory_idx)  # The factories were empty before the refill
+        if observation is not None:
+            for factory_idx in range(self.num_factories):
+                encode_source(self, observation, factory_idx)
 
     def apply_end_game_bonuses(self, player_board, wall):
         """
         Apply end-of-game bonuses for completed horizontal and vertical lines
         and full color sets.
         """
-        print("Applying end-of-game bonuses...")
-
         # Horizontal Line Bonus: Check for complete horizontal lines
         for row in wall:
             if None not in row:  # If there are no None values in the row, it's complete
@@ -249,7 +547,7 @@ class GameState:
         score = 0
         
         # Find the column index where the tile is being placed
-        col_idx = self.find_wall_column(wall[row_idx], tile_color)
+        col_idx = self.ruleset.wall_column[row_idx][self.tile_color_mapping.get(tile_color)]
         
         # Horizontal scoring (left and right adjacency)
         horizontal_score = 1  # The newly placed tile counts as 1 point
@@ -291,25 +589,13 @@ class GameState:
         """
         Calculate penalties for leftover tiles on the floor line.
         """
-        penalties = [-1, -1, -2, -2, -2, -3, -3]  # Example penalty values
-        penalty = 0
-        for i, tile in enumerate(floor_line):
-            penalty += penalties[i] if i < len(penalties) else -3
-        return penalty
+        return self.ruleset.floor_penalty(len(floor_line))
 
     def calculate_max_board_size(self):
         """
-        Estimate the maximum size of the encoded board state
+        Size of the encoded board state, fixed by the observation layout
         """
-        max_factory_tiles = self.num_factories * 4
-
-        max_center_pool_tles = max_factory_tiles
-
-        max_pattern_line_tiles = self.pattern_line_size * self.num_players
-        max_wall_tiles = len(self.player_boards[0]["wall_pattern"]) * len(self.player_boards[0]["wall_pattern"][0]) * self.num_players
-        max_floor_line_tiles = 7 * self.num_players
-
-        return max_factory_tiles + max_center_pool_tles + max_pattern_line_tiles + max_wall_tiles + max_floor_line_tiles
+        return self.observation_layout.size
     
     def calculate_max_actions(self):
         """
@@ -321,14 +607,20 @@ class GameState:
         return max_centre_actions + max_factory_actions
     
     def is_game_over(self):
+        """
+        Check if the game ends. The result is cached until a wall or the round changes.
+        """
+        if self.game_over is None:
+            self.game_over = self.check_game_over()
+        return self.game_over
+
+    def check_game_over(self):
         """
         Check if the game ends. The game ends when a player completes a row on their wall.
         """
         for board in self.player_boards:
             for row in board["wall"]:
                 if all(tile is not None for tile in row):  # Row is complete
-                    print("Game is complete!")
-                    print(f"Final Games state: {self.__str__}")
                     return True
         return self.round_number > 100  # Safety net if rounds exceed 100
     
@@ -0,0 +1,189 @@
+import os
+import numpy as np
+import yaml
+from helper_functions.FrozenDict_class import FrozenDict
+from helper_functions.TileColorMapping_class import TileColorMapping
+from helper_functions.ActionSpaceMapper_class import ActionSpaceMapper
+
+DEFAULT_SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_settings.yaml")
+DEFAULT_FLOOR_PENALTIES = (-1, -1, -2, -2, -2, -3, -3)  # Standard Azul floor penalties
+TILES_PER_COLOR = 20
+DEFAULT_ZOBRIST_SEED = 2024
+
+_ruleset_cache = {}  # Absolute settings path -> (modification time, Ruleset)
+
+
+def freeze(value):
+    """
+    Read-only copy of parsed settings: lists become tuples and dicts FrozenDicts, recursively.
+    """
+    if isinstance(value, dict):
+        return FrozenDict({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """
+    Plain dicts and lists of frozen settings, as yaml.safe_load returns them.
+    """
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def nested_tuple(table):
+    """
+    NumPy table as nested tuples of Python ints, immutable and fast to index one key at a time.
+    """
+    if table.ndim == 1:
+        return tuple(table.tolist())
+    return tuple(nested_tuple(row) for row in table)
+
+
+class Ruleset:
+    """
+    Immutable rules compiled once from a settings file and shared by every GameState,
+    BitboardGameState and VectorAzulEnv built from that file.
+
+    Colors are integer ids in `tile_colors` order. Besides the raw settings the ruleset
+    holds the lookup tables the engines need on every move: the wall column of each
+    color per row, floor penalty prefix sums and the action-space tables (through the
+    shared TileColorMapping and ActionSpaceMapper).
+
+    Copies of a ruleset are the ruleset itself, and unpickling one (for example in a
+    worker process) goes through the load_ruleset cache, so games keep sharing it.
+    """
+    def __init__(self, settings, settings_path=None):
+        # Ensure settings are loaded correctly
+        if 'num_players' not in settings or 'num_factories' not in settings or 'tile_colors' not in settings:
+            raise ValueError("Missing essential settings in the configuration.")
+
+        num_players = settings["num_players"]
+        num_factories = settings["num_factories"]
+        if num_factories <= 0:
+            raise ValueError("Number of factories must be greater than zero.")
+        if num_players <= 0:
+            raise ValueError("Number of players must be greater than zero.")
+
+        tile_colors = tuple(settings["tile_colors"])
+        wall_pattern = tuple(tuple(row) for row in settings.get("wall_pattern"))
+        for row in wall_pattern:
+            if sorted(row) != sorted(tile_colors):
+                raise ValueError(f"Wall pattern row {list(row)} must hold every tile color exactly once.")
+
+        self.settings = freeze(settings)
+        self.settings_path = settings_path
+        self.num_players = num_players
+        self.num_factories = num_factories
+        self.tile_colors = tile_colors
+        self.num_colors = len(tile_colors)
+        self.pattern_line_size = settings.get("pattern_line_size")
+        self.wall_pattern = wall_pattern
+        self.wall_size = len(wall_pattern)
+
+        self.tile_color_mapping = TileColorMapping(tile_colors)
+        self.color_ids = self.tile_color_mapping.mapping
+        # wall_column[row][color_id] -> column of that color in the row, wall_color is the inverse
+        self.wall_column = tuple(tuple(row.index(color) for color in tile_colors) for row in wall_pattern)
+        self.wall_color = tuple(tuple(self.color_ids[color] for color in row) for row in wall_pattern)
+
+        # floor_penalty_totals[n] -> penalty of the first n floor tiles
+        self.floor_penalties = tuple(settings.get("floor_penalties", DEFAULT_FLOOR_PENALTIES))
+        totals = [0]
+        for penalty in self.floor_penalties:
+            totals.append(totals[-1] + penalty)
+        self.floor_penalty_totals = tuple(totals)
+
+        self.action_space_mapper = ActionSpaceMapper(self)
+        self.total_actions = self.action_space_mapper.total_actions
+
+        self.build_zobrist_keys(settings.get("zobrist_seed", DEFAULT_ZOBRIST_SEED))
+
+        self._frozen = True
+
+    def build_zobrist_keys(self, seed):
+        """
+        Random 64-bit keys for Zobrist hashing (see GameState.compute_zobrist_hash).
+        Tables are indexed by tile count, and count 0 always has key 0 so that empty
+        sources, lines and floors contribute nothing to the hash. They are nested tuples,
+        so the ruleset shared by every game cannot be changed through them.
+        """
+        rng = np.random.default_rng(seed)
+        max_count = self.num_colors * TILES_PER_COLOR + 1
+
+        def keys(*shape):
+            table = rng.integers(0, 2 ** 64, size=shape, dtype=np.uint64)
+            table[..., 0] = 0
+            return nested_tuple(table)
+
+        num_players, num_colors = self.num_players, self.num_colors
+        self.zobrist_factory = keys(self.num_factories, num_colors, TILES_PER_COLOR + 1)  # [factory][color][count]
+        self.zobrist_center = keys(num_colors, TILES_PER_COLOR + 1)  # [color][count]
+        self.zobrist_line = keys(num_players, self.pattern_line_size, num_colors, self.pattern_line_size + 1)  # [player][line][color][fill]
+        self.zobrist_floor = keys(num_players, max_count)  # [player][count]
+        self.zobrist_wall = nested_tuple(rng.integers(
+            0, 2 ** 64, size=(num_players, self.wall_size, self.wall_size), dtype=np.uint64
+        ))  # [player][row][column]
+        self.zobrist_to_move = nested_tuple(rng.integers(0, 2 ** 64, size=num_players, dtype=np.uint64))
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("Ruleset is immutable.")
+        super().__setattr__(name, value)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return restore_ruleset, (thaw(self.settings), self.settings_path)
+
+    def __repr__(self):
+        return (f"Ruleset(num_players={self.num_players}, num_factories={self.num_factories}, "
+                f"tile_colors={list(self.tile_colors)}, pattern_line_size={self.pattern_line_size})")
+
+    def floor_penalty(self, floor_count):
+        """
+        Penalty for `floor_count` tiles on the floor line; tiles past the listed
+        penalties cost as much as the last one.
+        """
+        max_floor = len(self.floor_penalties)
+        if floor_count <= max_floor:
+            return self.floor_penalty_totals[floor_count]
+        return self.floor_penalty_totals[max_floor] + self.floor_penalties[-1] * (floor_count - max_floor)
+
+
+def load_ruleset(settings_path=None):
+    """
+    Return the Ruleset of a settings file (default: game/game_settings.yaml next to this
+    module). Rulesets are cached by absolute path and recompiled only when the file's
+    modification time changes.
+    """
+    path = os.path.abspath(settings_path or DEFAULT_SETTINGS_PATH)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _ruleset_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'r') as file:
+        ruleset = Ruleset(yaml.safe_load(file), path)
+    _ruleset_cache[path] = (mtime, ruleset)
+    return ruleset
+
+
+def restore_ruleset(settings, settings_path=None):
+    """
+    Unpickle a Ruleset: the cached ruleset of its settings file if that still holds the
+    same settings, otherwise a new one.
+    """
+    if settings_path is not None and os.path.exists(settings_path):
+        ruleset = load_ruleset(settings_path)
+        if ruleset.settings == freeze(settings):
+            return ruleset
+    return Ruleset(settings, settings_path)
@@ -0,0 +1,215 @@
+"""
+Headless game simulation on the rules engine only (no torch, plotly or mlflow):
+
+    python -m game.simulate --games 1000 --policy heuristic --workers 4
+
+Plays games between random or heuristic players and reports throughput, scores and
+wins per seat.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from multiprocessing import Pool
+from game.BitboardGameState_class import BitboardGameState
+
+POLICIES = ("random", "heuristic")
+ENGINES = ("bitboard", "gamestate")
+
+
+class SimulationEngine:
+    def __init__(self, engine="bitboard", settings_path=None):
+        """
+        Uniform action-index interface over BitboardGameState and GameState.
+        """
+        if engine == "bitboard":
+            self.state = BitboardGameState(settings_path)
+        elif engine == "gamestate":
+            from game.GameState_class import GameState  # Imported on use, pulls in the observation encoders
+            from helper_functions.helper_functions import simulate_action, get_valid_actions
+            self.state = GameState(settings_path)
+            self.simulate_action, self.get_valid_actions = simulate_action, get_valid_actions
+        else:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}.")
+        self.engine = engine
+        self.mapper = self.state.action_space_mapper
+        self.num_players = self.state.num_players
+        self.num_colors = self.state.num_colors
+        self.pattern_line_size = self.state.pattern_line_size
+
+    def reset(self, seed):
+        self.state.reset(seed)
+
+    def is_game_over(self):
+        return self.state.is_game_over()
+
+    def valid_action_indices(self, player_idx):
+        if self.engine == "bitboard":
+            return self.state.get_valid_action_indices(player_idx)
+        return [
+            self.mapper.action_to_index(action)
+            for action in self.get_valid_actions(self.state, player_idx) if action is not None
+        ]
+
+    def play(self, player_idx, action_index):
+        if self.engine == "bitboard":
+            self.state.simulate_action_index(player_idx, action_index)
+        else:
+            self.simulate_action(self.state, player_idx, *self.mapper.index_to_action(action_index))
+
+    def tile_count(self, factory_idx, color_id):
+        source = self.state.center_pool if factory_idx == "center" else self.state.factories[factory_idx]
+        return source[color_id]
+
+    def line_fill(self, player_idx, line_idx):
+        if self.engine == "bitboard":
+            return self.state.line_fills[player_idx][line_idx]
+        return len(self.state.player_boards[player_idx]["pattern_lines"][line_idx])
+
+    def scores(self):
+        if self.engine == "bitboard":
+            return list(self.state.scores)
+        return [board["score"] for board in self.state.player_boards]
+
+
+def heuristic_action(engine, player_idx, action_indices, rng):
+    """
+    Greedy move: place as many tiles as possible on a pattern line, prefer completing the
+    line, and avoid tiles falling to the floor. Ties are broken at random.
+    """
+    best_index, best_key = None, None
+    for action_index in action_indices:
+        factory_idx, tile, line_idx = engine.mapper.index_to_action(action_index)
+        count = engine.tile_count(factory_idx, engine.state.tile_color_mapping.get(tile))
+        if line_idx == "floor":
+            score = -2 * count
+        else:
+            free = line_idx + 1 - engine.line_fill(player_idx, line_idx)
+            placed = min(count, free)
+            score = placed - 2 * (count - placed) + (2 if placed == free else 0)
+        key = (score, rng.random())
+        if best_key is None or key > best_key:
+            best_index, best_key = action_index, key
+    return best_index
+
+
+def simulate_games(game_seeds, policies, engine="bitboard", settings_path=None):
+    """
+    Play one game per seed. policies[seat] is "random" or "heuristic". Returns per game
+    (final scores, moves, rounds).
+    """
+    engine = SimulationEngine(engine, settings_path)
+    if len(policies) != engine.num_players:
+        raise ValueError(f"Expected {engine.num_players} policies, got {len(policies)}.")
+
+    results = []
+    for seed in game_seeds:
+        rng = random.Random(seed)
+        engine.reset(seed)
+        player_idx = 0
+        moves = 0
+        while not engine.is_game_over():
+            action_indices = engine.valid_action_indices(player_idx)
+            if not action_indices:
+                raise ValueError(f"No valid actions available for player {player_idx}.")
+            if policies[player_idx] == "heuristic":
+                action_index = heuristic_action(engine, player_idx, action_indices, rng)
+            else:
+                action_index = rng.choice(action_indices)
+            engine.play(player_idx, action_index)
+            player_idx = (player_idx + 1) % engine.num_players
+            moves += 1
+        results.append((engine.scores(), moves, engine.state.round_number))
+    return results
+
+
+def simulate_games_task(args):
+    return simulate_games(*args)
+
+
+def summarize(results, num_players, seconds):
+    wins = [0.0] * num_players
+    for scores, _, _ in results:
+        winners = [seat for seat, score in enumerate(scores) if score == max(scores)]
+        for seat in winners:
+            wins[seat] += 1.0 / len(winners)
+    seat_scores = [[scores[seat] for scores, _, _ in results] for seat in range(num_players)]
+    return {
+        "games": len(results),
+        "seconds": seconds,
+        "games_per_s": len(results) / seconds,
+        "moves_per_game": statistics.mean(moves for _, moves, _ in results),
+        "rounds_per_game": statistics.mean(rounds for _, _, rounds in results),
+        "seats": [
+            {
+                "win_rate": wins[seat] / len(results),
+                "score_mean": statistics.mean(seat_scores[seat]),
+                "score_std": statistics.pstdev(seat_scores[seat]),
+            }
+            for seat in range(num_players)
+        ],
+    }
+
+
+def run_simulation(num_games=100, policies=None, engine="bitboard", workers=1, seed=0, settings_path=None):
+    """
+    Simulate `num_games` games (game i uses seed + i, so results do not depend on
+    `workers`) and return the summary.
+
+    policies: One policy per seat, or a single policy name for every seat.
+    """
+    num_players = SimulationEngine(engine, settings_path).num_players
+    if policies is None or isinstance(policies, str):
+        policies = [policies or "random"] * num_players
+    for policy in policies:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}.")
+
+    seeds = [seed + game for game in range(num_games)]
+    start = time.perf_counter()
+    if workers > 1:
+        chunks = [seeds[worker::workers] for worker in range(workers)]
+        with Pool(workers) as pool:
+            results = [
+                result for chunk in pool.map(simulate_games_task, [(chunk, policies, engine, settings_path) for chunk in chunks])
+                for result in chunk
+            ]
+    else:
+        results = simulate_games(seeds, policies, engine, settings_path)
+    return summarize(results, num_players, time.perf_counter() - start)
+
+
+def print_summary(summary, policies):
+    print(f"{summary['games']} games in {summary['seconds']:.2f}s ({summary['games_per_s']:.1f} games/s), "
+          f"{summary['moves_per_game']:.1f} moves and {summary['rounds_per_game']:.1f} rounds per game")
+    print(f"{'seat':<6}{'policy':<12}{'win rate':>10}{'score':>16}")
+    for seat, (row, policy) in enumerate(zip(summary["seats"], policies)):
+        print(f"{seat:<6}{policy:<12}{row['win_rate']:>10.1%}{row['score_mean']:>9.1f} ± {row['score_std']:<5.1f}")
+
+
+def add_arguments(parser):
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--policy", nargs="+", default=["random"], choices=POLICIES,
+                        help="One policy for every seat, or one per seat.")
+    parser.add_argument("--engine", default="bitboard", choices=ENGINES)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--settings", default=None, help="Game settings YAML (default: game/game_settings.yaml).")
+    parser.add_argument("--output", help="Write the summary as JSON to this path.")
+
+
+def main(args):
+    policies = args.policy[0] if len(args.policy) == 1 else args.policy
+    summary = run_simulation(args.games, policies, args.engine, args.workers, args.seed, args.settings)
+    num_players = len(summary["seats"])
+    print_summary(summary, [policies] * num_players if isinstance(policies, str) else policies)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate Azul games on the rules engine.")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -1,11 +1,15 @@
+from helper_functions.FrozenDict_class import FrozenDict
+
+
 class ActionSpaceMapper:
     def __init__(self, game_state):
         """
         Initialize the action-to-index and index-to-action mappings
-        based on the game's configuration.
+        based on the game's configuration. Engines share the mapper built by their
+        Ruleset instead of constructing their own, so the mappings are read-only.
         """
         self.num_factories = game_state.num_factories
-        self.tile_colors = game_state.tile_colors
+        self.tile_colors = tuple(game_state.tile_colors)
         self.pattern_line_size = game_state.pattern_line_size
 
         self.max_factory_actions = self.num_factories * len(self.tile_colors) * (self.pattern_line_size + 1)
@@ -37,6 +41,15 @@ class ActionSpaceMapper:
                 self.index_to_action_map[index] = action
                 index += 1
 
+        self.action_to_index_map = FrozenDict(self.action_to_index_map)
+        self.index_to_action_map = FrozenDict(self.index_to_action_map)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     def action_to_index(self, action):
         """
         Convert an action (tuple) to an index.
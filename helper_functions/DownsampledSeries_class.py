@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class DownsampledSeries:
+    def __init__(self, max_points=2000):
+        """
+        A metric over steps kept in at most `max_points` buckets. Each bucket averages
+        the same number of consecutive points; when the buckets run out, neighbouring
+        pairs are merged and the bucket width doubles, so memory stays bounded and an
+        append costs amortized O(1) however long training runs.
+        """
+        if max_points < 2:
+            raise ValueError("A downsampled series needs at least two points.")
+        self.max_points = max_points
+        self.bucket_width = 1
+        self.step_sums = []
+        self.value_sums = []
+        self.counts = []
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def append(self, step, value):
+        if self.counts and self.counts[-1] < self.bucket_width:
+            self.step_sums[-1] += step
+            self.value_sums[-1] += value
+            self.counts[-1] += 1
+        else:
+            if len(self.counts) == self.max_points:
+                self.merge_pairs()
+                return self.append(step, value)
+            self.step_sums.append(step)
+            self.value_sums.append(value)
+            self.counts.append(1)
+        self.total += 1
+
+    def merge_pairs(self):
+        self.step_sums = merge_pairs(self.step_sums)
+        self.value_sums = merge_pairs(self.value_sums)
+        self.counts = merge_pairs(self.counts)
+        self.bucket_width *= 2
+
+    def points(self):
+        """
+        (steps, values) NumPy arrays of the bucket means.
+        """
+        counts = np.asarray(self.counts, dtype=float)
+        if not len(counts):
+            return np.empty(0), np.empty(0)
+        return np.asarray(self.step_sums) / counts, np.asarray(self.value_sums) / counts
+
+
+def merge_pairs(values):
+    merged = [values[i] + values[i + 1] for i in range(0, len(values) - 1, 2)]
+    if len(values) % 2:
+        merged.append(values[-1])
+    return merged
+
+
+def downsample(steps, values, max_points=2000):
+    """
+    Bucket means of at most `max_points` consecutive runs of a (steps, values) series.
+    """
+    steps = np.asarray(steps, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(values) <= max_points:
+        return steps, values
+    width = -(-len(values) // max_points)  # Ceiling division
+    edges = np.arange(0, len(values), width)
+    counts = np.diff(np.append(edges, len(values)))
+    return np.add.reduceat(steps, edges) / counts, np.add.reduceat(values, edges) / counts
@@ -0,0 +1,23 @@
+class FrozenDict(dict):
+    """
+    Read-only dict for the lookup tables shared by every game (see Ruleset). Lookups are
+    plain dict lookups; every mutating method raises TypeError. Unlike a mapping proxy
+    it pickles, and copies return the same object.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("FrozenDict is immutable.")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"FrozenDict({dict.__repr__(self)})"
@@ -0,0 +1,112 @@
+import numpy as np
+
+class LegalActionMask:
+    def __init__(self, game_state):
+        """
+        Keep one boolean legal-action mask per player, indexed like the ActionSpaceMapper
+        (index 0 is the invalid action and is never legal).
+
+        An action (source, color, line) is legal when the source holds that color and the
+        player's pattern line can take it, so the masks are kept as the product of a
+        per-source color table and a per-player line table. Each update only rewrites the
+        mask entries of the source or pattern line that changed.
+        """
+        self.game_state = game_state
+        self.num_players = game_state.num_players
+        self.num_sources = game_state.num_factories + 1  # Factories, then the center pool
+        self.num_colors = len(game_state.tile_colors)
+        self.pattern_line_size = game_state.pattern_line_size
+        self.total_actions = game_state.get_action_space_mapper().total_actions
+
+        self.masks = np.zeros((self.num_players, self.total_actions), dtype=bool)
+        # View of the masks as [player, source, color, line], the last line being the floor
+        self.action_grid = self.masks[:, 1:]
+        self.action_grid.shape = (self.num_players, self.num_sources, self.num_colors, self.pattern_line_size + 1)
+
+        self.source_colors = np.zeros((self.num_sources, self.num_colors), dtype=bool)
+        self.line_targets = np.ones((self.num_players, self.num_colors, self.pattern_line_size + 1), dtype=bool)
+
+        self.refresh()
+
+    def source_counts(self, source_idx):
+        """
+        Per-color tile counts of a source index.
+        """
+        if source_idx == self.num_sources - 1:
+            return self.game_state.center_pool
+        return self.game_state.factories[source_idx]
+
+    def source_index(self, factory_idx):
+        """
+        Map a factory index or "center" to a source index.
+        """
+        return self.num_sources - 1 if factory_idx == "center" else factory_idx
+
+    def calculate_line_targets(self, player_idx, line_idx):
+        """
+        Colors that the player's pattern line can currently take.
+        """
+        board = self.game_state.player_boards[player_idx]
+        pattern_line = board["pattern_lines"][line_idx]
+        wall_row = board["wall"][line_idx]
+        targets = np.zeros(self.num_colors, dtype=bool)
+        if not pattern_line:
+            for color_idx, tile in enumerate(self.game_state.tile_colors):
+                # Ensure the tile color is not already in the corresponding wall row
+                targets[color_idx] = tile not in wall_row
+        elif len(pattern_line) < line_idx + 1 and pattern_line.count(pattern_line[0]) == len(pattern_line):
+            tile = pattern_line[0]  # A started line only takes more of its color
+            targets[self.game_state.tile_color_mapping.mapping[tile]] = tile not in wall_row
+        return targets
+
+    def refresh(self):
+        """
+        Rebuild every mask from the game state (after a reset or the wall tiling phase).
+        """
+        for source_idx in range(self.num_sources):
+            self.source_colors[source_idx] = np.asarray(self.source_counts(source_idx)) > 0
+        for player_idx in range(self.num_players):
+            for line_idx in range(self.pattern_line_size):
+                self.line_targets[player_idx, :, line_idx] = self.calculate_line_targets(player_idx, line_idx)
+        self.action_grid[:] = self.source_colors[None, :, :, None] & self.line_targets[:, None, :, :]
+
+    def update_source(self, source_idx):
+        """
+        Refresh the entries of one factory or the center pool for every player.
+        """
+        self.source_colors[source_idx] = np.asarray(self.source_counts(source_idx)) > 0
+        self.action_grid[:, source_idx] = self.source_colors[source_idx][None, :, None] & self.line_targets
+
+    def update_line(self, player_idx, line_idx):
+        """
+        Refresh the entries of one pattern line (and its wall row) of a player.
+        """
+        self.line_targets[player_idx, :, line_idx] = self.calculate_line_targets(player_idx, line_idx)
+        self.action_grid[player_idx, :, :, line_idx] = self.source_colors & self.line_targets[player_idx, :, line_idx]
+
+    def update_action(self, player_idx, factory_idx, pattern_line_idx):
+        """
+        Refresh the entries touched by a simulate_action call that did not end the round:
+        the source, the center pool and the chosen pattern line.
+        """
+        source_idx = self.source_index(factory_idx)
+        self.update_source(source_idx)
+        if source_idx != self.num_sources - 1:
+            self.update_source(self.num_sources - 1)
+        if pattern_line_idx != "floor":
+            self.update_line(player_idx, pattern_line_idx)
+
+    def copy_state(self):
+        """
+        Copy of the masks and their tables, to put back with load_state.
+        """
+        return self.masks.copy(), self.source_colors.copy(), self.line_targets.copy()
+
+    def load_state(self, state):
+        masks, source_colors, line_targets = state
+        np.copyto(self.masks, masks)
+        np.copyto(self.source_colors, source_colors)
+        np.copyto(self.line_targets, line_targets)
+
+    def get_mask(self, player_idx):
+        return self.masks[player_idx]
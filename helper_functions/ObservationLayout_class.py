@@ -0,0 +1,48 @@
+class ObservationLayout:
+    def __init__(self, num_factories, num_colors, num_players, pattern_line_size, wall_size):
+        """
+        Fixed positions of every feature in an encoded observation, so that the layout
+        does not depend on the current contents of the board.
+
+        Layout (all values are small non-negative integers):
+            factories:   num_factories * num_colors tile counts
+            center pool: num_colors tile counts
+            per player:  pattern line colors (color id + 1, 0 when empty),
+                         pattern line fill counts,
+                         wall occupancy (1 per placed tile, row-major),
+                         floor line tile count
+        """
+        self.num_factories = num_factories
+        self.num_colors = num_colors
+        self.num_players = num_players
+        self.pattern_line_size = pattern_line_size
+        self.wall_size = wall_size
+
+        self.factories_offset = 0
+        self.center_offset = num_factories * num_colors
+        self.players_offset = self.center_offset + num_colors
+
+        # Offsets inside a player block
+        self.line_colors_offset = 0
+        self.line_fills_offset = pattern_line_size
+        self.wall_offset = 2 * pattern_line_size
+        self.floor_offset = self.wall_offset + wall_size * wall_size
+        self.player_size = self.floor_offset + 1
+
+        self.size = self.players_offset + num_players * self.player_size
+
+    def factory_offset(self, factory_idx):
+        """
+        Offset of the first color count of a factory.
+        """
+        return self.factories_offset + factory_idx * self.num_colors
+
+    def player_offset(self, player_idx):
+        """
+        Offset of the first feature of a player block.
+        """
+        return self.players_offset + player_idx * self.player_size
+
+    def __repr__(self):
+        return (f"ObservationLayout(factories={self.num_factories}, colors={self.num_colors}, "
+                f"players={self.num_players}, size={self.size})")
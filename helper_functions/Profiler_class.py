@@ -0,0 +1,121 @@
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+
+class Profiler:
+    def __init__(self, max_trace_events=1_000_000):
+        """
+        Opt-in timer for the self-play hot path. Functions decorated with `profile_stage`
+        report their call durations here while the profiler is enabled; when it is
+        disabled the decorators only check the `enabled` flag.
+
+        max_trace_events: Cap on the number of events kept for the Chrome trace.
+        """
+        self.enabled = False
+        self.max_trace_events = max_trace_events
+        self.durations = {}  # Stage name -> list of call durations in nanoseconds
+        self.trace_events = []
+        self.origin_ns = time.perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self, clear_trace=False):
+        """
+        Clear the per-stage statistics (for example after each episode's report).
+        The trace events are kept unless `clear_trace` is set.
+        """
+        self.durations = {}
+        if clear_trace:
+            self.trace_events = []
+
+    def record(self, stage, start_ns, end_ns):
+        durations = self.durations.get(stage)
+        if durations is None:
+            durations = self.durations[stage] = []
+        durations.append(end_ns - start_ns)
+
+        if len(self.trace_events) < self.max_trace_events:
+            self.trace_events.append((stage, start_ns, end_ns, threading.get_ident()))
+
+    def report(self):
+        """
+        Per-stage statistics: call count, cumulative time and mean/p50/p95/p99/max
+        latencies. Times are in milliseconds (total) and microseconds (latencies).
+        """
+        report = {}
+        for stage, durations in self.durations.items():
+            durations_us = np.asarray(durations, dtype=np.float64) / 1e3
+            p50, p95, p99 = np.percentile(durations_us, [50, 95, 99])
+            report[stage] = {
+                "count": len(durations_us),
+                "total_ms": durations_us.sum() / 1e3,
+                "mean_us": durations_us.mean(),
+                "p50_us": p50,
+                "p95_us": p95,
+                "p99_us": p99,
+                "max_us": durations_us.max(),
+            }
+        return report
+
+    def print_report(self, title="Profile"):
+        report = self.report()
+        print(f"{title}:")
+        if not report:
+            print("  (no profiled calls)")
+            return
+        print(f"  {'stage':<34}{'calls':>8}{'total ms':>11}{'mean us':>10}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}")
+        for stage, stats in sorted(report.items(), key=lambda item: -item[1]["total_ms"]):
+            print(
+                f"  {stage:<34}{stats['count']:>8}{stats['total_ms']:>11.1f}{stats['mean_us']:>10.1f}"
+                f"{stats['p50_us']:>10.1f}{stats['p95_us']:>10.1f}{stats['p99_us']:>10.1f}"
+            )
+
+    def export_chrome_trace(self, path):
+        """
+        Write the recorded calls as Chrome trace-event JSON (complete "X" events), which
+        chrome://tracing, Perfetto or speedscope show as a flame chart.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": stage,
+                "ph": "X",
+                "ts": (start_ns - self.origin_ns) / 1e3,
+                "dur": (end_ns - start_ns) / 1e3,
+                "pid": pid,
+                "tid": thread_id,
+            }
+            for stage, start_ns, end_ns, thread_id in self.trace_events
+        ]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        print(f"Wrote {len(events)} trace events to {path}")
+
+
+profiler = Profiler()
+
+
+def profile_stage(stage):
+    """
+    Decorator that times every call of the function as `stage` while the module-level
+    profiler is enabled.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(stage, start_ns, time.perf_counter_ns())
+        return wrapper
+    return decorator
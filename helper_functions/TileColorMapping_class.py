@@ -1,12 +1,22 @@
+from helper_functions.FrozenDict_class import FrozenDict
+
+
 class TileColorMapping:
     def __init__(self, tile_colors):
         """
         Initialize the tile color mapping using the list of tile colors from the game settings.
-        Each color will be mapped to an integer starting from 0.
+        Each color will be mapped to an integer starting from 0. The mapping is read-only,
+        as one instance is shared by every game of a Ruleset.
         """
-        self.tile_colors = tile_colors
-        self.mapping = {color: idx for idx, color in enumerate(tile_colors)}
+        self.tile_colors = tuple(tile_colors)
+        self.mapping = FrozenDict({color: idx for idx, color in enumerate(tile_colors)})
     
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     def get(self, color, default=-1):
         """
         Get the numeric value of a tile color. If the color is not found, return the default value.
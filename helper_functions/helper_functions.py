@@ -1,6 +1,10 @@
 import yaml
 import math
+import numpy as np
+from helper_functions.Profiler_class import profile_stage
+from game.Ruleset_class import load_ruleset, DEFAULT_SETTINGS_PATH
 
+@profile_stage("simulate_action")
 def simulate_action(game_state, player_idx, factory_idx, tile, pattern_line_idx):
     """
     Simulate a player's action. Remove the chosen tile(s) from the factory or center pool
@@ -13,68 +17,20 @@ def simulate_action(game_state, player_idx, factory_idx, tile, pattern_line_idx)
     #print(f"Selected Pattern Line: {pattern_line_idx}")
     #print("--")
 
-    if factory_idx == "center":  # Action from the center pool
-        # Count the number of tiles of the selected color in the center pool
-        selected_tiles = [t for t in game_state.center_pool if t == tile]
-        if not selected_tiles:
-            raise ValueError("Tile not available in center pool.")
-
-        # Remove the selected tiles from the center pool
-        for _ in selected_tiles:
-            game_state.center_pool.remove(tile)
-
-        if pattern_line_idx == "floor":
-            # Place all remaining selected tiles into the floor line
-            game_state.player_boards[player_idx]["floor_line"].extend(selected_tiles)
-        else:
-            # Try to place tiles in the specified pattern line
-            pattern_line = game_state.player_boards[player_idx]["pattern_lines"][pattern_line_idx]
-            max_capacity = pattern_line_idx + 1  # The maximum capacity of this pattern line (1-based)
-
-            # Place tiles in the pattern line
-            while selected_tiles and len(pattern_line) < max_capacity:
-                pattern_line.append(selected_tiles.pop())
-
-            # Any remaining tiles must go to the floor line
-            game_state.player_boards[player_idx]["floor_line"].extend(selected_tiles)
-
-    elif isinstance(factory_idx, int) and factory_idx < len(game_state.factories):  # Valid factory index
-        factory = game_state.factories[factory_idx]
-        
-        # Count the number of selected tiles in the factory
-        selected_tiles = [t for t in factory if t == tile]
-        if not selected_tiles:
-            raise ValueError("Tile not available in the selected factory.")
-
-        # Remove the selected tiles from the factory and send the rest to the center pool
-        for _ in selected_tiles:
-            factory.remove(tile)  # Remove selected tiles from the factory
-        
-        game_state.center_pool.extend(factory)  # Send the remaining tiles to the center pool
-
-        if pattern_line_idx == "floor":
-            # Place all remaining selected tiles into the floor line
-            game_state.player_boards[player_idx]["floor_line"].extend(selected_tiles)
-        else:
-            # Try to place tiles in the specified pattern line
-            pattern_line = game_state.player_boards[player_idx]["pattern_lines"][pattern_line_idx]
-            max_capacity = pattern_line_idx + 1  # The maximum capacity of this pattern line (1-based)
-
-            # Place tiles in the pattern line
-            while selected_tiles and len(pattern_line) < max_capacity:
-                pattern_line.append(selected_tiles.pop())
-
-            # Any remaining tiles must go to the floor line
-            game_state.player_boards[player_idx]["floor_line"].extend(selected_tiles)
+    game_state.take_tiles(player_idx, factory_idx, tile, pattern_line_idx)
 
-    else:
-        raise ValueError("Invalid action. Either factory or center pool should be selected.")
+    # Keep the incrementally maintained observation in sync (only the slots this move changed)
+    if game_state.observation is not None:
+        encode_action_slots(game_state, game_state.observation, player_idx, factory_idx, pattern_line_idx)
+
+    game_state.mark_board_changed(player_idx)
 
     # If round is over, perform wall tiling phase (if necessary)
     if game_state.is_round_over():
         game_state.wall_tiling_phase()
 
     
+@profile_stage("get_valid_actions")
 def get_valid_actions(game_state, player_idx):
     """
     Get all valid actions for the current board state and player, dynamically
@@ -91,7 +47,7 @@ def get_valid_actions(game_state, player_idx):
 
     # Add actions for each factory
     for factory_idx, factory in enumerate(factories):
-        tile_colors = set(factory)
+        tile_colors = [game_state.tile_colors[color_idx] for color_idx, count in enumerate(factory) if count]
         for tile in tile_colors:
             # Check if tile can be placed on a pattern line
             for pattern_line_idx in range(len(pattern_lines)):
@@ -107,7 +63,7 @@ def get_valid_actions(game_state, player_idx):
             actions.append((factory_idx, tile, "floor"))
 
     # Add actions for the center pool
-    tile_colors = set(center_pool)
+    tile_colors = [game_state.tile_colors[color_idx] for color_idx, count in enumerate(center_pool) if count]
     for tile in tile_colors:
         for pattern_line_idx in range(len(pattern_lines)):
             if (
@@ -132,70 +88,122 @@ def get_valid_actions(game_state, player_idx):
 
 
 
-def encode_board_state(game_state):
+@profile_stage("encode_board_state")
+def encode_board_state(game_state, out=None):
     """
     Encode the game state into a format suitable for ML models.
-    Returns a flattened numerical representation with consistent feature positions.
+    Features are written at the fixed positions of game_state.observation_layout, so the
+    layout never depends on the current contents of the board.
+
+    out: Optional preallocated 1-D NumPy array (or CPU torch tensor) of
+         observation_layout.size entries to write into. A float32 array is allocated
+         when omitted. All features are small non-negative integers, so uint8 buffers work too.
+
+    Returns the encoded array (`out` when given).
     """
-    max_board_size = game_state.max_board_size
-    features = []
-    
-    # Use the TileColorMapping object from the game state
-    tile_color_mapping = game_state.tile_color_mapping
-
-    # Constants for fixed lengths (you can modify these based on your specific game design)
-    NUM_FACTORIES = len(game_state.factories)  # Number of factories
-    FACTORY_SIZE = max(len(factory) for factory in game_state.factories)  # Max number of tiles in any factory
-    MAX_PATTERN_LINE_SIZE = max(len(line) for player_board in game_state.player_boards for line in player_board["pattern_lines"])
-    MAX_WALL_SIZE = len(game_state.player_boards[0]["wall"])  # Assuming all players have the same wall size
-    MAX_FLOOR_SIZE = max(len(board["floor_line"]) for board in game_state.player_boards)
-
-    # Define a fixed size for the center pool (you can adjust this value as needed)
-    CENTER_POOL_SIZE = NUM_FACTORIES *  3 + 1 # At most three tiles from each factory get placed, plus one for the first starter
-
-    # Encode factories
-    for factory in game_state.factories:
-        # Each factory's tiles should be padded/truncated to FACTORY_SIZE
-        factory_encoding = [tile_color_mapping.get(tile, 0) for tile in factory]
-        factory_encoding.extend([0] * (FACTORY_SIZE - len(factory)))  # Padding to fixed size
-        features.extend(factory_encoding)
-
-    # Encode center pool (fixed size CENTER_POOL_SIZE)
-    center_pool_encoding = [tile_color_mapping.get(tile, 0) for tile in game_state.center_pool]
-    center_pool_encoding = center_pool_encoding[:CENTER_POOL_SIZE]  # Truncate to fixed size
-    center_pool_encoding.extend([0] * (CENTER_POOL_SIZE - len(center_pool_encoding)))  # Padding to fixed size
-    features.extend(center_pool_encoding)
+    layout = game_state.observation_layout
+    if out is None:
+        out = np.zeros(layout.size, dtype=np.float32)
+    elif hasattr(out, "numpy"):
+        out = out.numpy()  # Shares memory with the tensor
+
+    # Encode factories and the center pool as per-color tile counts
+    for factory_idx in range(len(game_state.factories)):
+        encode_source(game_state, out, factory_idx)
+    encode_source(game_state, out, "center")
 
     # Encode player boards (Pattern lines, Wall, Floor line)
-    for board in game_state.player_boards:
-        # Pattern lines (max length MAX_PATTERN_LINE_SIZE)
-        for line in board["pattern_lines"]:
-            pattern_line_encoding = [tile_color_mapping.get(tile, 0) for tile in line]
-            pattern_line_encoding.extend([0] * (MAX_PATTERN_LINE_SIZE - len(line)))  # Padding
-            features.extend(pattern_line_encoding)
-        
-        # Wall rows (max length MAX_WALL_SIZE)
-        for wall_row in board["wall"]:
-            wall_row_encoding = [tile_color_mapping.get(tile, 0) for tile in wall_row]
-            wall_row_encoding.extend([0] * (MAX_WALL_SIZE - len(wall_row)))  # Padding
-            features.extend(wall_row_encoding)
-
-        # Floor line (max length MAX_FLOOR_SIZE)
-        floor_line_encoding = [tile_color_mapping.get(tile, 0) for tile in board["floor_line"]]
-        floor_line_encoding.extend([0] * (MAX_FLOOR_SIZE - len(board["floor_line"])))  # Padding
-        features.extend(floor_line_encoding)
-
-    # Padding or truncating to max_board_size
-    while len(features) < max_board_size:
-        features.append(0)  # Use 0 or another placeholder for padding
-    features = features[:max_board_size]  # Truncate if necessary
-
-    return features
-
-
-
-def load_game_settings(settings_path="game/game_settings.yaml"):
-    with open(settings_path, 'r') as file:
+    for player_idx, board in enumerate(game_state.player_boards):
+        for line_idx in range(len(board["pattern_lines"])):
+            encode_pattern_line(game_state, out, player_idx, line_idx)
+        for row_idx in range(len(board["wall"])):
+            encode_wall_row(game_state, out, player_idx, row_idx)
+        encode_floor_line(game_state, out, player_idx)
+
+    return out
+
+
+def encode_source(game_state, out, factory_idx):
+    """
+    Write the per-color tile counts of a factory (or "center") into an encoded state.
+    """
+    layout = game_state.observation_layout
+    if factory_idx == "center":
+        offset, counts = layout.center_offset, game_state.center_pool
+    else:
+        offset, counts = layout.factory_offset(factory_idx), game_state.factories[factory_idx]
+    out[offset:offset + layout.num_colors] = counts
+
+
+def encode_pattern_line(game_state, out, player_idx, line_idx):
+    """
+    Write a pattern line's color (color id + 1, 0 when empty) and fill count into an encoded state.
+    """
+    layout = game_state.observation_layout
+    base = layout.player_offset(player_idx)
+    line = game_state.player_boards[player_idx]["pattern_lines"][line_idx]
+    out[base + layout.line_colors_offset + line_idx] = game_state.tile_color_mapping.get(line[0]) + 1 if line else 0
+    out[base + layout.line_fills_offset + line_idx] = len(line)
+
+
+def encode_wall_row(game_state, out, player_idx, row_idx):
+    """
+    Write a wall row's occupancy (1 for every placed tile) into an encoded state.
+    """
+    layout = game_state.observation_layout
+    offset = layout.player_offset(player_idx) + layout.wall_offset + row_idx * layout.wall_size
+    wall_row = game_state.player_boards[player_idx]["wall"][row_idx]
+    out[offset:offset + layout.wall_size] = [tile is not None for tile in wall_row]
+
+
+def encode_floor_line(game_state, out, player_idx):
+    """
+    Write a player's floor line tile count into an encoded state.
+    """
+    layout = game_state.observation_layout
+    out[layout.player_offset(player_idx) + layout.floor_offset] = len(game_state.player_boards[player_idx]["floor_line"])
+
+
+def encode_action_slots(game_state, out, player_idx, factory_idx, pattern_line_idx):
+    """
+    Re-encode the slots a move changes: its source, the center pool, the chosen pattern
+    line and the player's floor line.
+    """
+    encode_source(game_state, out, factory_idx)
+    if factory_idx != "center":
+        encode_source(game_state, out, "center")
+    if pattern_line_idx != "floor":
+        encode_pattern_line(game_state, out, player_idx, pattern_line_idx)
+    encode_floor_line(game_state, out, player_idx)
+
+
+def encode_board_states(game_states, out=None):
+    """
+    Encode several game states into the rows of one buffer.
+
+    out: Optional preallocated 2-D NumPy array (or CPU torch tensor) with at least
+         len(game_states) rows of observation_layout.size entries; row i receives game_states[i].
+    """
+    game_states = list(game_states)
+    if not game_states:
+        raise ValueError("No game states to encode.")
+    if out is None:
+        out = np.zeros((len(game_states), game_states[0].observation_layout.size), dtype=np.float32)
+    elif hasattr(out, "numpy"):
+        out = out.numpy()  # Shares memory with the tensor
+
+    for row, game_state in enumerate(game_states):
+        encode_board_state(game_state, out[row])
+    return out
+
+
+
+def load_game_settings(settings_path=None):
+    """
+    Parse a settings file (default: game/game_settings.yaml of this package) into a new
+    dict. Engines use the cached, compiled load_ruleset instead.
+    """
+    with open(settings_path or DEFAULT_SETTINGS_PATH, 'r') as file:
         settings = yaml.safe_load(file)
     return settings
 
@@ -203,15 +211,25 @@ def calculate_positive_attributes(game_state, player_idx):
     """
     Calculate the positive attributes of a board: pattern line progress, future potential, and end-of-game bonuses.
     """
-    player_board = game_state.player_boards[player_idx]
-    wall = player_board["wall"]
-    pattern_lines = player_board["pattern_lines"]
-    
-    score = 0
+    return calculate_pattern_line_progress(game_state, player_idx) + calculate_wall_potential(game_state, player_idx)
 
-    # Pattern line progress: Reward pattern lines close to completion
+def calculate_pattern_line_progress(game_state, player_idx):
+    """
+    Reward pattern lines close to completion.
+    """
+    pattern_lines = game_state.player_boards[player_idx]["pattern_lines"]
     pattern_progress = sum((len(line) / (idx + 1)) for idx, line in enumerate(pattern_lines))
-    score += pattern_progress * 2  # Weighted factor
+    return pattern_progress * 2  # Weighted factor
+
+def calculate_wall_potential(game_state, player_idx, game_over=None):
+    """
+    Reward rows with fewer empty spaces, plus the end-of-game bonuses once the game is over.
+    """
+    wall = game_state.player_boards[player_idx]["wall"]
+    if game_over is None:
+        game_over = game_state.is_game_over()
+
+    score = 0
 
     # Future potential: Reward rows/columns with fewer empty spaces
     for row_idx, row in enumerate(wall):
@@ -219,7 +237,7 @@ def calculate_positive_attributes(game_state, player_idx):
         score += (5 - empty_spaces) ** 2  # Reward completed rows more heavily
 
     # End-of-game bonuses (only if game is over)
-    if game_state.is_game_over():
+    if game_over:
         # Horizontal line bonus: 2 points per complete row
         for row in wall:
             if all(tile is not None for tile in row):
@@ -255,31 +273,58 @@ def calculate_negative_attributes(game_state, player_idx):
     score -= clustering_penalty
 
     # Floor penalties: Penalize tiles in the floor line
-    score += calculate_floor_penalty(floor_line)
+    score += calculate_floor_penalty(floor_line, game_state.ruleset)
 
     return score
 
+def evaluate_player_board(game_state, player_idx):
+    """
+    Positive plus negative attributes of one player's board, from the per-player cache.
+    The wall part (potential, bonuses, clustering) is recomputed only when the player's
+    wall or the game-over status changed, the pattern line and floor part only when
+    the player's board changed (see GameState.mark_board_changed).
+    """
+    cache = game_state.evaluation_cache[player_idx]
+    player_board = game_state.player_boards[player_idx]
+
+    game_over = game_state.is_game_over()
+    wall_key = (game_state.wall_versions[player_idx], game_over)
+    if cache["wall_key"] != wall_key:
+        cache["wall_score"] = (
+            calculate_wall_potential(game_state, player_idx, game_over) -
+            calculate_wall_clustering_penalty(player_board["wall"])
+        )
+        cache["wall_key"] = wall_key
+
+    board_key = game_state.board_versions[player_idx]
+    if cache["board_key"] != board_key:
+        cache["line_score"] = (
+            calculate_pattern_line_progress(game_state, player_idx) +
+            calculate_floor_penalty(player_board["floor_line"], game_state.ruleset)
+        )
+        cache["board_key"] = board_key
+
+    return cache["line_score"] + cache["wall_score"]
+
+@profile_stage("evaluate_board_state")
 def evaluate_board_state(game_state, player_idx):
     """
     Provide a holistic evaluation of the player's board state compared to opponents.
     Positive attributes are added, and negative attributes are subtracted for the player.
     The same evaluation is performed for the opponent(s), and the player's score is 
     adjusted by subtracting the opponent's evaluation.
+    Per-player attributes come from evaluate_player_board, so only boards that changed
+    since the last evaluation are rescanned.
     """
     # Evaluate positive and negative attributes for the player
-    player_positive = calculate_positive_attributes(game_state, player_idx)
-    player_negative = calculate_negative_attributes(game_state, player_idx)
-    player_score = player_positive + player_negative  # Total score for the player
+    player_score = evaluate_player_board(game_state, player_idx)  # Total score for the player
 
     # Opponent evaluation
     opponent_scores = []
-    for opp_idx, opp_board in enumerate(game_state.player_boards):
+    for opp_idx in range(len(game_state.player_boards)):
         if opp_idx != player_idx:
             # Evaluate positive and negative attributes for each opponent
-            opponent_positive = calculate_positive_attributes(game_state, opp_idx)
-            opponent_negative = calculate_negative_attributes(game_state, opp_idx)
-            opponent_score = opponent_positive + opponent_negative
-            opponent_scores.append(opponent_score)
+            opponent_scores.append(evaluate_player_board(game_state, opp_idx))
 
     # Subtract the sum of opponent scores from the player's score (zero-sum game)
     score = player_score - 0.5*(1/len(game_state.player_boards)) * sum(opponent_scores)
@@ -317,18 +362,12 @@ def calculate_wall_clustering_penalty(wall):
     # Penalize evenly spread tiles (low clustering score leads to higher penalty)
     return math.exp(-5 * clustering_score) * 10  # Adjust exponential scaling and weight as needed
 
-def calculate_floor_penalty(floor_line):
+def calculate_floor_penalty(floor_line, ruleset=None):
     """
     Calculate the total penalty for tiles left on the floor line.
-    Uses a predefined penalty structure where the first few tiles incur less penalty.
+    Uses the ruleset's penalty structure (default ruleset if none is given), where the
+    first few tiles incur less penalty.
     """
-    penalties = [-1, -1, -2, -2, -2, -3, -3]  # Standard Azul floor penalties
-    total_penalty = 0
-
-    for idx, tile in enumerate(floor_line):
-        if idx < len(penalties):
-            total_penalty += penalties[idx]
-        else:
-            total_penalty += penalties[-1]  # Apply max penalty for additional tiles
-
-    return total_penalty
\ No newline at end of file
+    if ruleset is None:
+        ruleset = load_ruleset()
+    return ruleset.floor_penalty(len(floor_line))
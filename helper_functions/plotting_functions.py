@@ -1,13 +1,16 @@
-import plotly.graph_objects as go
+from helper_functions.DownsampledSeries_class import downsample
 
-def plot_metrics(rewards_per_episode, episode_numbers):
-    """ Plot rewards over episodes using Plotly """
+
+def plot_metrics(rewards_per_episode, episode_numbers, max_points=2000, name="Rewards"):
+    """ Plot rewards over episodes using Plotly, averaged down to at most max_points points """
+    import plotly.graph_objects as go  # Imported on use, the engine does not need plotly
+    episode_numbers, rewards_per_episode = downsample(episode_numbers, rewards_per_episode, max_points)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=episode_numbers, y=rewards_per_episode, mode='lines+markers', name='Rewards'))
+    fig.add_trace(go.Scattergl(x=episode_numbers, y=rewards_per_episode, mode='lines', name=name))
     fig.update_layout(
-        title="Rewards per Episode",
+        title=f"{name} per Episode",
         xaxis_title="Episode Number",
-        yaxis_title="Reward",
+        yaxis_title=name,
         template="plotly_dark"
     )
-    return fig
\ No newline at end of file
+    return fig
@@ -1,3 +1,127 @@
-from ml.train_multi_agent import train_multi_agent
+import argparse
+import sys
 
-train_multi_agent()
\ No newline at end of file
+COMMANDS = ("train", "actor-learner", "train-offline", "simulate", "arena", "benchmark", "server")
+
+
+def train(args):
+    from ml.train_multi_agent import train_multi_agent  # Imports torch
+
+    train_multi_agent(
+        episodes=args.episodes,
+        replay_capacity=args.replay_capacity,
+        batch_size=args.batch_size,
+        prioritized_replay=args.prioritized_replay,
+        stacked_network=args.stacked_network,
+        shared_parameters=args.shared_parameters,
+        parallel_games=args.parallel_games,
+        profile=args.profile or args.trace is not None,
+        trace_path=args.trace,
+        checkpoint_dir=args.checkpoint_dir or ("checkpoints" if args.resume else None),
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        metrics_dir=args.metrics_dir,
+        plot_path=args.plot,
+        report_every=args.report_every
+    )
+
+
+def simulate(args):
+    from game import simulate as simulation  # Rules engine only, no torch
+
+    simulation.main(args)
+
+
+def actor_learner(argv):
+    from ml.actor_learner import main as actor_learner_main
+
+    actor_learner_main(argv)
+
+
+def train_offline(argv):
+    from ml.train_offline import main as train_offline_main
+
+    train_offline_main(argv)
+
+
+def arena(argv):
+    from ml.arena import main as arena_main
+
+    arena_main(argv)
+
+
+def benchmark(argv):
+    from benchmarks.run_benchmarks import main as benchmark_main
+
+    return benchmark_main(argv)
+
+
+def server(argv):
+    from ml.game_server import main as server_main
+
+    server_main(argv)
+
+
+PASSTHROUGH_COMMANDS = {  # Parse their own arguments
+    "actor-learner": actor_learner, "train-offline": train_offline, "arena": arena, "benchmark": benchmark, "server": server,
+}
+
+
+def main(argv=None):
+    """
+    Command line entry point. Heavy modules are imported by the command that needs them,
+    so `simulate` starts without loading torch. Without a command, `train` runs.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        argv = ["train"] + argv
+    if argv[0] in PASSTHROUGH_COMMANDS:
+        return PASSTHROUGH_COMMANDS[argv[0]](argv[1:])
+
+    parser = argparse.ArgumentParser(description="Azul engine, self-play training and evaluation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="Train agents through self-play.")
+    train_parser.add_argument("--episodes", type=int, default=10)
+    train_parser.add_argument("--replay-capacity", type=int, default=0,
+                              help="Replay buffer size per agent; 0 (the default) trains on single transitions. "
+                                   "--stacked-network and --prioritized-replay need a positive size.")
+    train_parser.add_argument("--batch-size", type=int, default=64, help="Replay minibatch size.")
+    train_parser.add_argument("--prioritized-replay", action="store_true",
+                              help="Sample minibatches by TD-error priority.")
+    train_parser.add_argument("--stacked-network", action="store_true",
+                              help="Train all seats in one StackedDQN (MultiSeatAgent).")
+    train_parser.add_argument("--shared-parameters", action="store_true",
+                              help="Share one set of weights between the seats (implies --stacked-network).")
+    train_parser.add_argument("--parallel-games", type=int, default=1,
+                              help="With --stacked-network, games played in lockstep with one forward pass per step.")
+    train_parser.add_argument("--profile", action="store_true", help="Print a per-stage timing report every episode.")
+    train_parser.add_argument("--trace", default=None,
+                              help="Write a Chrome trace-event JSON of the profiled stages to this path (implies --profile).")
+    train_parser.add_argument("--checkpoint-dir", default=None, help="Directory for periodic training checkpoints.")
+    train_parser.add_argument("--checkpoint-every", type=int, default=0, help="Episodes between checkpoints.")
+    train_parser.add_argument("--resume", action="store_true",
+                              help="Continue from the latest checkpoint in --checkpoint-dir.")
+    train_parser.add_argument("--metrics-dir", default=None,
+                              help="Log episode metrics to a local MLflow store in this directory (e.g. mlruns).")
+    train_parser.add_argument("--plot", default=None, help="Write an HTML plot of the episode rewards to this path.")
+    train_parser.add_argument("--report-every", type=int, default=100, help="Episodes between progress lines.")
+    train_parser.set_defaults(handler=train)
+
+    simulate_parser = commands.add_parser("simulate", help="Simulate random or heuristic games, without torch.")
+    from game.simulate import add_arguments
+    add_arguments(simulate_parser)
+    simulate_parser.set_defaults(handler=simulate)
+
+    commands.add_parser("actor-learner", help="Self-play with actor processes feeding a learner (see ml/actor_learner.py).")
+    commands.add_parser("train-offline", help="Train agents from stored trajectories (see ml/train_offline.py).")
+    commands.add_parser("arena", help="Tournament between agents (see ml/arena.py).")
+    commands.add_parser("benchmark", help="Throughput benchmarks (see benchmarks/run_benchmarks.py).")
+    commands.add_parser("server", help="Game server with a batched DQN bot, and its load test (see ml/game_server.py).")
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,10 +4,20 @@ import random
 from ml.DQN_class import DQN
 import torch.nn as nn
 import numpy as np
+from helper_functions.Profiler_class import profile_stage
 
 class AzulAgent:
     
-    def __init__(self, input_dim, action_dim, lr=0.001, gamma=0.99, epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.1):
+    def __init__(self, input_dim, action_dim, lr=0.001, gamma=0.99, epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.1,
+                 replay_buffer=None, batch_size=64, train_every=4, target_update_every=500):
+        """
+        replay_buffer: Optional ReplayBuffer (or PrioritizedReplayBuffer). When set, `update`
+                       stores each transition and trains on sampled minibatches instead of
+                       on the single transition.
+        batch_size: Minibatch size for replay updates.
+        train_every: Number of stored transitions between two minibatch updates.
+        target_update_every: Number of minibatch updates between target network syncs.
+        """
         self.q_network = DQN(input_dim, action_dim)
         self.target_network = DQN(input_dim, action_dim)
         self.optimizer = optim.Adam(self.q_network.parameters(), lr=lr)
@@ -17,53 +27,75 @@ class AzulAgent:
         self.epsilon_decay = epsilon_decay
         self.epsilon_min = epsilon_min
 
-    def mask_invalid_actions(self, q_values, valid_action_indices):
+        self.replay_buffer = replay_buffer
+        self.batch_size = batch_size
+        self.train_every = train_every
+        self.target_update_every = target_update_every
+        self.transitions_seen = 0
+        self.batch_updates = 0
+        self.losses = []  # Loss of every update since the trainer last collected them
+        if replay_buffer is not None:
+            self.target_network.load_state_dict(self.q_network.state_dict())
+
+    def mask_invalid_actions(self, q_values, valid_action_mask):
         """
         Mask invalid actions by setting their Q-values to a very low value.
+        `valid_action_mask` is the environment's boolean legal-action mask.
         """
-
-        mask = np.ones(q_values.shape, dtype=bool)
-        mask[valid_action_indices] = False
-        q_values[mask] = -np.inf  # Set invalid actions to a very low value
+        q_values[~valid_action_mask] = -np.inf  # Set invalid actions to a very low value
         return q_values
 
+    @profile_stage("AzulAgent.select_action_index")
     def select_action_index(self, state, env, player_idx):
         """
         Select an action index using epsilon-greedy policy, with masking for valid actions.
         """
-        valid_action_indices = env.get_valid_action_indices()
+        valid_action_mask = env.get_valid_action_mask(player_idx)
 
-        if not valid_action_indices:
+        if not valid_action_mask.any():
             raise ValueError("No valid actions available to select from.")
 
         if random.random() < self.epsilon:
-            selected_index = random.choice(valid_action_indices)  # Explore
+            selected_index = random.choice(np.flatnonzero(valid_action_mask))  # Explore
         else:
             with torch.no_grad():
-                state_tensor = torch.FloatTensor(state).unsqueeze(0)
+                state_tensor = torch.as_tensor(state, dtype=torch.float32).unsqueeze(0)  # No copy for float32 arrays
                 q_values = self.q_network(state_tensor).detach().numpy()[0]
-                q_values = self.mask_invalid_actions(q_values, valid_action_indices)
+                q_values = self.mask_invalid_actions(q_values, valid_action_mask)
                 selected_index = np.argmax(q_values)  # Exploit
 
         return selected_index
 
 
-    def update(self, state, action_index, reward, next_state, done):
+    @profile_stage("AzulAgent.update")
+    def update(self, state, action_index, reward, next_state, done, next_valid_mask=None):
         """
         Update the Q-network using the Bellman equation.
+        `next_valid_mask` restricts the max over next-state actions to the legal ones.
         """
 
         if isinstance(action_index, tuple):
             raise ValueError(f"Expected action as an integer index, but got tuple: {action_index}")
 
-        state = torch.FloatTensor(state).unsqueeze(0)
-        next_state = torch.FloatTensor(next_state).unsqueeze(0)
+        if self.replay_buffer is not None:
+            self.replay_buffer.add(state, action_index, reward, next_state, done, next_valid_mask)
+            self.transitions_seen += 1
+            if len(self.replay_buffer) >= self.batch_size and self.transitions_seen % self.train_every == 0:
+                self.losses.append(self.update_batch(self.replay_buffer.sample(self.batch_size)))
+            self.epsilon = max(self.epsilon * self.epsilon_decay, self.epsilon_min)
+            return
+
+        state = torch.as_tensor(state, dtype=torch.float32).unsqueeze(0)
+        next_state = torch.as_tensor(next_state, dtype=torch.float32).unsqueeze(0)
         reward = torch.FloatTensor([reward])
         done = torch.FloatTensor([done])
 
         # Compute target Q-value
         with torch.no_grad():
-            max_next_q = torch.max(self.target_network(next_state))
+            next_q = self.target_network(next_state)
+            if next_valid_mask is not None and np.any(next_valid_mask):
+                next_q = next_q[0, torch.as_tensor(next_valid_mask)]
+            max_next_q = torch.max(next_q)
             target_q = reward + self.gamma * max_next_q * (1 - done)
 
         # Compute current Q-value
@@ -74,6 +106,69 @@ class AzulAgent:
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
+        self.losses.append(loss.item())
 
         # Update epsilon
         self.epsilon = max(self.epsilon * self.epsilon_decay, self.epsilon_min)
+
+    def update_batch(self, batch):
+        """
+        One gradient step on a minibatch from ReplayBuffer.sample.
+        Returns the loss value.
+        """
+        states = torch.from_numpy(batch["states"]).float()
+        next_states = torch.from_numpy(batch["next_states"]).float()
+        actions = torch.from_numpy(batch["actions"])
+        rewards = torch.from_numpy(batch["rewards"])
+        dones = torch.from_numpy(batch["dones"]).float()
+        next_masks = torch.from_numpy(batch["next_masks"])
+
+        # Compute target Q-values over the legal next actions only
+        with torch.no_grad():
+            next_q = self.target_network(next_states).masked_fill(~next_masks, -float("inf"))
+            max_next_q = next_q.max(dim=1).values
+            max_next_q = torch.where(next_masks.any(dim=1), max_next_q, torch.zeros_like(max_next_q))
+            target_q = rewards + self.gamma * max_next_q * (1 - dones)
+
+        # Compute current Q-values of the taken actions
+        current_q = self.q_network(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+
+        if "weights" in batch:
+            # Prioritized replay: importance-sampling weighted loss, then new priorities from the TD errors
+            weights = torch.from_numpy(batch["weights"])
+            td_errors = target_q - current_q
+            loss = (weights * td_errors.pow(2)).mean()
+            self.replay_buffer.update_priorities(batch["indices"], td_errors.detach().numpy())
+        else:
+            loss = self.criterion(current_q, target_q)
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
+        self.batch_updates += 1
+        if self.batch_updates % self.target_update_every == 0:
+            self.target_network.load_state_dict(self.q_network.state_dict())
+
+        return loss.item()
+
+    def state_dict(self):
+        """
+        Networks, optimizer and exploration schedule; the replay buffer is saved separately
+        (see Checkpointer).
+        """
+        return {
+            "q_network": self.q_network.state_dict(),
+            "target_network": self.target_network.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "epsilon": self.epsilon,
+            "transitions_seen": self.transitions_seen,
+            "batch_updates": self.batch_updates,
+        }
+
+    def load_state_dict(self, state):
+        self.q_network.load_state_dict(state["q_network"])
+        self.target_network.load_state_dict(state["target_network"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.epsilon = state["epsilon"]
+        self.transitions_seen = state["transitions_seen"]
+        self.batch_updates = state["batch_updates"]
@@ -0,0 +1,199 @@
+import copy
+import json
+import os
+import random
+import shutil
+import threading
+import numpy as np
+import torch
+
+LATEST_FILE = "LATEST"
+
+
+def write_file(path, write, mode="wb"):
+    """
+    Write a file through `write(file)` and flush it to disk.
+    """
+    with open(path, mode) as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class Checkpointer:
+    def __init__(self, directory, keep=2):
+        """
+        Periodic training checkpoints: agent networks, optimizers and exploration
+        schedules (agent.state_dict), replay buffers and the random number generators.
+
+        Each checkpoint is a directory checkpoint-<step>/ holding agents.pt (torch), state.json
+        (scalars and generator states) and one .npy file per replay array. It is written
+        under a temporary name and renamed when complete; the LATEST file, replaced
+        atomically afterwards, names the newest complete checkpoint. An interrupted write
+        therefore never replaces a good checkpoint.
+
+        Saving copies only the agents' state on the calling thread. The replay buffers are
+        written from their live arrays by a background thread under a copy-on-write
+        snapshot (see ReplayBuffer.begin_snapshot): training keeps adding transitions, and
+        the rows it overwrites meanwhile are patched back into the files afterwards, so
+        save() costs the same for any buffer size. On load the replay arrays are memory
+        mapped (copy-on-write), so resuming does not read the whole buffer up front.
+
+        keep: Number of most recent checkpoints kept on disk.
+        """
+        self.directory = directory
+        self.keep = keep
+        self.writer = None  # Background thread of the write in progress
+        self.error = None  # Exception raised by the last background write
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, step, agents, buffers, training_state=None, blocking=False):
+        """
+        Checkpoint `agents` (objects with state_dict) and `buffers` (ReplayBuffers) at
+        `step`. If the previous checkpoint is still being written the save is skipped,
+        unless `blocking`, which waits for it and for this one. Returns True if saved.
+        """
+        if self.writer is not None and self.writer.is_alive():
+            if not blocking:
+                print(f"Checkpoint {step} skipped, the previous checkpoint is still being written.")
+                return False
+        self.wait()
+
+        buffer_snapshots = [buffer.begin_snapshot() for buffer in buffers]
+        snapshot = {
+            "step": step,
+            "agents": [copy.deepcopy(agent.state_dict()) for agent in agents],
+            "torch_rng": torch.get_rng_state(),
+            "state": {
+                "step": step,
+                "training_state": training_state or {},
+                "python_rng": random.getstate(),
+                "numpy_rng": [value.tolist() if isinstance(value, np.ndarray) else value
+                              for value in np.random.get_state()],
+                "buffers": [buffer_state for buffer_state, _ in buffer_snapshots],
+            },
+            "buffers": buffers,
+            "arrays": [arrays for _, arrays in buffer_snapshots],
+        }
+
+        self.writer = threading.Thread(target=self.write_checkpoint, args=(snapshot,), daemon=True)
+        self.writer.start()
+        if blocking:
+            self.wait()
+        return True
+
+    def wait(self):
+        """
+        Wait for the write in progress, re-raising its error if it failed.
+        """
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Writing the checkpoint failed.") from error
+
+    def close(self):
+        self.wait()
+
+    def write_checkpoint(self, snapshot):
+        open_buffers = list(snapshot["buffers"])
+        try:
+            name = f"checkpoint-{snapshot['step']:08d}"
+            final_path = os.path.join(self.directory, name)
+            temp_path = os.path.join(self.directory, f".{name}.tmp")
+            if os.path.exists(temp_path):
+                shutil.rmtree(temp_path)
+            os.makedirs(temp_path)
+
+            write_file(
+                os.path.join(temp_path, "agents.pt"),
+                lambda file: torch.save({"agents": snapshot["agents"], "torch_rng": snapshot["torch_rng"]}, file)
+            )
+            write_file(os.path.join(temp_path, "state.json"), lambda file: json.dump(snapshot["state"], file), "w")
+            for buffer_idx, (buffer, arrays) in enumerate(zip(snapshot["buffers"], snapshot["arrays"])):
+                paths = {
+                    array_name: os.path.join(temp_path, f"buffer{buffer_idx}_{array_name}.npy") for array_name in arrays
+                }
+                for array_name, array in arrays.items():
+                    write_file(paths[array_name], lambda file: np.save(file, array))  # Live rows, patched below
+                open_buffers.remove(buffer)
+                for array_name, rows in buffer.end_snapshot().items():
+                    if rows:
+                        saved = np.load(paths[array_name], mmap_mode="r+")
+                        for slot, row in rows.items():
+                            saved[slot] = row
+                        saved.flush()
+                        del saved
+
+            if os.path.exists(final_path):
+                shutil.rmtree(final_path)
+            os.rename(temp_path, final_path)
+
+            latest_temp = os.path.join(self.directory, f".{LATEST_FILE}.tmp")
+            write_file(latest_temp, lambda file: file.write(name), "w")
+            os.replace(latest_temp, os.path.join(self.directory, LATEST_FILE))
+
+            self.prune(name)
+        except Exception as error:
+            self.error = error
+        finally:
+            for buffer in open_buffers:  # After a failed write
+                buffer.end_snapshot()
+
+    def prune(self, latest_name):
+        checkpoints = sorted(
+            entry for entry in os.listdir(self.directory)
+            if entry.startswith("checkpoint-") and entry != latest_name
+        )
+        for entry in checkpoints[:max(0, len(checkpoints) - (self.keep - 1))]:
+            shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def latest(self):
+        """
+        Path of the newest complete checkpoint, or None.
+        """
+        try:
+            with open(os.path.join(self.directory, LATEST_FILE), "r") as file:
+                name = file.read().strip()
+        except FileNotFoundError:
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isdir(path) else None
+
+    def load(self, agents, buffers, path=None):
+        """
+        Restore `agents`, `buffers` and the random number generators from a checkpoint
+        (default: the latest). Returns the saved training_state with its "step", or None
+        if there is no checkpoint.
+        """
+        path = path or self.latest()
+        if path is None:
+            return None
+
+        with open(os.path.join(path, "state.json"), "r") as file:
+            state = json.load(file)
+        saved = torch.load(os.path.join(path, "agents.pt"), map_location="cpu")
+        if len(saved["agents"]) != len(agents) or len(state["buffers"]) != len(buffers):
+            raise ValueError(f"Checkpoint {path} holds {len(saved['agents'])} agents and {len(state['buffers'])} "
+                             f"buffers, expected {len(agents)} and {len(buffers)}.")
+
+        for agent, agent_state in zip(agents, saved["agents"]):
+            agent.load_state_dict(agent_state)
+        for buffer_idx, (buffer, buffer_state) in enumerate(zip(buffers, state["buffers"])):
+            prefix = f"buffer{buffer_idx}_"
+            arrays = {
+                entry[len(prefix):-len(".npy")]: np.load(os.path.join(path, entry), mmap_mode="c")
+                for entry in os.listdir(path) if entry.startswith(prefix) and entry.endswith(".npy")
+            }
+            buffer.load_state_dict(buffer_state, arrays)
+
+        torch.set_rng_state(saved["torch_rng"])
+        random.setstate(tuple(tuple(value) if isinstance(value, list) else value for value in state["python_rng"]))
+        numpy_rng = state["numpy_rng"]
+        np.random.set_state((numpy_rng[0], np.array(numpy_rng[1], dtype=np.uint32), *numpy_rng[2:]))
+
+        training_state = dict(state["training_state"])
+        training_state["step"] = state["step"]
+        print(f"Resumed from checkpoint {path}.")
+        return training_state
@@ -0,0 +1,179 @@
+import copy
+import os
+import random
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+class InferencePolicy:
+    def __init__(self, q_network, quantize=False, max_batch_size=64, epsilon=0.0, seed=None, input_dim=None):
+        """
+        Acting-only epsilon-greedy policy over a frozen TorchScript copy of a trained DQN,
+        with the AzulAgent interface (update is a no-op) so it can play in
+        MultiAgentAzulEnv, actors and the arena.
+
+        Observations are written into a preallocated input tensor and the scripted module
+        runs under inference mode, so a decision allocates no autograd state and only the
+        Q-value output per call.
+
+        q_network: A DQN (or any nn.Module mapping [batch, input_dim] to Q-values), or an
+                   already exported ScriptModule (see save/load), which needs input_dim.
+        quantize: Dynamically quantize the Linear layers to int8 before scripting; smaller
+                  and faster on CPU at a small loss of precision.
+        max_batch_size: Rows of the preallocated input; larger batches are split.
+        epsilon: Exploration rate, 0 for greedy play.
+        """
+        if isinstance(q_network, torch.jit.ScriptModule):
+            if input_dim is None:
+                raise ValueError("An exported policy module needs its input_dim.")
+            self.module = q_network
+        else:
+            linear_layers = [module for module in q_network.modules() if isinstance(module, nn.Linear)]
+            if not linear_layers:
+                raise ValueError("The Q-network has no Linear layer to infer the input dimension from.")
+            input_dim = linear_layers[0].in_features
+            self.module = self.export(q_network, quantize)
+
+        self.input_dim = input_dim
+        self.quantize = quantize
+        self.max_batch_size = max_batch_size
+        self.epsilon = epsilon
+        self.rng = random.Random(seed)
+        self.inputs = torch.zeros(max_batch_size, input_dim)
+        self.input_array = self.inputs.numpy()  # Shares memory with self.inputs
+
+    @staticmethod
+    def export(q_network, quantize):
+        """
+        Frozen TorchScript copy of `q_network` (int8 Linear layers with `quantize`).
+        """
+        module = copy.deepcopy(q_network).cpu().eval()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)  # Deprecation notices of TorchScript
+            warnings.simplefilter("ignore", UserWarning)  # and of the eager quantization API
+            if quantize:
+                module = torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+            return torch.jit.freeze(torch.jit.script(module))
+
+    @classmethod
+    def from_agent(cls, agent, **kwargs):
+        return cls(agent.q_network, **kwargs)
+
+    @classmethod
+    def from_checkpoint(cls, path, input_dim, action_dim, seat=None, **kwargs):
+        """
+        Policy from a DQN checkpoint: a state dict saved with torch.save, a dict holding one
+        under "q_network" (AzulAgent.state_dict), or Checkpointer output (a checkpoint
+        directory, the directory of several, or its agents.pt). A Checkpointer checkpoint
+        holds one agent per seat, or one MultiSeatAgent whose StackedDQN is sliced to the
+        seat; pick the seat with `seat` or a "#<seat>" suffix on the path.
+        """
+        from ml.DQN_class import DQN
+        from ml.StackedDQN_class import is_stacked_state_dict, seat_state_dict
+
+        path, seat = checkpoint_path(path, seat)
+        saved = torch.load(path, map_location="cpu")
+        if "agents" in saved:  # Written by Checkpointer
+            agents = saved["agents"]
+            if len(agents) > 1:
+                if seat is None:
+                    raise ValueError(f"{path} holds {len(agents)} agents, pick one with a seat (path#seat).")
+                if not 0 <= seat < len(agents):
+                    raise ValueError(f"Seat {seat} is out of range for the {len(agents)} agents in {path}.")
+            saved = agents[seat if len(agents) > 1 else 0]
+        state_dict = saved.get("q_network", saved)
+        if is_stacked_state_dict(state_dict):
+            if seat is None:
+                raise ValueError(f"{path} holds a network for every seat, pick one with a seat (path#seat).")
+            state_dict = seat_state_dict(state_dict, seat)
+        q_network = DQN(input_dim, action_dim)
+        q_network.load_state_dict(state_dict)
+        return cls(q_network, **kwargs)
+
+    def save(self, path):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            torch.jit.save(self.module, path, _extra_files={"input_dim": str(self.input_dim)})
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Policy from a module written by save (no Python model code needed).
+        """
+        extra_files = {"input_dim": ""}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            module = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+        return cls(module, input_dim=int(extra_files["input_dim"]), **kwargs)
+
+    def q_values(self, states):
+        """
+        Q-values ([batch, action_dim] NumPy array) of a batch of encoded states.
+        """
+        states = np.asarray(states)
+        if states.ndim == 1:
+            states = states[None]
+        outputs = []
+        with torch.inference_mode():
+            for start in range(0, len(states), self.max_batch_size):
+                rows = min(self.max_batch_size, len(states) - start)
+                self.input_array[:rows] = states[start:start + rows]
+                outputs.append(self.module(self.inputs[:rows]).numpy())
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def select_action_indices(self, states, valid_action_masks):
+        """
+        Epsilon-greedy legal action index for every row of a batch, in one network call
+        per max_batch_size rows.
+        """
+        valid_action_masks = np.asarray(valid_action_masks, dtype=bool)
+        q_values = self.q_values(states)
+        q_values[~valid_action_masks] = -np.inf
+        actions = np.argmax(q_values, axis=1)
+        if self.epsilon > 0:
+            for row in range(len(actions)):
+                if self.rng.random() < self.epsilon:
+                    actions[row] = self.rng.choice(np.flatnonzero(valid_action_masks[row]))  # Explore
+        return actions
+
+    def select_action_index(self, state, env, player_idx):
+        valid_action_mask = env.get_valid_action_mask(player_idx)
+        if not valid_action_mask.any():
+            raise ValueError("No valid actions available to select from.")
+        if self.epsilon > 0 and self.rng.random() < self.epsilon:
+            return int(self.rng.choice(np.flatnonzero(valid_action_mask)))  # Explore
+
+        with torch.inference_mode():
+            self.input_array[0] = state
+            q_values = self.module(self.inputs[:1]).numpy()[0]
+        q_values[~valid_action_mask] = -np.inf
+        return int(np.argmax(q_values))
+
+    def update(self, state, action_index, reward, next_state, done, next_valid_mask=None):
+        """
+        InferencePolicy does not learn; train the source network and export it again.
+        """
+        return
+
+
+def checkpoint_path(path, seat=None):
+    """
+    (file, seat) of a from_checkpoint path: a "#<seat>" suffix is split off and
+    Checkpointer directories resolve to the agents.pt of their latest checkpoint.
+    """
+    from ml.Checkpointer_class import LATEST_FILE
+
+    path = str(path)
+    if "#" in path and seat is None:
+        path, seat = path.rsplit("#", 1)
+        if not seat.isdigit():
+            raise ValueError(f"Expected a seat number after '#', got {seat!r}.")
+        seat = int(seat)
+    if os.path.isdir(path) and os.path.exists(os.path.join(path, LATEST_FILE)):
+        with open(os.path.join(path, LATEST_FILE), "r") as file:
+            path = os.path.join(path, file.read().strip())
+    if os.path.isdir(path):
+        path = os.path.join(path, "agents.pt")
+    return path, seat
@@ -0,0 +1,372 @@
+import math
+import random
+import time
+import numpy as np
+import torch
+from ml.DQN_class import DQN
+from ml.StackedDQN_class import StackedDQN
+from helper_functions.LegalActionMask_class import LegalActionMask
+from helper_functions.helper_functions import encode_board_state, evaluate_board_state
+
+
+class MCTSNode:
+    """
+    Decision node: a position with `player` to move. Statistics are kept per player,
+    value_sum[p] being the summed value of the visits from player p's point of view.
+    """
+    __slots__ = ("visits", "value_sum", "player", "priors", "children", "expanded", "terminal_value")
+
+    def __init__(self, num_players):
+        self.visits = 0
+        self.value_sum = [0.0] * num_players
+        self.player = None
+        self.priors = None  # List of (action index, prior probability), set on expansion
+        self.children = {}  # Action index -> MCTSNode, or ChanceNode if the action ends the round
+        self.expanded = False
+        self.terminal_value = None  # Per-player values if the game is over here
+
+
+class ChanceNode:
+    """
+    The random refill after a round-ending action. Children are keyed by the refill
+    outcome (GameState.refill_key), so each sampled outcome gets its own subtree.
+    """
+    __slots__ = ("visits", "value_sum", "outcomes")
+
+    def __init__(self, num_players):
+        self.visits = 0
+        self.value_sum = [0.0] * num_players
+        self.outcomes = {}
+
+
+class MCTSAgent:
+    def __init__(self, input_dim, action_dim, num_players, q_network=None, num_simulations=200, time_budget=None,
+                 batch_size=16, c_puct=1.5, virtual_loss=1.0, value_scale=10.0, prior_temperature=1.0,
+                 transposition_table=None, seed=None):
+        """
+        Monte Carlo Tree Search agent with the AzulAgent interface, guided by a DQN.
+
+        Leaves are evaluated by the Q-network: the softmax of the legal Q-values gives the
+        priors of the leaf's actions and the best legal Q-value its value for the player
+        to move (the other players get the negated share, as in evaluate_board_state).
+        Selections are made `batch_size` at a time with virtual loss so that all their
+        leaves are evaluated in a single forward pass. Round-ending actions lead to chance
+        nodes whose children are keyed by the sampled refill. The subtree of the actually
+        played moves is reused for the next search (via env.action_history). Positions
+        reached through different move orders share one node (keyed by
+        GameState.zobrist_hash), so the tree is a DAG and no position is searched twice.
+
+        q_network: A DQN shared by all seats or a StackedDQN (one head per seat).
+                   Defaults to a freshly initialised DQN.
+        num_simulations: Simulations per move (None to rely on time_budget only).
+        time_budget: Seconds per move (None to rely on num_simulations only).
+        value_scale: Values are squashed with tanh(value / value_scale).
+        transposition_table: Optional TranspositionTable (one value per player) that keeps
+                             the result of every search; a position already searched with
+                             at least the current budget is answered from the table.
+        seed: Seed of the generator that samples the refills during search. The game
+              state draws from it instead of its own generator while searching, so the
+              search neither sees nor changes the tiles of the real game.
+        """
+        if num_simulations is None and time_budget is None:
+            raise ValueError("MCTSAgent needs a simulation budget, a time budget or both.")
+        if transposition_table is not None and transposition_table.num_values != num_players:
+            raise ValueError("The transposition table must store one value per player.")
+        self.num_players = num_players
+        self.action_dim = action_dim
+        self.q_network = q_network if q_network is not None else DQN(input_dim, action_dim)
+        self.input_dim = input_dim
+        self.num_simulations = num_simulations
+        self.time_budget = time_budget
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.value_scale = value_scale
+        self.prior_temperature = prior_temperature
+        self.epsilon = 0.0  # Kept for code that reads an agent's exploration rate
+        self.transposition_table = transposition_table
+        self.rng = random.Random(seed)
+        self.nodes = {}  # Zobrist hash -> MCTSNode of the current tree
+        self.legal_mask = None  # LegalActionMask kept in step with the descents
+        self.root_masks = None  # Its state at the root, see LegalActionMask.copy_state
+
+        self.root = None
+        self.root_history = None  # env.action_history the root belongs to
+        self.root_history_length = 0
+        self.last_search = {}
+
+    def select_action_index(self, state, env, player_idx):
+        """
+        Search from the current position and return the most visited legal action.
+        """
+        valid_action_mask = env.get_valid_action_mask(player_idx)
+        if not valid_action_mask.any():
+            raise ValueError("No valid actions available to select from.")
+
+        table = self.transposition_table
+        if table is not None:
+            entry = table.get(env.game_state.zobrist_hash)
+            if entry is not None:
+                _, depth, best_move = entry
+                if depth >= (self.num_simulations or 1) and valid_action_mask[best_move]:
+                    self.last_search = {"simulations": 0, "transposition_hit": True}
+                    return best_move
+
+        root = self.search(env, player_idx)
+        best_index, best_key = None, None
+        for action_index, prior in root.priors:
+            if not valid_action_mask[action_index]:
+                continue
+            child = root.children.get(action_index)
+            key = (child.visits if child is not None else 0, prior)
+            if best_key is None or key > best_key:
+                best_index, best_key = action_index, key
+        if best_index is None:
+            best_index = int(np.flatnonzero(valid_action_mask)[0])
+
+        if table is not None:
+            table.new_search()
+            values = [value / root.visits for value in root.value_sum]
+            table.store(env.game_state.zobrist_hash, values, root.visits, best_index)
+        return best_index
+
+    def update(self, state, action_index, reward, next_state, done, next_valid_mask=None):
+        """
+        MCTSAgent does not learn from its own moves; train the Q-network separately.
+        """
+        return
+
+    def search(self, env, player_idx):
+        """
+        Run the simulation budget from the current position of `env`. The game state is
+        walked with apply_action/undo and is unchanged when the search returns.
+        """
+        game_state = env.game_state
+        root, reused = self.reuse_root(env, player_idx)
+
+        if self.legal_mask is None or self.legal_mask.game_state is not game_state:
+            self.legal_mask = LegalActionMask(game_state)
+        else:
+            self.legal_mask.refresh()
+        self.root_masks = self.legal_mask.copy_state()  # Restored after every descent
+
+        observation = game_state.observation
+        game_state.observation = None  # Leaves are encoded on demand, skip the incremental updates
+        game_rng, game_state.rng = game_state.rng, self.rng  # Refills during search come from self.rng
+        max_simulations = self.num_simulations if self.num_simulations is not None else math.inf
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget is not None else math.inf
+        simulations = 0
+        try:
+            while not root.expanded or (simulations < max_simulations and time.perf_counter() < deadline):
+                batch_size = int(min(self.batch_size, max(max_simulations - simulations, 1)))
+                simulations += self.run_batch(game_state, root, batch_size)
+        finally:
+            game_state.observation = observation
+            game_state.rng = game_rng
+
+        self.root = root
+        self.root_history = env.action_history
+        self.root_history_length = len(env.action_history)
+        self.last_search = {
+            "simulations": simulations,
+            "seconds": time.perf_counter() - start,
+            "reused_visits": reused,
+            "root_visits": root.visits,
+        }
+        return root
+
+    def reuse_root(self, env, player_idx):
+        """
+        Follow the moves played since the last search down the previous tree. Returns the
+        matching node (or a new one) and the number of visits it already has.
+        """
+        node = None
+        if self.root is not None and env.action_history is self.root_history:
+            node = self.root
+            for action_index, refill_key in env.action_history[self.root_history_length:]:
+                child = node.children.get(action_index)
+                if isinstance(child, ChanceNode):
+                    child = child.outcomes.get(refill_key)
+                if child is None:
+                    node = None
+                    break
+                node = child
+        if node is None or (node.expanded and node.player != player_idx):
+            self.nodes = {}  # Start a new tree
+            node = self.nodes.get(env.game_state.zobrist_hash)
+            if node is None:
+                node = self.nodes[env.game_state.zobrist_hash] = MCTSNode(self.num_players)
+        return node, node.visits
+
+    def get_node(self, game_state):
+        """
+        The node of the game state's position, shared by every path that reaches it.
+        """
+        node = self.nodes.get(game_state.zobrist_hash)
+        if node is None:
+            node = self.nodes[game_state.zobrist_hash] = MCTSNode(self.num_players)
+        return node
+
+    def run_batch(self, game_state, root, batch_size):
+        """
+        Select up to `batch_size` leaves with virtual loss, evaluate the new ones in one
+        network call, then expand them and back up the values. Returns the number of
+        simulations run.
+        """
+        pending = {}  # id(leaf) -> [leaf, player, observation, legal mask, paths]
+        for _ in range(batch_size):
+            path, leaf, leaf_entry = self.descend(game_state, root)
+            self.rng.random()  # Undo rewinds the generator; step it so the next descent samples new refills
+            if leaf_entry is None:  # Terminal leaf, value known right away
+                self.backup(path, leaf.terminal_value)
+                continue
+            entry = pending.get(id(leaf))
+            if entry is None:
+                pending[id(leaf)] = [leaf, *leaf_entry, [path]]
+            else:
+                entry[4].append(path)  # Same leaf selected twice, evaluate it once
+
+        if pending:
+            entries = list(pending.values())
+            observations = np.stack([entry[2] for entry in entries])
+            masks = np.stack([entry[3] for entry in entries])
+            players = np.array([entry[1] for entry in entries])
+            priors, values = self.evaluate_leaves(observations, masks, players)
+            for row, (leaf, player, _, mask, paths) in enumerate(entries):
+                legal = np.flatnonzero(mask)
+                leaf.player = int(player)
+                leaf.priors = list(zip(legal.tolist(), priors[row, legal].tolist()))
+                leaf.expanded = True
+                value = self.leaf_values(player, values[row])
+                for path in paths:
+                    self.backup(path, value)
+        return batch_size
+
+    def descend(self, game_state, root):
+        """
+        Walk from the root to a leaf, applying the moves to the game state and adding
+        virtual loss along the way, then undo the moves. The legal-action mask follows the
+        moves incrementally and is reset to the root's afterwards. Returns the path, the
+        leaf and, for a leaf that needs evaluation, its (player, observation, legal mask).
+        """
+        path = [(root, None)]
+        root.visits += 1
+        tokens = []
+        node = root
+        mapper = game_state.action_space_mapper
+        legal_mask = self.legal_mask
+        while node.expanded and node.terminal_value is None:
+            action_index = self.select_child(node)
+            token = game_state.apply_action(mapper.index_to_action(action_index), resolve_round=True)
+            tokens.append(token)
+            update_legal_mask(legal_mask, token)
+
+            child = node.children.get(action_index)
+            if token[-1] is not None:  # The move ended the round, the refill is a chance event
+                if child is None:
+                    child = node.children[action_index] = ChanceNode(self.num_players)
+                self.add_virtual_loss(path, child, node.player)
+                outcome_key = game_state.refill_key()
+                outcome = child.outcomes.get(outcome_key)
+                if outcome is None:
+                    outcome = child.outcomes[outcome_key] = self.get_node(game_state)
+                outcome.visits += 1
+                path.append((outcome, None))
+                node = outcome
+            else:
+                if child is None:
+                    child = node.children[action_index] = self.get_node(game_state)
+                self.add_virtual_loss(path, child, node.player)
+                node = child
+
+        leaf_entry = None
+        if node.terminal_value is None:
+            if game_state.is_game_over():
+                node.terminal_value = [
+                    math.tanh(evaluate_board_state(game_state, player_idx) / self.value_scale)
+                    for player_idx in range(self.num_players)
+                ]
+                node.expanded = True
+            else:
+                player_idx = game_state.current_player
+                leaf_entry = (player_idx, encode_board_state(game_state), legal_mask.get_mask(player_idx).copy())
+
+        for token in reversed(tokens):
+            game_state.undo(token)
+        legal_mask.load_state(self.root_masks)
+        return path, node, leaf_entry
+
+    def add_virtual_loss(self, path, child, player_idx):
+        child.visits += 1
+        child.value_sum[player_idx] -= self.virtual_loss
+        path.append((child, player_idx))
+
+    def select_child(self, node):
+        """
+        PUCT selection for the player to move at `node`.
+        """
+        player_idx = node.player
+        sqrt_visits = math.sqrt(node.visits)
+        first_play_value = node.value_sum[player_idx] / node.visits if node.visits else 0.0
+        best_index, best_score = None, -math.inf
+        for action_index, prior in node.priors:
+            child = node.children.get(action_index)
+            if child is None or child.visits == 0:
+                score = first_play_value + self.c_puct * prior * sqrt_visits
+            else:
+                score = child.value_sum[player_idx] / child.visits + self.c_puct * prior * sqrt_visits / (1 + child.visits)
+            if score > best_score:
+                best_index, best_score = action_index, score
+        return best_index
+
+    def backup(self, path, value):
+        """
+        Add the per-player leaf value to every node of the path and remove the virtual loss.
+        Visit counts were already incremented during the descent.
+        """
+        for node, player_idx in path:
+            for value_player, player_value in enumerate(value):
+                node.value_sum[value_player] += player_value
+            if player_idx is not None:
+                node.value_sum[player_idx] += self.virtual_loss
+
+    def leaf_values(self, player_idx, value):
+        """
+        Per-player values of a leaf worth `value` to the player to move.
+        """
+        value = math.tanh(value / self.value_scale)
+        share = -value / (self.num_players - 1) if self.num_players > 1 else 0.0
+        return [value if other == player_idx else share for other in range(self.num_players)]
+
+    def evaluate_leaves(self, observations, masks, players):
+        """
+        One forward pass for a batch of leaves. Returns the priors over the legal actions
+        and the best legal Q-value of each leaf.
+        """
+        with torch.no_grad():
+            states = torch.as_tensor(observations, dtype=torch.float32)
+            if isinstance(self.q_network, StackedDQN):
+                q_values = self.q_network.forward_seats(states, torch.as_tensor(players))
+            else:
+                q_values = self.q_network(states)
+        q_values = q_values.numpy().astype(np.float64)
+        q_values[~masks] = -np.inf
+
+        values = q_values.max(axis=1)
+        logits = (q_values - values[:, None]) / self.prior_temperature
+        priors = np.exp(logits)
+        priors /= priors.sum(axis=1, keepdims=True)
+        return priors, values
+
+
+def update_legal_mask(legal_mask, token):
+    """
+    Bring a LegalActionMask in step with the move of undo token `token`: the move's
+    entries are recomputed, or every entry after a round end.
+    """
+    player_idx, factory_idx, pattern_line_idx, round_snapshot = token[0], token[1], token[5], token[-1]
+    if round_snapshot is not None:
+        legal_mask.refresh()
+    else:
+        legal_mask.update_action(player_idx, factory_idx, pattern_line_idx)
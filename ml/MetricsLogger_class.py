@@ -0,0 +1,144 @@
+import os
+import pathlib
+import queue
+import threading
+import time
+from helper_functions.DownsampledSeries_class import DownsampledSeries
+
+MLFLOW_BATCH_LIMIT = 1000  # Metrics per MlflowClient.log_batch call
+
+
+class MetricsLogger:
+    def __init__(self, tracking_dir="mlruns", experiment="azul-self-play", run_name=None, params=None,
+                 flush_interval=5.0, max_queue=100_000, max_points=2000):
+        """
+        Non-blocking metrics for the training loop. `log` only enqueues; a background
+        thread adds the values to in-memory downsampled series (see `series`, for
+        plot_metrics) and writes them in batches to a local file-based MLflow store.
+        When the queue is full new values are dropped and counted in `dropped`, so
+        logging never stalls self-play; MLflow errors are counted in `errors` and kept
+        in `last_error`.
+
+        tracking_dir: Directory of the MLflow file store, or None to keep the series only.
+        params: Run parameters recorded once (for example the training arguments).
+        flush_interval: Seconds between writes to the store.
+        max_queue: Logged steps waiting for the background thread at most.
+        max_points: Points per downsampled series.
+        """
+        self.client = None
+        self.run_id = None
+        if tracking_dir is not None:
+            from mlflow.tracking import MlflowClient  # Imported on use, the engine does not need mlflow
+
+            self.client = MlflowClient(tracking_uri=pathlib.Path(tracking_dir).resolve().as_uri())
+            found = self.client.get_experiment_by_name(experiment)
+            experiment_id = found.experiment_id if found is not None else self.client.create_experiment(experiment)
+            self.run_id = self.client.create_run(experiment_id, run_name=run_name).info.run_id
+            if params:
+                self.log_params(params)
+
+        self.flush_interval = flush_interval
+        self.max_points = max_points
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.series_lock = threading.Lock()
+        self.metric_series = {}
+        self.pending = []  # MLflow Metric entities waiting for the next flush
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="metrics-logger", daemon=True)
+        self.thread.start()
+
+    def log_params(self, params):
+        from mlflow.entities import Param
+
+        params = [Param(key, str(value)) for key, value in params.items()]
+        for start in range(0, len(params), 100):
+            self.client.log_batch(self.run_id, params=params[start:start + 100])
+
+    def log(self, step, metrics):
+        """
+        Queue a dict of metric name -> number for `step`. Never blocks.
+        """
+        try:
+            self.queue.put_nowait((step, int(time.time() * 1000), metrics))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        stop = False
+        while not stop:
+            try:
+                item = self.queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            if item is None:  # Sentinel from close
+                stop = True
+            elif item:
+                self.record(*item)
+            if stop or time.monotonic() >= next_flush or len(self.pending) >= MLFLOW_BATCH_LIMIT:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def record(self, step, timestamp, metrics):
+        with self.series_lock:
+            for name, value in metrics.items():
+                series = self.metric_series.get(name)
+                if series is None:
+                    series = self.metric_series[name] = DownsampledSeries(self.max_points)
+                series.append(step, float(value))
+        if self.client is not None:
+            from mlflow.entities import Metric
+
+            self.pending.extend(Metric(name, float(value), timestamp, step) for name, value in metrics.items())
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        for start in range(0, len(pending), MLFLOW_BATCH_LIMIT):
+            try:
+                self.client.log_batch(self.run_id, metrics=pending[start:start + MLFLOW_BATCH_LIMIT])
+            except Exception as error:  # A failing store must not stop training
+                self.errors += 1
+                self.last_error = error
+
+    def series(self, name):
+        """
+        Downsampled (steps, values) of a metric, see DownsampledSeries.points.
+        """
+        with self.series_lock:
+            if name not in self.metric_series:
+                raise ValueError(f"No metric named {name!r} has been recorded.")
+            return self.metric_series[name].points()
+
+    def metric_names(self):
+        with self.series_lock:
+            return sorted(self.metric_series)
+
+    def close(self):
+        """
+        Write everything logged so far and end the MLflow run.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        if self.client is not None:
+            self.client.set_terminated(self.run_id, status="FINISHED")
+        if self.dropped or self.errors:
+            print(f"Metrics: {self.dropped} steps dropped, {self.errors} failed writes (last: {self.last_error!r}).")
+
+    def plot(self, name, path=None):
+        """
+        Plotly figure of a metric's downsampled series; also written as HTML to `path`.
+        """
+        from helper_functions.plotting_functions import plot_metrics
+
+        steps, values = self.series(name)
+        fig = plot_metrics(values, steps, max_points=self.max_points, name=name)
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            fig.write_html(path)
+        return fig
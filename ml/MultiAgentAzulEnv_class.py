@@ -1,16 +1,46 @@
 from game.GameState_class import GameState
-from helper_functions.helper_functions import encode_board_state, simulate_action, evaluate_board_state, get_valid_actions
+from game.GameRecord_class import GameRecord
+import numpy as np
+from helper_functions.helper_functions import encode_board_state, simulate_action, evaluate_board_state
+from helper_functions.LegalActionMask_class import LegalActionMask
 
 class MultiAgentAzulEnv:
-    def __init__(self, num_players):
+    def __init__(self, num_players, incremental_observation=False, check_observation=False, seed=None):
+        """
+        incremental_observation: Keep the encoded state up to date slot by slot inside
+                                 simulate_action and wall_tiling_phase instead of
+                                 re-encoding the whole board after every step.
+        check_observation: Debug check that compares the incremental observation with a
+                           full encode_board_state on every get_state call.
+        seed: Seed of the game state's generator; the games of this environment follow from it.
+        """
         self.num_players = num_players
         self.agents = [None] * num_players
-        self.game_state = GameState(num_players)
+        self.game_state = GameState(seed=seed)
         self.current_player = 0
+        self.action_mask = LegalActionMask(self.game_state)
+        self.action_history = []  # (action index, refill key or None) per played move, see step
+        self.incremental_observation = incremental_observation
+        self.check_observation = check_observation
+        if incremental_observation:
+            self.game_state.enable_incremental_observation()
+
+    @property
+    def current_player(self):
+        """
+        The player to move, kept on the GameState so search code can use it too.
+        """
+        return self.game_state.current_player
+
+    @current_player.setter
+    def current_player(self, player_idx):
+        self.game_state.current_player = player_idx
 
-    def reset(self):
-        self.game_state.reset()
+    def reset(self, seed=None):
+        self.game_state.reset(seed)
         self.current_player = 0
+        self.action_history = []  # New list, so holders of the old one can tell the game changed
+        self.action_mask.refresh()
         return self.get_state()
 
     def set_agents(self, agents):
@@ -18,69 +48,118 @@ class MultiAgentAzulEnv:
             raise ValueError("Number of agents must match the number of players.")
         self.agents = agents
     
+    def get_valid_action_mask(self, player_idx=None):
+        """
+        Boolean mask over the fixed action space of the actions the player (default: the
+        current player) can take. The mask is maintained incrementally by `step` and
+        returned as a live view, so copy it to keep it across moves.
+        """
+        if player_idx is None:
+            player_idx = self.current_player
+        return self.action_mask.get_mask(player_idx)
+
     def get_valid_action_indices(self):
         """
-        Convert valid actions from `get_valid_actions` into indices for the fixed action space.
+        Indices of the valid actions of the current player in the fixed action space.
         """
-        valid_actions = get_valid_actions(self.game_state, self.current_player)
-        valid_action_indices = [self.game_state.get_action_space_mapper().action_to_index(action) for action in valid_actions if action is not None]
-        return valid_action_indices
+        return np.flatnonzero(self.get_valid_action_mask()).tolist()
 
     def get_state(self):
-        return encode_board_state(self.game_state)
+        if not self.incremental_observation:
+            return encode_board_state(self.game_state)
+
+        observation = self.game_state.observation
+        if self.check_observation:
+            expected = encode_board_state(self.game_state)
+            if not np.array_equal(observation, expected):
+                mismatched = np.flatnonzero(observation != expected).tolist()
+                raise AssertionError(f"Incremental observation is out of sync at positions {mismatched}.")
+        return observation.copy()  # Callers keep states across steps, so hand out a snapshot
 
     def step(self, action):
         factory_idx, tile, pattern_line_idx = action
         player_idx = self.current_player
 
+        round_number = self.game_state.round_number
         try:
             simulate_action(self.game_state, player_idx, factory_idx, tile, pattern_line_idx)
         except ValueError:
+            self.action_mask.refresh()
             return self.get_state(), -10, False, {"player": player_idx}
 
+        refill_key = None
+        if self.game_state.round_number != round_number:
+            self.action_mask.refresh()  # The wall tiling phase changed every board and refilled the factories
+            refill_key = self.game_state.refill_key()
+        else:
+            self.action_mask.update_action(player_idx, factory_idx, pattern_line_idx)
+        self.action_history.append((self.game_state.action_space_mapper.action_to_index(action), refill_key))
+
         # Access player_boards using dot notation
         reward = evaluate_board_state(self.game_state, player_idx)
         is_done = self.game_state.is_game_over()
         return self.get_state(), reward, is_done, {"player": player_idx}
 
 
-    def play_game(self, max_turns=100):
+    def play_game(self, max_turns=100, learn=True, on_transition=None, seed=None):
         """
         Play a game until it ends or the maximum number of turns is reached.
+
+        learn: Call `agent.update` after every move. Disable for inference-only play.
+        on_transition: Optional callback receiving (player_idx, state, action_index, reward,
+                       next_state, done, next_valid_mask) after every move, for example to
+                       stream transitions to a learner. next_valid_mask is the legal-action
+                       mask of the next player to move, a copy the callback may keep.
+        seed: Seed of the game (see GameState.reset).
         """
-        state = self.reset()
+        state = self.reset(seed)
         turn_count = 0
 
         while not self.game_state.is_game_over():  # and turn_count < max_turns:
             agent = self.agents[self.current_player]
 
-            # Get valid action indices for the current player
-            valid_action_indices = self.get_valid_action_indices()
-
-            if not valid_action_indices:
+            # Check the current player has a valid action
+            if not self.get_valid_action_mask().any():
                 raise ValueError(f"No valid actions available for player {self.current_player}.")
 
             # Agent selects an action index
             action_index = agent.select_action_index(state, self, self.current_player)
+            state = self.play_turn(state, action_index, learn, on_transition)
+            turn_count += 1
 
-            # Map the action index to the actual action
-            action = self.game_state.get_action_space_mapper().index_to_action(action_index)
+        return self.game_state
 
-            # Apply the action and get the new state
-            next_state, reward, _, _ = self.step(action)
+    def play_turn(self, state, action_index, learn=True, on_transition=None):
+        """
+        Play the current player's chosen action, report the transition (see play_game),
+        pass the turn and finish the round if it is over. Returns the next state.
+        """
+        agent = self.agents[self.current_player]
 
-            # Update the agent's knowledge (e.g., Q-values or memory buffer)
-            agent.update(state, action_index, reward, next_state, False)
+        # Map the action index to the actual action
+        action = self.game_state.get_action_space_mapper().index_to_action(action_index)
 
-            # Prepare for the next turn
-            state = next_state
-            turn_count += 1
-            self.current_player = (self.current_player + 1) % self.num_players
+        # Apply the action and get the new state
+        next_state, reward, done, _ = self.step(action)
 
-            # Handle round completion
-            if self.game_state.is_round_over():
-                self.game_state.wall_tiling_phase()
+        # Update the agent's knowledge (e.g., Q-values or memory buffer)
+        next_valid_mask = self.get_valid_action_mask((self.current_player + 1) % self.num_players).copy()  # Masks are live views
+        if on_transition is not None:
+            on_transition(self.current_player, state, action_index, reward, next_state, done, next_valid_mask)
+        if learn:
+            agent.update(state, action_index, reward, next_state, done, next_valid_mask)
 
-        return self.game_state
+        # Prepare for the next turn
+        self.current_player = (self.current_player + 1) % self.num_players
 
+        # Handle round completion
+        if self.game_state.is_round_over():
+            self.game_state.wall_tiling_phase()
+            self.action_mask.refresh()
+        return next_state
 
+    def game_record(self):
+        """
+        Compact record of the current game: its seed and the action indices played so far.
+        """
+        return GameRecord(self.game_state.seed, [action_index for action_index, _ in self.action_history])
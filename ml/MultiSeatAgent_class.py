@@ -0,0 +1,216 @@
+import random
+import numpy as np
+import torch
+import torch.optim as optim
+from helper_functions.Profiler_class import profile_stage
+from ml.StackedDQN_class import StackedDQN
+from ml.ReplayBuffer_class import ReplayBuffer
+from ml.PrioritizedReplayBuffer_class import PrioritizedReplayBuffer
+
+
+class SeatAgent:
+    def __init__(self, parent, seat):
+        """
+        View of one seat of a MultiSeatAgent with the AzulAgent interface, so it can be
+        passed to MultiAgentAzulEnv.set_agents.
+        """
+        self.parent = parent
+        self.seat = seat
+
+    @property
+    def epsilon(self):
+        return self.parent.epsilons[self.seat]
+
+    @epsilon.setter
+    def epsilon(self, value):
+        self.parent.epsilons[self.seat] = value
+
+    def select_action_index(self, state, env, player_idx):
+        return self.parent.select_action_index(self.seat, state, env.get_valid_action_mask(player_idx))
+
+    def update(self, state, action_index, reward, next_state, done, next_valid_mask=None):
+        self.parent.update(self.seat, state, action_index, reward, next_state, done, next_valid_mask)
+
+
+class MultiSeatAgent:
+    def __init__(self, num_seats, input_dim, action_dim, shared_parameters=False, lr=0.001, gamma=0.99,
+                 epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.1, replay_capacity=100_000,
+                 prioritized_replay=False, batch_size=64, train_every=4, target_update_every=500):
+        """
+        DQN agents for every seat backed by one StackedDQN, one target network and one
+        optimizer. Each seat keeps its own replay buffer and exploration rate; a minibatch
+        update samples every seat's buffer and trains all seats in one forward and one
+        backward pass.
+
+        shared_parameters: Train one set of weights for all seats, with a seat embedding.
+        train_every: Number of stored transitions per seat between two minibatch updates.
+        """
+        if replay_capacity <= 0:
+            raise ValueError("MultiSeatAgent trains from replay buffers, replay_capacity must be positive.")
+
+        self.num_seats = num_seats
+        self.q_network = StackedDQN(num_seats, input_dim, action_dim, shared_parameters=shared_parameters)
+        self.target_network = StackedDQN(num_seats, input_dim, action_dim, shared_parameters=shared_parameters)
+        self.target_network.load_state_dict(self.q_network.state_dict())
+        self.optimizer = optim.Adam(self.q_network.parameters(), lr=lr)
+        self.gamma = gamma
+        self.epsilons = [epsilon] * num_seats
+        self.epsilon_decay = epsilon_decay
+        self.epsilon_min = epsilon_min
+
+        replay_buffer_class = PrioritizedReplayBuffer if prioritized_replay else ReplayBuffer
+        self.replay_buffers = [replay_buffer_class(replay_capacity, input_dim, action_dim) for _ in range(num_seats)]
+        self.batch_size = batch_size
+        self.train_every = train_every
+        self.target_update_every = target_update_every
+        self.transitions_seen = 0
+        self.batch_updates = 0
+        self.losses = []  # Loss of every update since the trainer last collected them
+
+    def seat_agents(self):
+        """
+        One AzulAgent-like view per seat, for MultiAgentAzulEnv.set_agents.
+        """
+        return [SeatAgent(self, seat) for seat in range(self.num_seats)]
+
+    @profile_stage("MultiSeatAgent.select_action_index")
+    def select_action_index(self, seat, state, valid_action_mask):
+        """
+        Epsilon-greedy action index of one seat, restricted to the valid actions.
+        """
+        if not valid_action_mask.any():
+            raise ValueError("No valid actions available to select from.")
+
+        if random.random() < self.epsilons[seat]:
+            return random.choice(np.flatnonzero(valid_action_mask))  # Explore
+
+        with torch.no_grad():
+            state_tensor = torch.as_tensor(state, dtype=torch.float32).unsqueeze(0)
+            q_values = self.q_network.forward_seat(state_tensor, seat).numpy()[0]
+        q_values[~valid_action_mask] = -np.inf
+        return np.argmax(q_values)  # Exploit
+
+    @profile_stage("MultiSeatAgent.select_action_indices")
+    def select_action_indices(self, states, valid_action_masks, seats):
+        """
+        Epsilon-greedy action indices for a batch of states (one row per game) where row
+        i is played by seat seats[i], in a single network call.
+        """
+        seats = np.asarray(seats)
+        with torch.no_grad():
+            q_values = self.q_network.forward_seats(
+                torch.as_tensor(states, dtype=torch.float32), torch.as_tensor(seats)
+            ).numpy()
+        q_values[~valid_action_masks] = -np.inf
+        actions = np.argmax(q_values, axis=1)
+
+        epsilons = np.asarray(self.epsilons)[seats]
+        for row in np.flatnonzero(np.random.random(len(seats)) < epsilons):
+            actions[row] = random.choice(np.flatnonzero(valid_action_masks[row]))  # Explore
+        return actions
+
+    def play_games(self, envs, learn=True, on_transitions=None, seeds=None):
+        """
+        Play one game on each MultiAgentAzulEnv in lockstep, this agent holding every seat.
+        Each step picks the moves of all unfinished games with one select_action_indices
+        call, so a single forward pass serves every game and seat.
+
+        learn, seeds: As for play_game, seeds holding one seed (or None) per game.
+        on_transitions: Optional per-game callbacks, see play_game's on_transition.
+        """
+        on_transitions = on_transitions or [None] * len(envs)
+        seeds = seeds or [None] * len(envs)
+        for env in envs:
+            env.set_agents(self.seat_agents())
+        states = [env.reset(seed) for env, seed in zip(envs, seeds)]
+
+        active = [game for game, env in enumerate(envs) if not env.game_state.is_game_over()]
+        while active:
+            seats = [envs[game].current_player for game in active]
+            masks = np.stack([envs[game].get_valid_action_mask() for game in active])
+            if not masks.any(axis=1).all():
+                raise ValueError("No valid actions available to select from.")
+            actions = self.select_action_indices(np.stack([states[game] for game in active]), masks, seats)
+            for game, action_index in zip(active, actions):
+                states[game] = envs[game].play_turn(states[game], int(action_index), learn, on_transitions[game])
+            active = [game for game in active if not envs[game].game_state.is_game_over()]
+        return [env.game_state for env in envs]
+
+    @profile_stage("MultiSeatAgent.update")
+    def update(self, seat, state, action_index, reward, next_state, done, next_valid_mask=None):
+        """
+        Store one transition of a seat and train all seats once every `train_every`
+        transitions per seat.
+        """
+        self.replay_buffers[seat].add(state, action_index, reward, next_state, done, next_valid_mask)
+        self.transitions_seen += 1
+        if (
+            self.transitions_seen % (self.train_every * self.num_seats) == 0 and
+            all(len(buffer) >= self.batch_size for buffer in self.replay_buffers)
+        ):
+            self.losses.append(self.update_batch([buffer.sample(self.batch_size) for buffer in self.replay_buffers]))
+        self.epsilons[seat] = max(self.epsilons[seat] * self.epsilon_decay, self.epsilon_min)
+
+    def update_batch(self, batches):
+        """
+        One gradient step for all seats on a list of per-seat minibatches (as returned by
+        ReplayBuffer.sample). The loss is the sum of the per-seat losses, so each seat gets
+        the same gradient as a separately trained AzulAgent. Returns the loss value.
+        """
+        states = torch.from_numpy(np.stack([batch["states"] for batch in batches])).float()
+        next_states = torch.from_numpy(np.stack([batch["next_states"] for batch in batches])).float()
+        actions = torch.from_numpy(np.stack([batch["actions"] for batch in batches]))
+        rewards = torch.from_numpy(np.stack([batch["rewards"] for batch in batches]))
+        dones = torch.from_numpy(np.stack([batch["dones"] for batch in batches])).float()
+        next_masks = torch.from_numpy(np.stack([batch["next_masks"] for batch in batches]))
+
+        # Target Q-values over the legal next actions only, [seat, batch]
+        with torch.no_grad():
+            next_q = self.target_network(next_states).masked_fill(~next_masks, -float("inf"))
+            max_next_q = next_q.max(dim=2).values
+            max_next_q = torch.where(next_masks.any(dim=2), max_next_q, torch.zeros_like(max_next_q))
+            target_q = rewards + self.gamma * max_next_q * (1 - dones)
+
+        current_q = self.q_network(states).gather(2, actions.unsqueeze(2)).squeeze(2)
+        td_errors = target_q - current_q
+
+        if "weights" in batches[0]:
+            # Prioritized replay: importance-sampling weighted loss, then new priorities per seat
+            weights = torch.from_numpy(np.stack([batch["weights"] for batch in batches]))
+            loss = (weights * td_errors.pow(2)).mean(dim=1).sum()
+            td_errors = td_errors.detach().numpy()
+            for seat, batch in enumerate(batches):
+                self.replay_buffers[seat].update_priorities(batch["indices"], td_errors[seat])
+        else:
+            loss = td_errors.pow(2).mean(dim=1).sum()
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
+        self.batch_updates += 1
+        if self.batch_updates % self.target_update_every == 0:
+            self.target_network.load_state_dict(self.q_network.state_dict())
+
+        return loss.item()
+
+    def state_dict(self):
+        """
+        Networks, optimizer and per-seat exploration rates; the replay buffers are saved
+        separately (see Checkpointer).
+        """
+        return {
+            "q_network": self.q_network.state_dict(),
+            "target_network": self.target_network.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "epsilons": list(self.epsilons),
+            "transitions_seen": self.transitions_seen,
+            "batch_updates": self.batch_updates,
+        }
+
+    def load_state_dict(self, state):
+        self.q_network.load_state_dict(state["q_network"])
+        self.target_network.load_state_dict(state["target_network"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.epsilons[:] = state["epsilons"]  # Seat agents read the shared list
+        self.transitions_seen = state["transitions_seen"]
+        self.batch_updates = state["batch_updates"]
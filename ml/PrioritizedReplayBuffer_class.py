@@ -0,0 +1,87 @@
+import numpy as np
+from ml.ReplayBuffer_class import ReplayBuffer
+from ml.SumTree_class import SumTree
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    def __init__(self, capacity, state_dim, action_dim, alpha=0.6, beta=0.4, beta_increment=1e-4, priority_epsilon=1e-6, seed=None):
+        """
+        Replay buffer that samples transitions proportionally to priority ** alpha,
+        using a SumTree so that sampling and priority updates cost O(log n).
+
+        alpha: How strongly priorities shape sampling (0 is uniform).
+        beta: Initial importance-sampling exponent, annealed towards 1 by beta_increment per sample call.
+        priority_epsilon: Added to absolute TD errors so no transition gets zero priority.
+        """
+        super().__init__(capacity, state_dim, action_dim, seed=seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.priority_epsilon = priority_epsilon
+        self.max_priority = 1.0  # New transitions get the largest priority seen so far
+        self.sum_tree = SumTree(capacity)
+
+    def add(self, state, action_index, reward, next_state, done, next_valid_mask=None):
+        slot = super().add(state, action_index, reward, next_state, done, next_valid_mask)
+        self.sum_tree.update([slot], self.max_priority ** self.alpha)
+        return slot
+
+    def add_batch(self, states, action_indices, rewards, next_states, dones, next_valid_masks=None):
+        slots = super().add_batch(states, action_indices, rewards, next_states, dones, next_valid_masks)
+        self.sum_tree.update(slots, self.max_priority ** self.alpha)
+        return slots
+
+    def sample(self, batch_size):
+        """
+        Sample a minibatch proportionally to priority (one draw per equal-mass segment).
+        The batch additionally holds importance-sampling "weights", normalized to a max of 1.
+        """
+        if self.size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer.")
+
+        total = self.sum_tree.total()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        indices = self.sum_tree.find(np.minimum(values, np.nextafter(total, 0)))
+        indices = np.minimum(indices, self.size - 1)  # Guard against float round-off at the right edge
+
+        probabilities = self.sum_tree.get(indices) / total
+        weights = (self.size * np.maximum(probabilities, 1e-12)) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        batch = self.get_batch(indices)
+        batch["weights"] = weights.astype(np.float32)
+        return batch
+
+    def update_priorities(self, indices, td_errors):
+        """
+        Set the priorities of sampled transitions from their absolute TD errors.
+        """
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.priority_epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        if self.preimages is not None:
+            self.preserve(np.asarray(indices).tolist(), ("priorities",))
+        self.sum_tree.update(indices, priorities ** self.alpha)
+
+    def state_dict(self):
+        state = super().state_dict()
+        state["beta"] = self.beta
+        state["max_priority"] = self.max_priority
+        return state
+
+    def storage(self):
+        storage = super().storage()
+        leaf_count = self.sum_tree.leaf_count
+        storage["priorities"] = self.sum_tree.tree[leaf_count:leaf_count + self.capacity]  # Leaf per slot
+        return storage
+
+    def load_state_dict(self, state, arrays):
+        arrays = dict(arrays)
+        priorities = arrays.pop("priorities")
+        self.sum_tree.tree[:] = 0.0
+        leaf_count = self.sum_tree.leaf_count
+        self.sum_tree.tree[leaf_count:leaf_count + len(priorities)] = priorities
+        self.sum_tree.rebuild()
+        super().load_state_dict(state, arrays)
+        self.beta = state["beta"]
+        self.max_priority = state["max_priority"]
@@ -0,0 +1,20 @@
+import random
+import numpy as np
+
+class RandomAgent:
+    def __init__(self, seed=None):
+        """
+        Agent that plays a uniformly random legal action. Has the AzulAgent interface, so
+        it can be used as a baseline opponent or to drive the engine in benchmarks.
+        """
+        self.rng = random.Random(seed)
+        self.epsilon = 1.0
+
+    def select_action_index(self, state, env, player_idx):
+        valid_action_indices = np.flatnonzero(env.get_valid_action_mask(player_idx))
+        if not len(valid_action_indices):
+            raise ValueError("No valid actions available to select from.")
+        return int(self.rng.choice(valid_action_indices))
+
+    def update(self, state, action_index, reward, next_state, done, next_valid_mask=None):
+        return
@@ -0,0 +1,191 @@
+import threading
+import numpy as np
+
+class ReplayBuffer:
+    def __init__(self, capacity, state_dim, action_dim, seed=None):
+        """
+        Fixed-size ring buffer of transitions backed by preallocated NumPy arrays.
+
+        Encoded states are small non-negative integers (see ObservationLayout), so they
+        are stored as uint8; next-state legal-action masks are bit-packed. Once the
+        buffer is full the oldest transitions are overwritten.
+        """
+        if capacity <= 0:
+            raise ValueError("Replay buffer capacity must be greater than zero.")
+        if action_dim > np.iinfo(np.int16).max:
+            raise ValueError(f"Action dimension {action_dim} does not fit the int16 action storage.")
+
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.action_dim = action_dim
+
+        self.states = np.zeros((capacity, state_dim), dtype=np.uint8)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.int16)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.next_masks = np.zeros((capacity, (action_dim + 7) // 8), dtype=np.uint8)
+
+        self.position = 0  # Next slot to write
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+        # Copy-on-write snapshot for checkpoints, see begin_snapshot
+        self.snapshot_lock = threading.Lock()
+        self.snapshot_size = 0
+        self.preimages = None  # Array name -> {slot: row at snapshot time} while a snapshot is open
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action_index, reward, next_state, done, next_valid_mask=None):
+        """
+        Store one transition. Without a next-state mask every action counts as legal.
+        """
+        slot = self.position
+        if self.preimages is not None:
+            self.preserve((slot,))
+        self.states[slot] = state
+        self.next_states[slot] = next_state
+        self.actions[slot] = action_index
+        self.rewards[slot] = reward
+        self.dones[slot] = done
+        if next_valid_mask is None:
+            self.next_masks[slot] = 0xFF
+        else:
+            self.next_masks[slot] = np.packbits(next_valid_mask)
+
+        self.position = (slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return slot
+
+    def add_batch(self, states, action_indices, rewards, next_states, dones, next_valid_masks=None):
+        """
+        Store a batch of transitions (for example one VectorAzulEnv step).
+        Returns the slots that were written.
+        """
+        count = len(action_indices)
+        if count > self.capacity:
+            raise ValueError(f"Cannot add {count} transitions to a buffer of capacity {self.capacity}.")
+        slots = (self.position + np.arange(count)) % self.capacity
+        if self.preimages is not None:
+            self.preserve(slots.tolist())
+        self.states[slots] = states
+        self.next_states[slots] = next_states
+        self.actions[slots] = action_indices
+        self.rewards[slots] = rewards
+        self.dones[slots] = dones
+        if next_valid_masks is None:
+            self.next_masks[slots] = 0xFF
+        else:
+            self.next_masks[slots] = np.packbits(next_valid_masks, axis=1)
+
+        self.position = int((self.position + count) % self.capacity)
+        self.size = min(self.size + count, self.capacity)
+        return slots
+
+    def sample(self, batch_size):
+        """
+        Sample a uniform random minibatch, see get_batch for the layout.
+        """
+        if self.size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer.")
+        indices = self.rng.integers(0, self.size, size=batch_size)
+        return self.get_batch(indices)
+
+    def get_batch(self, indices):
+        """
+        Gather the transitions at `indices` as a dict of arrays: states and next_states
+        (uint8), actions (int64), rewards (float32), dones (bool), next_masks (bool,
+        [batch, action_dim]) and the buffer indices themselves.
+        """
+        return {
+            "indices": indices,
+            "states": self.states[indices],
+            "actions": self.actions[indices].astype(np.int64),
+            "rewards": self.rewards[indices],
+            "next_states": self.next_states[indices],
+            "dones": self.dones[indices],
+            "next_masks": np.unpackbits(self.next_masks[indices], axis=1, count=self.action_dim).astype(bool),
+        }
+
+    def state_dict(self):
+        """
+        Scalar state of the buffer; the stored transitions come from `arrays`.
+        """
+        return {
+            "capacity": self.capacity,
+            "position": self.position,
+            "size": self.size,
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def storage(self):
+        """
+        Every storage array by name, full capacity and indexed by slot (views, not copies).
+        """
+        return {
+            name: getattr(self, name)
+            for name in ("states", "next_states", "actions", "rewards", "dones", "next_masks")
+        }
+
+    def arrays(self):
+        """
+        Filled part of every storage array by name (views, not copies). Until the buffer
+        wraps around the filled part is the first `size` rows.
+        """
+        return {name: array[:self.size] for name, array in self.storage().items()}
+
+    def begin_snapshot(self):
+        """
+        Open a copy-on-write snapshot and return (state_dict, arrays) as of now. The arrays
+        are the live views, so taking the snapshot costs nothing; until end_snapshot,
+        every write first keeps the row it overwrites, so a reader (the checkpoint writer
+        thread) can copy the live arrays and patch in those rows afterwards.
+        """
+        with self.snapshot_lock:
+            if self.preimages is not None:
+                raise AssertionError("A snapshot of this buffer is already open.")
+            self.snapshot_size = self.size
+            self.preimages = {name: {} for name in self.storage()}
+        return self.state_dict(), self.arrays()
+
+    def preserve(self, slots, names=None):
+        """
+        Keep the snapshot-time rows of `slots` (of the arrays `names`, default all) before
+        they are overwritten. Only the first write to a slot during a snapshot copies.
+        """
+        with self.snapshot_lock:
+            if self.preimages is None:
+                return
+            storage = self.storage()
+            for name in names or self.preimages:
+                saved = self.preimages[name]
+                for slot in slots:
+                    if slot < self.snapshot_size and slot not in saved:
+                        saved[slot] = storage[name][slot].copy()
+
+    def end_snapshot(self):
+        """
+        Close the snapshot. Returns {array name: {slot: row at snapshot time}} for the
+        rows overwritten since begin_snapshot.
+        """
+        with self.snapshot_lock:
+            preimages, self.preimages = self.preimages, None
+        return preimages or {}
+
+    def load_state_dict(self, state, arrays):
+        """
+        Restore from `state_dict` and `arrays`. Full-capacity arrays are adopted as they
+        are, so writable memory maps (np.load with mmap_mode="c") load without copying.
+        """
+        if state["capacity"] != self.capacity:
+            raise ValueError(f"Saved buffer capacity {state['capacity']} does not match {self.capacity}.")
+        for name, array in arrays.items():
+            if len(array) == self.capacity:
+                setattr(self, name, array)
+            else:
+                getattr(self, name)[:len(array)] = array
+        self.position = state["position"]
+        self.size = state["size"]
+        self.rng.bit_generator.state = state["rng"]
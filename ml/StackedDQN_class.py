@@ -0,0 +1,138 @@
+import math
+import torch
+import torch.nn as nn
+
+class StackedDQN(nn.Module):
+    def __init__(self, num_seats, input_dim, output_dim, shared_parameters=False, seat_embedding_dim=8, hidden_dims=(128, 64)):
+        """
+        The DQN architecture for every seat at once. Each layer keeps the weights of all
+        seats in one [num_seats, in, out] tensor, so a single batched matrix multiply
+        (baddbmm) runs the forward pass, and a single backward pass trains, all seats.
+
+        shared_parameters: Use one set of weights for all seats and tell the seats apart
+                           with a learned seat embedding appended to the input.
+        """
+        super(StackedDQN, self).__init__()
+        self.num_seats = num_seats
+        self.shared_parameters = shared_parameters
+
+        num_stacks = num_seats
+        if shared_parameters:
+            num_stacks = 1
+            self.seat_embedding = nn.Embedding(num_seats, seat_embedding_dim)
+            input_dim += seat_embedding_dim
+
+        dims = [input_dim, *hidden_dims, output_dim]
+        self.weights = nn.ParameterList()
+        self.biases = nn.ParameterList()
+        for fan_in, fan_out in zip(dims[:-1], dims[1:]):
+            bound = 1 / math.sqrt(fan_in)  # Same initialization range as nn.Linear
+            self.weights.append(nn.Parameter(torch.empty(num_stacks, fan_in, fan_out).uniform_(-bound, bound)))
+            self.biases.append(nn.Parameter(torch.empty(num_stacks, 1, fan_out).uniform_(-bound, bound)))
+
+    def forward(self, x):
+        """
+        x: [num_seats, batch, input_dim], row s holding inputs for seat s.
+        Returns Q-values of shape [num_seats, batch, output_dim].
+        """
+        return self.forward_stacks(x)
+
+    def forward_stacks(self, x, seats=None):
+        """
+        Q-values of x: [len(seats), batch, input_dim], row i holding inputs for seat
+        seats[i], in one baddbmm per layer over only those seats (default: every seat).
+        """
+        num_rows, batch_size = x.shape[0], x.shape[1]
+        if self.shared_parameters:
+            if seats is None:
+                seats = torch.arange(num_rows, device=x.device)
+            embedding = self.seat_embedding(seats)[:, None, :].expand(-1, batch_size, -1)
+            x = torch.cat([x, embedding], dim=2)
+
+        last_layer = len(self.weights) - 1
+        for layer, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            if self.shared_parameters:
+                weight, bias = weight.expand(num_rows, -1, -1), bias.expand(num_rows, -1, -1)
+            elif seats is not None:
+                weight, bias = weight[seats], bias[seats]
+            x = torch.baddbmm(bias, x, weight)
+            if layer != last_layer:
+                x = torch.relu(x)
+        return x
+
+    def forward_seat(self, x, seat):
+        """
+        Q-values of one seat for a batch of inputs x: [batch, input_dim].
+        """
+        stack = seat
+        if self.shared_parameters:
+            stack = 0
+            embedding = self.seat_embedding.weight[seat].expand(x.shape[0], -1)
+            x = torch.cat([x, embedding], dim=1)
+
+        last_layer = len(self.weights) - 1
+        for layer, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            x = torch.addmm(bias[stack], x, weight[stack])
+            if layer != last_layer:
+                x = torch.relu(x)
+        return x
+
+    def forward_seats(self, x, seats):
+        """
+        Q-values for a batch of inputs x: [batch, input_dim] where row i belongs to
+        seat seats[i] (for example the current players of games played in lockstep).
+        The rows are grouped by seat, padded to the largest group and evaluated in one
+        stacked call over only the seats present.
+        """
+        seats = torch.as_tensor(seats, device=x.device)
+        used_seats, groups, counts = torch.unique(seats, return_inverse=True, return_counts=True)
+        if len(used_seats) == 1:
+            return self.forward_seat(x, int(used_seats[0]))
+
+        order = torch.argsort(groups, stable=True)
+        sorted_groups = groups[order]
+        slots = torch.arange(len(order), device=x.device) - (torch.cumsum(counts, 0) - counts)[sorted_groups]
+        grouped = x.new_zeros(len(used_seats), int(counts.max()), x.shape[1])
+        grouped[sorted_groups, slots] = x[order]
+
+        q_values = self.forward_stacks(grouped, used_seats)
+        result = q_values.new_empty(x.shape[0], q_values.shape[2])
+        result[order] = q_values[sorted_groups, slots]
+        return result
+
+    def seat_state_dict(self, seat):
+        """
+        State dict of a DQN computing the Q-values of one seat, see seat_state_dict.
+        """
+        return seat_state_dict(self.state_dict(), seat)
+
+
+def is_stacked_state_dict(state_dict):
+    return "weights.0" in state_dict
+
+
+def seat_state_dict(state_dict, seat):
+    """
+    Slice one seat out of a StackedDQN state dict into a DQN state dict (nn.Linear layers
+    fc.0, fc.2, ...). With shared parameters the seat embedding's contribution to the
+    first layer is constant, so it is folded into that layer's bias.
+    """
+    num_layers = sum(1 for key in state_dict if key.startswith("weights."))
+    shared_parameters = "seat_embedding.weight" in state_dict
+    num_seats = len(state_dict["seat_embedding.weight"]) if shared_parameters else len(state_dict["weights.0"])
+    if not 0 <= seat < num_seats:
+        raise ValueError(f"Seat {seat} is out of range for a network of {num_seats} seats.")
+
+    stack = 0 if shared_parameters else seat
+    sliced = {}
+    for layer in range(num_layers):
+        weight = state_dict[f"weights.{layer}"][stack]
+        bias = state_dict[f"biases.{layer}"][stack, 0]
+        if layer == 0 and shared_parameters:
+            embedding = state_dict["seat_embedding.weight"][seat]
+            input_dim = weight.shape[0] - len(embedding)
+            bias = bias + embedding @ weight[input_dim:]
+            weight = weight[:input_dim]
+        sliced[f"fc.{2 * layer}.weight"] = weight.t().contiguous()
+        sliced[f"fc.{2 * layer}.bias"] = bias.clone()
+    return sliced
@@ -0,0 +1,64 @@
+import numpy as np
+
+class SumTree:
+    def __init__(self, capacity):
+        """
+        Array-based binary sum tree over `capacity` non-negative priorities.
+
+        The leaves live at [leaf_count, 2 * leaf_count) of one flat array and node i
+        holds the sum of nodes 2i and 2i + 1, so the root (node 1) is the total. Updates
+        and prefix-sum lookups cost O(log n) per entry and are vectorized over batches.
+        """
+        if capacity <= 0:
+            raise ValueError("Sum tree capacity must be greater than zero.")
+        self.capacity = capacity
+        self.leaf_count = 1 << int(np.ceil(np.log2(capacity))) if capacity > 1 else 1
+        self.depth = int(np.log2(self.leaf_count))
+        self.tree = np.zeros(2 * self.leaf_count, dtype=np.float64)
+
+    def total(self):
+        """
+        Sum of all priorities.
+        """
+        return self.tree[1]
+
+    def get(self, indices):
+        """
+        Priorities stored at the given leaf indices.
+        """
+        return self.tree[np.asarray(indices) + self.leaf_count]
+
+    def update(self, indices, priorities):
+        """
+        Set the priorities of the given leaf indices and refresh their ancestors.
+        """
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaf_count
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes >> 1)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def rebuild(self):
+        """
+        Recompute every inner node from the leaves, level by level.
+        """
+        first = self.leaf_count // 2
+        while first >= 1:
+            nodes = np.arange(first, 2 * first)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            first //= 2
+
+    def find(self, values):
+        """
+        For each value in [0, total), return the leaf index whose prefix-sum interval
+        contains it.
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sums = self.tree[left]
+            go_right = values >= left_sums
+            values -= np.where(go_right, left_sums, 0.0)
+            nodes = left + go_right
+        return nodes - self.leaf_count
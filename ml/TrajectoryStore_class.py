@@ -0,0 +1,237 @@
+import json
+import os
+import numpy as np
+from ml.Checkpointer_class import write_file
+
+INDEX_FILE = "index.json"
+
+
+def shard_columns(state_dim, action_dim):
+    """
+    Name -> (row shape, dtype) of every column of a shard, the ReplayBuffer storage layout
+    plus the seat that made the move.
+    """
+    return {
+        "seats": ((), np.uint8),
+        "states": ((state_dim,), np.uint8),
+        "actions": ((), np.int16),
+        "rewards": ((), np.float32),
+        "next_states": ((state_dim,), np.uint8),
+        "dones": ((), bool),
+        "next_masks": (((action_dim + 7) // 8,), np.uint8),
+    }
+
+
+def read_index(directory):
+    with open(os.path.join(directory, INDEX_FILE), "r") as file:
+        return json.load(file)
+
+
+class TrajectoryWriter:
+    def __init__(self, directory, state_dim, action_dim, shard_size=100_000):
+        """
+        Append-only on-disk store of self-play transitions.
+
+        Transitions go to shards of `shard_size` rows, one preallocated .npy file per column
+        (see shard_columns), written through memory maps. The index file lists the shards
+        and how many rows of each are complete; it is replaced atomically on every flush,
+        so readers never see partly written rows. Opening an existing store appends to it.
+        """
+        self.directory = directory
+        self.state_dim = state_dim
+        self.action_dim = action_dim
+        self.columns = shard_columns(state_dim, action_dim)
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(os.path.join(directory, INDEX_FILE)):
+            self.index = read_index(directory)
+            if (self.index["state_dim"], self.index["action_dim"]) != (state_dim, action_dim):
+                raise ValueError(f"Store {directory} holds state_dim {self.index['state_dim']} and action_dim "
+                                 f"{self.index['action_dim']}, expected {state_dim} and {action_dim}.")
+        else:
+            self.index = {"state_dim": state_dim, "action_dim": action_dim, "shard_size": shard_size, "shards": []}
+        self.shard_size = self.index["shard_size"]
+
+        self.shard = None  # Column name -> memmap of the shard being written
+        self.count = 0  # Rows written to the current shard
+        if self.index["shards"] and self.index["shards"][-1]["count"] < self.shard_size:
+            last = self.index["shards"][-1]
+            self.shard = self.open_shard(last["name"], "r+")
+            self.count = last["count"]
+
+    def __len__(self):
+        counts = [shard["count"] for shard in self.index["shards"]]
+        if self.shard is not None:
+            counts[-1] = self.count  # Rows not yet published by flush
+        return sum(counts)
+
+    def open_shard(self, name, mode):
+        path = os.path.join(self.directory, name)
+        if mode == "w+":
+            os.makedirs(path)
+        return {
+            column: np.lib.format.open_memmap(
+                os.path.join(path, f"{column}.npy"), mode=mode, dtype=dtype, shape=(self.shard_size, *shape)
+            ) if mode == "w+" else np.load(os.path.join(path, f"{column}.npy"), mmap_mode=mode)
+            for column, (shape, dtype) in self.columns.items()
+        }
+
+    def new_shard(self):
+        if self.shard is not None:
+            self.flush()
+        name = f"shard-{len(self.index['shards']):05d}"
+        self.shard = self.open_shard(name, "w+")
+        self.count = 0
+        self.index["shards"].append({"name": name, "count": 0})
+
+    def add(self, player_idx, state, action_index, reward, next_state, done, next_valid_mask=None):
+        """
+        Append one transition; the signature matches MultiAgentAzulEnv.play_game's
+        on_transition callback.
+        """
+        packed_mask = None if next_valid_mask is None else np.packbits(next_valid_mask)[None]
+        self.add_chunk({
+            "seats": [player_idx], "states": [state], "actions": [action_index], "rewards": [reward],
+            "next_states": [next_state], "dones": [done], "next_masks": packed_mask,
+        })
+
+    def add_chunk(self, chunk):
+        """
+        Append a batch of transitions given as a dict of arrays with the shard columns
+        (for example TransitionChunk.to_arrays); next_masks are bit-packed, and None marks
+        every action legal.
+        """
+        total = len(chunk["actions"])
+        written = 0
+        while written < total:
+            if self.shard is None or self.count == self.shard_size:
+                self.new_shard()
+            rows = min(total - written, self.shard_size - self.count)
+            target = slice(self.count, self.count + rows)
+            source = slice(written, written + rows)
+            for column in self.columns:
+                if column == "next_masks" and chunk.get("next_masks") is None:
+                    self.shard[column][target] = 0xFF
+                else:
+                    self.shard[column][target] = np.asarray(chunk[column])[source]
+            self.count += rows
+            written += rows
+
+    def flush(self):
+        """
+        Flush the written rows to disk and publish them in the index.
+        """
+        if self.shard is not None:
+            for array in self.shard.values():
+                array.flush()
+            self.index["shards"][-1]["count"] = self.count
+
+        temp_path = os.path.join(self.directory, f".{INDEX_FILE}.tmp")
+        write_file(temp_path, lambda file: json.dump(self.index, file), "w")
+        os.replace(temp_path, os.path.join(self.directory, INDEX_FILE))
+
+    def close(self):
+        self.flush()
+        self.shard = None
+
+
+class TrajectoryDataset:
+    def __init__(self, directory, seed=None):
+        """
+        Random-access reader of a TrajectoryWriter store. Shards are memory mapped
+        read-only, so minibatches are gathered straight from the page cache without
+        deserialization and the store may be far larger than RAM.
+        """
+        self.directory = directory
+        self.rng = np.random.default_rng(seed)
+        self.shards = []
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-read the index to pick up rows appended since the last refresh.
+        """
+        index = read_index(self.directory)
+        self.state_dim = index["state_dim"]
+        self.action_dim = index["action_dim"]
+        columns = shard_columns(self.state_dim, self.action_dim)
+
+        opened = {shard["name"]: shard for shard in self.shards}
+        self.shards = []
+        for entry in index["shards"]:
+            if not entry["count"]:
+                continue
+            shard = opened.get(entry["name"])
+            if shard is None:
+                path = os.path.join(self.directory, entry["name"])
+                shard = {"name": entry["name"], "seat_rows": {}}
+                shard.update({
+                    column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r") for column in columns
+                })
+            if shard.get("count") != entry["count"]:
+                shard["seat_rows"] = {}
+            shard["count"] = entry["count"]
+            self.shards.append(shard)
+
+        self.offsets = np.cumsum([0] + [shard["count"] for shard in self.shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def seat_indices(self, seat):
+        """
+        Global row indices of the transitions played by `seat`, computed once per shard.
+        """
+        rows = []
+        for shard, offset in zip(self.shards, self.offsets):
+            if seat not in shard["seat_rows"]:
+                shard["seat_rows"][seat] = np.flatnonzero(shard["seats"][:shard["count"]] == seat)
+            rows.append(shard["seat_rows"][seat] + offset)
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def get_batch(self, indices):
+        """
+        Gather global row indices in the ReplayBuffer.get_batch layout, so the batches
+        feed AzulAgent.update_batch directly. Indices are sorted to read the shards in order.
+        """
+        indices = np.sort(np.asarray(indices))
+        shard_ids = np.searchsorted(self.offsets, indices, side="right") - 1
+        batch = {
+            "indices": indices,
+            "seats": np.empty(len(indices), dtype=np.uint8),
+            "states": np.empty((len(indices), self.state_dim), dtype=np.uint8),
+            "actions": np.empty(len(indices), dtype=np.int64),
+            "rewards": np.empty(len(indices), dtype=np.float32),
+            "next_states": np.empty((len(indices), self.state_dim), dtype=np.uint8),
+            "dones": np.empty(len(indices), dtype=bool),
+        }
+        packed_masks = np.empty((len(indices), (self.action_dim + 7) // 8), dtype=np.uint8)
+
+        for shard_id in np.unique(shard_ids):
+            rows = shard_ids == shard_id
+            shard = self.shards[shard_id]
+            local = indices[rows] - self.offsets[shard_id]
+            for column in ("seats", "states", "actions", "rewards", "next_states", "dones"):
+                batch[column][rows] = shard[column][local]
+            packed_masks[rows] = shard["next_masks"][local]
+
+        batch["next_masks"] = np.unpackbits(packed_masks, axis=1, count=self.action_dim).astype(bool)
+        return batch
+
+    def sample(self, batch_size, seat=None):
+        """
+        Uniform random minibatch over the whole store, or over one seat's transitions.
+        """
+        if seat is None:
+            if not len(self):
+                raise ValueError("Cannot sample from an empty trajectory store.")
+            return self.get_batch(self.rng.integers(0, len(self), size=batch_size))
+
+        rows = self.seat_indices(seat)
+        if not len(rows):
+            raise ValueError(f"The trajectory store holds no transitions of seat {seat}.")
+        return self.get_batch(rows[self.rng.integers(0, len(rows), size=batch_size)])
+
+    def iter_batches(self, batch_size, num_batches, seat=None):
+        for _ in range(num_batches):
+            yield self.sample(batch_size, seat)
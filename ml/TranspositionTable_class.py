@@ -0,0 +1,85 @@
+import numpy as np
+
+class TranspositionTable:
+    def __init__(self, size_log2=20, num_values=1):
+        """
+        Fixed-size hash table of search results keyed by GameState.zobrist_hash, backed by
+        preallocated NumPy arrays (one slot per index, index = low bits of the key).
+
+        Each entry stores `num_values` values (for example one per player), the search
+        depth or visit count that produced them and the best move. A store replaces the
+        slot's entry if the slot is empty, holds the same position, was written in an
+        earlier search generation (see new_search) or has a depth that is not larger.
+
+        size_log2: The table has 2 ** size_log2 slots.
+        """
+        self.size = 1 << size_log2
+        self.index_mask = self.size - 1
+        self.num_values = num_values
+
+        self.keys = np.zeros(self.size, dtype=np.uint64)
+        self.values = np.zeros((self.size, num_values), dtype=np.float32)
+        self.depths = np.zeros(self.size, dtype=np.int32)
+        self.best_moves = np.zeros(self.size, dtype=np.int32)
+        self.generations = np.zeros(self.size, dtype=np.uint16)
+        self.occupied = np.zeros(self.size, dtype=bool)
+
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return int(self.occupied.sum())
+
+    def new_search(self):
+        """
+        Start a new search generation; entries of older generations become replaceable.
+        """
+        self.generation = (self.generation + 1) % (np.iinfo(np.uint16).max + 1)
+
+    def probe(self, key):
+        """
+        Slot index holding `key`, or -1 if the position is not stored.
+        """
+        slot = key & self.index_mask
+        if self.occupied[slot] and int(self.keys[slot]) == key:
+            self.hits += 1
+            return slot
+        self.misses += 1
+        return -1
+
+    def get(self, key):
+        """
+        (values, depth, best_move) stored for `key`, or None.
+        """
+        slot = self.probe(key)
+        if slot < 0:
+            return None
+        self.generations[slot] = self.generation  # Still in use, keep it from being aged out
+        return self.values[slot].copy(), int(self.depths[slot]), int(self.best_moves[slot])
+
+    def store(self, key, values, depth, best_move):
+        """
+        Store a search result, following the replacement policy. Returns True if stored.
+        """
+        slot = key & self.index_mask
+        if (
+            self.occupied[slot] and
+            int(self.keys[slot]) != key and
+            self.generations[slot] == self.generation and
+            self.depths[slot] > depth
+        ):
+            return False
+
+        self.keys[slot] = key
+        self.values[slot] = values
+        self.depths[slot] = depth
+        self.best_moves[slot] = best_move
+        self.generations[slot] = self.generation
+        self.occupied[slot] = True
+        return True
+
+    def clear(self):
+        self.occupied[:] = False
+        self.hits = 0
+        self.misses = 0
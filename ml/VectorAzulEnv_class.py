@@ -0,0 +1,354 @@
+import numpy as np
+from game.Ruleset_class import load_ruleset
+from helper_functions.ObservationLayout_class import ObservationLayout
+
+class VectorAzulEnv:
+    """
+    Steps `num_games` Azul games in lockstep, with the whole batch stored in stacked
+    NumPy arrays. Rules, scoring and rewards follow GameState, simulate_action and
+    evaluate_board_state; actions are ActionSpaceMapper indices.
+
+    Games that end during a step are reset immediately: the returned observation and
+    legal-action mask for such a game already belong to the new game, and the final
+    scores of the finished game are reported in the info dict.
+    """
+    def __init__(self, num_games, seed=None, settings_path=None):
+        self.ruleset = load_ruleset(settings_path)
+        self.settings = self.ruleset.settings
+
+        if num_games <= 0:
+            raise ValueError("Number of games must be greater than zero.")
+
+        self.num_games = num_games
+        self.num_players = self.ruleset.num_players
+        self.num_factories = self.ruleset.num_factories
+        self.tile_colors = list(self.ruleset.tile_colors)
+        self.pattern_line_size = self.ruleset.pattern_line_size
+        self.num_colors = self.ruleset.num_colors
+
+        self.wall_size = self.ruleset.wall_size
+        self.wall_column = np.array(self.ruleset.wall_column, dtype=np.int64)  # wall_column[row, color_id] -> column of that color in the row
+        self.floor_penalties = self.ruleset.floor_penalties
+        self.floor_penalty_totals = np.array(self.ruleset.floor_penalty_totals)
+
+        self.action_space_mapper = self.ruleset.action_space_mapper
+        self.action_dim = self.action_space_mapper.total_actions
+        self.observation_layout = ObservationLayout(
+            self.num_factories, self.num_colors, self.num_players, self.pattern_line_size, self.wall_size
+        )
+
+        # Decode tables for action indices (index 0 stays invalid)
+        self.action_source = np.zeros(self.action_dim, dtype=np.int64)
+        self.action_color = np.zeros(self.action_dim, dtype=np.int64)
+        self.action_line = np.zeros(self.action_dim, dtype=np.int64)
+        for index, action in self.action_space_mapper.index_to_action_map.items():
+            if action is None:
+                continue
+            factory_idx, tile, pattern_line_idx = action
+            self.action_source[index] = self.num_factories if factory_idx == "center" else factory_idx
+            self.action_color[index] = self.ruleset.color_ids[tile]
+            self.action_line[index] = self.pattern_line_size if pattern_line_idx == "floor" else pattern_line_idx
+
+        self.rng = np.random.default_rng(seed)
+
+        n, p, l, c, w = self.num_games, self.num_players, self.pattern_line_size, self.num_colors, self.wall_size
+        # Sources: factories first, the center pool last (index num_factories)
+        self.sources = np.zeros((n, self.num_factories + 1, c), dtype=np.int64)
+        self.bag = np.zeros((n, c), dtype=np.int64)
+        self.discard_pile = np.zeros((n, c), dtype=np.int64)
+        self.line_colors = np.full((n, p, l), -1, dtype=np.int64)
+        self.line_fills = np.zeros((n, p, l), dtype=np.int64)
+        self.walls = np.zeros((n, p, w, w), dtype=bool)
+        self.floor_counts = np.zeros((n, p), dtype=np.int64)
+        self.scores = np.zeros((n, p), dtype=np.int64)
+        self.current_player = np.zeros(n, dtype=np.int64)
+        self.round_number = np.ones(n, dtype=np.int64)
+
+        self.observations = np.zeros((n, self.observation_layout.size), dtype=np.float32)
+        self.action_masks = np.zeros((n, self.action_dim), dtype=bool)
+
+    @property
+    def factories(self):
+        return self.sources[:, :self.num_factories]
+
+    @property
+    def center_pool(self):
+        return self.sources[:, self.num_factories]
+
+    def reset(self):
+        """
+        Reset every game and return the batched observations and legal-action masks.
+        """
+        self.reset_games(np.arange(self.num_games))
+        return self.get_state(), self.get_valid_action_masks()
+
+    def reset_games(self, games):
+        """
+        Reset the given games (an array of game indices) and deal their first round.
+        """
+        if len(games) == 0:
+            return
+        self.sources[games] = 0
+        self.bag[games] = 20  # 20 tiles of each color
+        self.discard_pile[games] = 0
+        self.line_colors[games] = -1
+        self.line_fills[games] = 0
+        self.walls[games] = False
+        self.floor_counts[games] = 0
+        self.scores[games] = 0
+        self.current_player[games] = 0
+        self.round_number[games] = 1
+        self.refill_factories(games)
+
+    def refill_factories(self, games):
+        """
+        Deal 4 tiles into every factory of the given games, drawing without replacement
+        from the bag and refilling the bag from the discard pile when it runs out.
+        A game whose bag and discard pile are both empty keeps short factories.
+        """
+        if len(games) == 0:
+            return
+        bag = self.bag[games]
+        discard_pile = self.discard_pile[games]
+        factories = np.zeros((len(games), self.num_factories, self.num_colors), dtype=np.int64)
+        rows = np.arange(len(games))
+
+        for slot in range(self.num_factories * 4):
+            empty = bag.sum(axis=1) == 0
+            if empty.any():
+                bag[empty] = discard_pile[empty]
+                discard_pile[empty] = 0
+            totals = bag.sum(axis=1)
+            drawing = totals > 0
+            picks = np.floor(self.rng.random(len(games)) * totals).astype(np.int64)
+            colors = (np.cumsum(bag, axis=1) > picks[:, None]).argmax(axis=1)
+            drawn_rows, drawn_colors = rows[drawing], colors[drawing]
+            bag[drawn_rows, drawn_colors] -= 1
+            factories[drawn_rows, slot // 4, drawn_colors] += 1
+
+        self.bag[games] = bag
+        self.discard_pile[games] = discard_pile
+        self.sources[games, :self.num_factories] = factories
+
+    def step(self, actions):
+        """
+        Apply one action index per game for the player to move in that game.
+
+        Returns (observations, rewards, dones, action_masks, info). Invalid actions
+        leave the board unchanged and get a reward of -10, as in MultiAgentAzulEnv.step.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_games,):
+            raise ValueError(f"Expected {self.num_games} actions, got shape {actions.shape}.")
+
+        all_games = np.arange(self.num_games)
+        players = self.current_player.copy()
+        valid = self.action_masks[all_games, actions]
+        rewards = np.full(self.num_games, -10.0, dtype=np.float32)
+
+        games = all_games[valid]
+        if len(games):
+            self.take_tiles(games, players[games], actions[games])
+
+            round_over = games[self.sources[games].sum(axis=(1, 2)) == 0]
+            self.wall_tiling_phase(round_over)
+
+            evaluations = self.evaluate_boards(games)
+            acting = evaluations[np.arange(len(games)), players[games]]
+            opponents = evaluations.sum(axis=1) - acting
+            rewards[games] = acting - 0.5 * (1 / self.num_players) * opponents
+
+        dones = self.is_game_over()
+        final_scores = self.scores.copy()
+        self.current_player = (self.current_player + 1) % self.num_players
+        self.reset_games(all_games[dones])
+
+        info = {"player": players, "invalid": ~valid, "final_scores": final_scores}
+        return self.get_state(), rewards, dones, self.get_valid_action_masks(), info
+
+    def take_tiles(self, games, players, actions):
+        """
+        Move the chosen color from its source to the chosen pattern line (overflow to the
+        floor) for each game, sending factory leftovers to the center pool.
+        """
+        sources = self.action_source[actions]
+        colors = self.action_color[actions]
+        lines = self.action_line[actions]
+        center = self.num_factories
+
+        counts = self.sources[games, sources, colors]
+        self.sources[games, sources, colors] = 0
+
+        from_factory = sources != center
+        factory_games, factory_sources = games[from_factory], sources[from_factory]
+        self.sources[factory_games, center] += self.sources[factory_games, factory_sources]
+        self.sources[factory_games, factory_sources] = 0
+
+        to_line = lines < self.pattern_line_size
+        line_games, line_players, line_idx = games[to_line], players[to_line], lines[to_line]
+        fills = self.line_fills[line_games, line_players, line_idx]
+        placed = np.minimum(counts[to_line], line_idx + 1 - fills)
+        self.line_fills[line_games, line_players, line_idx] = fills + placed
+        self.line_colors[line_games, line_players, line_idx] = colors[to_line]
+
+        overflow = counts.copy()
+        overflow[to_line] -= placed
+        self.floor_counts[games, players] += overflow
+        # Floor tiles only matter as a count; their colors go straight to the discard pile
+        self.discard_pile[games, colors] += overflow
+
+    def wall_tiling_phase(self, games):
+        """
+        Batched wall tiling for the given games: move full pattern lines to the wall and
+        score them, apply floor penalties, end-game bonuses, and deal the next round.
+        """
+        if len(games) == 0:
+            return
+        for row in range(self.pattern_line_size):
+            full = self.line_fills[games, :, row] == row + 1
+            game_rows, players = np.nonzero(full)
+            if len(game_rows) == 0:
+                continue
+            tiled_games = games[game_rows]
+            colors = self.line_colors[tiled_games, players, row]
+            columns = self.wall_column[row, colors]
+            self.walls[tiled_games, players, row, columns] = True
+            self.scores[tiled_games, players] += self.calculate_scoring(
+                self.walls[tiled_games, players], row, columns
+            )
+            np.add.at(self.discard_pile, (tiled_games, colors), row)  # Leave out the tile placed on the wall
+            self.line_fills[tiled_games, players, row] = 0
+            self.line_colors[tiled_games, players, row] = -1
+
+        self.scores[games] += self.calculate_floor_penalty(self.floor_counts[games])
+        self.floor_counts[games] = 0
+
+        game_over = self.is_game_over()[games]
+        finished = games[game_over]
+        if len(finished):
+            # GameState only awards the bonuses to the last board it tiled; keep scores identical
+            self.scores[finished, -1] += self.end_game_bonuses(self.walls[finished, -1])
+
+        # Reset for next round; finished games are reset by step
+        self.round_number[games] += 1
+        self.refill_factories(games[~game_over])
+
+    def calculate_scoring(self, walls, row, columns):
+        """
+        Adjacency score for tiles just placed at (row, columns[k]) of walls[k].
+        """
+        k = np.arange(len(walls))
+        size = self.wall_size
+        horizontal = np.ones(len(walls), dtype=np.int64)
+        vertical = np.ones(len(walls), dtype=np.int64)
+        for direction in (-1, 1):
+            row_run = np.ones(len(walls), dtype=bool)
+            column_run = np.ones(len(walls), dtype=bool)
+            for distance in range(1, size):
+                cols = columns + direction * distance
+                row_run &= (cols >= 0) & (cols < size)
+                row_run &= walls[k, row, np.clip(cols, 0, size - 1)]
+                horizontal += row_run
+                other_row = row + direction * distance
+                if 0 <= other_row < size:
+                    column_run &= walls[k, other_row, columns]
+                    vertical += column_run
+        return horizontal + vertical - 1  # Subtract 1 to avoid double-counting the placed tile
+
+    def calculate_floor_penalty(self, floor_counts):
+        """
+        Floor penalties for an array of floor tile counts.
+        """
+        max_floor = len(self.floor_penalties)
+        penalty = self.floor_penalty_totals[np.minimum(floor_counts, max_floor)]
+        return penalty + self.floor_penalties[-1] * np.maximum(floor_counts - max_floor, 0)
+
+    def end_game_bonuses(self, walls):
+        """
+        End-of-game bonuses for an array of walls: complete rows, columns and colors.
+        """
+        rows = walls.all(axis=-1).sum(axis=-1)
+        columns = walls.all(axis=-2).sum(axis=-1)
+        return 2 * rows + 7 * columns + 10 * self.complete_colors(walls)
+
+    def complete_colors(self, walls):
+        """
+        Number of colors with every wall position filled, for an array of walls.
+        """
+        row_idx = np.arange(self.wall_size)[:, None]
+        color_tiles = walls[..., row_idx, self.wall_column[:self.wall_size]]  # [..., row, color]
+        return color_tiles.all(axis=-2).sum(axis=-1)
+
+    def is_game_over(self):
+        """
+        Per-game flag: a player completed a wall row, or the round safety net was hit.
+        """
+        return self.walls.all(axis=-1).any(axis=(1, 2)) | (self.round_number > 100)
+
+    def evaluate_boards(self, games):
+        """
+        Per-player heuristic board value (calculate_positive_attributes +
+        calculate_negative_attributes) for the given games, shape [games, players].
+        """
+        walls = self.walls[games]
+        fills = self.line_fills[games]
+
+        # Pattern line progress and rows closer to completion
+        score = 2 * (fills / np.arange(1, self.pattern_line_size + 1)).sum(axis=-1)
+        score = score + (walls.sum(axis=-1) ** 2).sum(axis=-1)
+
+        # End-of-game bonuses count for every player once the game is over
+        game_over = self.is_game_over()[games]
+        score = score + np.where(game_over[:, None], self.end_game_bonuses(walls), 0)
+
+        # Wall clustering penalty
+        total_tiles = walls.sum(axis=(-1, -2))
+        pairs = (walls[..., :, 1:] & walls[..., :, :-1]).sum(axis=(-1, -2))
+        pairs = pairs + (walls[..., 1:, :] & walls[..., :-1, :]).sum(axis=(-1, -2))
+        clustering = 2 * pairs / np.maximum(4 * total_tiles, 1)
+        score = score - np.where(total_tiles > 0, np.exp(-5 * clustering) * 10, 0)
+
+        return score + self.calculate_floor_penalty(self.floor_counts[games])
+
+    def get_state(self):
+        """
+        Write the batched observations (ObservationLayout order) into the preallocated
+        observation buffer and return it.
+        """
+        layout = self.observation_layout
+        n = self.num_games
+        out = self.observations
+        out[:, layout.factories_offset:layout.center_offset] = self.factories.reshape(n, -1)
+        out[:, layout.center_offset:layout.players_offset] = self.center_pool
+        players = out[:, layout.players_offset:].reshape(n, self.num_players, layout.player_size)
+        players[:, :, layout.line_colors_offset:layout.line_fills_offset] = self.line_colors + 1
+        players[:, :, layout.line_fills_offset:layout.wall_offset] = self.line_fills
+        players[:, :, layout.wall_offset:layout.floor_offset] = self.walls.reshape(n, self.num_players, -1)
+        players[:, :, layout.floor_offset] = self.floor_counts
+        return out
+
+    def get_valid_action_masks(self):
+        """
+        Compute the legal-action mask of the player to move in every game, shape
+        [games, ActionSpaceMapper.total_actions]; index 0 (invalid action) is never legal.
+        """
+        games = np.arange(self.num_games)
+        players = self.current_player
+        line_colors = self.line_colors[games, players]  # [games, lines]
+        line_fills = self.line_fills[games, players]
+        walls = self.walls[games, players]
+
+        lines = np.arange(self.pattern_line_size)
+        colors = np.arange(self.num_colors)
+        on_wall = walls[:, lines[:, None], self.wall_column[:self.pattern_line_size]]  # [games, lines, colors]
+        empty = (line_colors == -1)[:, :, None]
+        same_color = (line_colors[:, :, None] == colors) & (line_fills < lines + 1)[:, :, None]
+        line_ok = (empty | same_color) & ~on_wall
+
+        targets = np.ones((self.num_games, self.num_colors, self.pattern_line_size + 1), dtype=bool)
+        targets[:, :, :self.pattern_line_size] = line_ok.transpose(0, 2, 1)  # Floor is always allowed
+
+        legal = (self.sources > 0)[:, :, :, None] & targets[:, None, :, :]
+        self.action_masks[:, 0] = False
+        self.action_masks[:, 1:] = legal.reshape(self.num_games, -1)
+        return self.action_masks
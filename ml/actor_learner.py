@@ -0,0 +1,284 @@
+import argparse
+import os
+import queue
+import random
+import time
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from ml.MultiAgentAzulEnv_class import MultiAgentAzulEnv
+from ml.AzulAgent_class import AzulAgent
+from ml.DQN_class import DQN
+from ml.ReplayBuffer_class import ReplayBuffer
+from ml.PrioritizedReplayBuffer_class import PrioritizedReplayBuffer
+from ml.TrajectoryStore_class import TrajectoryWriter
+from ml.Checkpointer_class import Checkpointer
+from ml.InferencePolicy_class import InferencePolicy
+from helper_functions.helper_functions import load_game_settings
+
+
+def actor_epsilon(actor_idx, num_actors, base_epsilon=0.4, spread=7):
+    """
+    Per-actor exploration rate, spread geometrically across actors so that some
+    actors explore a lot and others play close to greedily.
+    """
+    if num_actors == 1:
+        return base_epsilon
+    return base_epsilon ** (1 + spread * actor_idx / (num_actors - 1))
+
+
+class TransitionChunk:
+    def __init__(self):
+        """
+        Collects transitions from MultiAgentAzulEnv.play_game until they are shipped
+        to the learner as one dict of stacked arrays.
+        """
+        self.clear()
+
+    def clear(self):
+        self.seats, self.states, self.actions, self.rewards = [], [], [], []
+        self.next_states, self.dones, self.next_masks = [], [], []
+
+    def __len__(self):
+        return len(self.actions)
+
+    def add(self, player_idx, state, action_index, reward, next_state, done, next_valid_mask):
+        self.seats.append(player_idx)
+        self.states.append(np.asarray(state, dtype=np.uint8))
+        self.actions.append(action_index)
+        self.rewards.append(reward)
+        self.next_states.append(np.asarray(next_state, dtype=np.uint8))
+        self.dones.append(done)
+        self.next_masks.append(np.packbits(next_valid_mask))
+
+    def to_arrays(self):
+        return {
+            "seats": np.array(self.seats, dtype=np.int64),
+            "states": np.stack(self.states),
+            "actions": np.array(self.actions, dtype=np.int64),
+            "rewards": np.array(self.rewards, dtype=np.float32),
+            "next_states": np.stack(self.next_states),
+            "dones": np.array(self.dones, dtype=bool),
+            "next_masks": np.stack(self.next_masks),
+        }
+
+
+def run_actor(actor_idx, shared_networks, weights_version, weights_lock, transition_queue, stop_event, epsilon, seed,
+              chunk_size, quantize=False):
+    """
+    Actor process: plays self-play games with a recent copy of the learner's weights
+    and streams the transitions to the learner in chunks. The weights are played
+    through InferencePolicy exports, refreshed whenever the learner publishes.
+    """
+    torch.set_num_threads(1)  # One core per actor
+    random.seed(seed)
+    np.random.seed(seed)
+
+    env = MultiAgentAzulEnv(len(shared_networks), incremental_observation=True, seed=seed)
+
+    local_version = -1
+    chunk = TransitionChunk()
+
+    while not stop_event.is_set():
+        if weights_version.value != local_version:
+            with weights_lock:
+                policies = [
+                    InferencePolicy(shared_network, quantize=quantize, max_batch_size=1, epsilon=epsilon,
+                                    seed=random.getrandbits(64))
+                    for shared_network in shared_networks
+                ]
+                local_version = weights_version.value
+            env.set_agents(policies)
+
+        env.play_game(learn=False, on_transition=chunk.add)
+
+        if len(chunk) >= chunk_size:
+            arrays = chunk.to_arrays()
+            chunk.clear()
+            while not stop_event.is_set():
+                try:
+                    transition_queue.put(arrays, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    transition_queue.cancel_join_thread()  # Do not block exit on chunks the learner will never read
+
+
+def publish_weights(agents, shared_networks, weights_version, weights_lock):
+    """
+    Copy the learner's current weights into the shared networks read by the actors.
+    """
+    with weights_lock:
+        for agent, shared_network in zip(agents, shared_networks):
+            shared_network.load_state_dict(agent.q_network.state_dict())
+        weights_version.value += 1
+
+
+def train_actor_learner(num_actors=None, total_transitions=200_000, chunk_size=256, publish_every=200,
+                        replay_capacity=1_000_000, batch_size=64, train_every=4, prioritized_replay=False,
+                        report_every=30.0, trajectory_dir=None, quantize_actors=False):
+    """
+    Self-play with a pool of actor processes feeding one learner (this process).
+
+    Actors play MultiAgentAzulEnv games with a recent copy of the weights, each with
+    its own exploration rate, and send transitions over a queue. The learner stores
+    them in one replay buffer per seat, runs one minibatch update per `train_every`
+    received transitions of a seat, and publishes new weights every `publish_every`
+    updates through shared-memory networks.
+
+    trajectory_dir: Also append every received transition to a TrajectoryWriter store in
+                    this directory, for offline training (see train_offline).
+    quantize_actors: Actors play with int8-quantized copies of the weights.
+
+    Returns the learner's agents (one per seat).
+    """
+    settings = load_game_settings()
+    num_players = settings.get('num_players')
+    if num_actors is None:
+        num_actors = max(1, (os.cpu_count() or 2) - 1)  # Leave a core for the learner
+
+    env = MultiAgentAzulEnv(num_players)
+    input_dim = env.game_state.max_board_size
+    action_dim = env.game_state.get_action_space_mapper().total_actions
+
+    replay_buffer_class = PrioritizedReplayBuffer if prioritized_replay else ReplayBuffer
+    agents = [
+        AzulAgent(
+            input_dim=input_dim,
+            action_dim=action_dim,
+            replay_buffer=replay_buffer_class(replay_capacity, input_dim, action_dim),
+            batch_size=batch_size,
+            train_every=train_every
+        )
+        for _ in range(num_players)
+    ]
+
+    writer = TrajectoryWriter(trajectory_dir, input_dim, action_dim) if trajectory_dir is not None else None
+
+    ctx = mp.get_context("spawn")
+    shared_networks = []
+    for agent in agents:
+        shared_network = DQN(input_dim, action_dim)
+        shared_network.load_state_dict(agent.q_network.state_dict())
+        shared_network.share_memory()
+        shared_networks.append(shared_network)
+    weights_version = ctx.Value('i', 0)
+    weights_lock = ctx.Lock()
+    transition_queue = ctx.Queue(maxsize=4 * num_actors)
+    stop_event = ctx.Event()
+
+    print(f"Starting {num_actors} actor processes...")
+    actors = [
+        ctx.Process(
+            target=run_actor,
+            args=(actor_idx, shared_networks, weights_version, weights_lock, transition_queue, stop_event,
+                  actor_epsilon(actor_idx, num_actors), actor_idx + 1, chunk_size, quantize_actors),
+            daemon=True
+        )
+        for actor_idx in range(num_actors)
+    ]
+    for actor in actors:
+        actor.start()
+
+    received = 0
+    updates = 0
+    pending_updates = [0] * num_players  # Transitions per seat not yet matched by an update
+    start_time = last_report = time.time()
+    try:
+        while received < total_transitions:
+            try:
+                chunk = transition_queue.get(timeout=60)
+            except queue.Empty:
+                if not any(actor.is_alive() for actor in actors):
+                    raise RuntimeError("All actor processes exited before training finished.")
+                continue
+
+            received += len(chunk["actions"])
+            if writer is not None:
+                writer.add_chunk(chunk)
+            for seat, agent in enumerate(agents):
+                rows = chunk["seats"] == seat
+                count = int(rows.sum())
+                if not count:
+                    continue
+                buffer = agent.replay_buffer
+                slots = buffer.add_batch(
+                    chunk["states"][rows], chunk["actions"][rows], chunk["rewards"][rows],
+                    chunk["next_states"][rows], chunk["dones"][rows]
+                )
+                buffer.next_masks[slots] = chunk["next_masks"][rows]  # Already bit-packed by the actor
+
+                pending_updates[seat] += count
+                while pending_updates[seat] >= train_every and len(buffer) >= batch_size:
+                    agent.update_batch(buffer.sample(batch_size))
+                    pending_updates[seat] -= train_every
+                    updates += 1
+                    if updates % publish_every == 0:
+                        publish_weights(agents, shared_networks, weights_version, weights_lock)
+
+            now = time.time()
+            if now - last_report >= report_every:
+                elapsed = now - start_time
+                print(f"{received} transitions ({received / elapsed:.0f}/s), {updates} updates "
+                      f"({updates / elapsed:.1f}/s), weights version {weights_version.value}")
+                last_report = now
+                if writer is not None:
+                    writer.flush()
+    finally:
+        stop_event.set()
+        if writer is not None:
+            writer.close()
+        # Drain the queue so blocked actors can exit
+        while any(actor.is_alive() for actor in actors):
+            try:
+                transition_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            for actor in actors:
+                actor.join(timeout=0.1)
+
+    elapsed = time.time() - start_time
+    print(f"Actor/learner training complete: {received} transitions in {elapsed:.1f}s "
+          f"({received / elapsed:.0f}/s), {updates} updates.")
+    return agents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Self-play with actor processes feeding one learner.")
+    parser.add_argument("--actors", type=int, default=None, help="Actor processes (default: CPU count - 1).")
+    parser.add_argument("--transitions", type=int, default=200_000, help="Transitions to train on.")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Transitions per message from an actor.")
+    parser.add_argument("--publish-every", type=int, default=200, help="Updates between weight publications.")
+    parser.add_argument("--replay-capacity", type=int, default=1_000_000, help="Replay buffer size per seat.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Replay minibatch size.")
+    parser.add_argument("--train-every", type=int, default=4, help="Transitions per seat between updates.")
+    parser.add_argument("--prioritized-replay", action="store_true", help="Sample minibatches by TD-error priority.")
+    parser.add_argument("--report-every", type=float, default=30.0, help="Seconds between progress lines.")
+    parser.add_argument("--trajectory-dir", default=None, help="Also store every transition here for train_offline.")
+    parser.add_argument("--quantize-actors", action="store_true", help="Actors play with int8 Linear layers.")
+    parser.add_argument("--output", default=None,
+                        help="Write the trained agents as a checkpoint to this directory (see Checkpointer).")
+    args = parser.parse_args(argv)
+
+    agents = train_actor_learner(
+        num_actors=args.actors,
+        total_transitions=args.transitions,
+        chunk_size=args.chunk_size,
+        publish_every=args.publish_every,
+        replay_capacity=args.replay_capacity,
+        batch_size=args.batch_size,
+        train_every=args.train_every,
+        prioritized_replay=args.prioritized_replay,
+        report_every=args.report_every,
+        trajectory_dir=args.trajectory_dir,
+        quantize_actors=args.quantize_actors
+    )
+    if args.output:
+        checkpointer = Checkpointer(args.output)
+        checkpointer.save(args.transitions, agents, [], blocking=True)
+        print(f"Agents written to {checkpointer.latest()}")
+
+
+if __name__ == "__main__":
+    main()
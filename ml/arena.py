@@ -0,0 +1,286 @@
+"""
+Tournament arena: plays seat-rotated, inference-only games between agents across a
+process pool and reports win rates, score distributions and Elo ratings.
+
+    python -m ml.arena checkpoints/a.pt checkpoints/b.pt random --games 50
+
+An agent is "random" (RandomAgent), the path of a checkpoint (a DQN state dict or
+AzulAgent.state_dict saved with torch.save, or Checkpointer output with "#<seat>" to pick
+a seat, see InferencePolicy.from_checkpoint) or, from Python, an AzulAgent or SeatAgent.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from ml.MultiAgentAzulEnv_class import MultiAgentAzulEnv
+from ml.DQN_class import DQN
+from ml.RandomAgent_class import RandomAgent
+from ml.MultiSeatAgent_class import MultiSeatAgent, SeatAgent
+from ml.InferencePolicy_class import InferencePolicy, checkpoint_path
+from helper_functions.helper_functions import encode_board_state, load_game_settings
+
+ELO_BASE = 1500.0
+
+_worker = {}  # Per-process agents and environment, built once by init_worker
+
+
+def agent_spec(agent):
+    """
+    Picklable description of an agent, sent to the worker processes.
+    """
+    if isinstance(agent, str):
+        if agent == "random":
+            return {"name": "random", "kind": "random"}
+        path, seat = checkpoint_path(agent)
+        name = os.path.basename(os.path.normpath(agent.rsplit("#", 1)[0]))
+        if name == "agents.pt":
+            name = os.path.basename(os.path.dirname(path))
+        name = os.path.splitext(name)[0] + (f"#{seat}" if seat is not None else "")
+        return {"name": name, "kind": "checkpoint", "path": path, "seat": seat}
+    if isinstance(agent, RandomAgent):
+        return {"name": "random", "kind": "random"}
+    if isinstance(agent, SeatAgent):
+        state_dict = agent.parent.q_network.seat_state_dict(agent.seat)
+        return {"name": f"{type(agent.parent).__name__}#{agent.seat}", "kind": "state_dict", "state_dict": state_dict}
+    if isinstance(agent, MultiSeatAgent):
+        raise ValueError("A MultiSeatAgent plays every seat; pass one of its seat_agents() to the arena.")
+    if hasattr(agent, "q_network"):
+        state_dict = {key: value.detach().cpu() for key, value in agent.q_network.state_dict().items()}
+        return {"name": type(agent).__name__, "kind": "state_dict", "state_dict": state_dict}
+    raise ValueError(f"Unsupported arena agent: {agent!r}")
+
+
+def build_agent(spec, input_dim, action_dim, quantize=False):
+    """
+    Greedy (epsilon 0) agent from an agent spec; networks play through an InferencePolicy.
+    """
+    if spec["kind"] == "random":
+        return RandomAgent()
+
+    if spec["kind"] == "checkpoint":
+        return InferencePolicy.from_checkpoint(spec["path"], input_dim, action_dim, seat=spec["seat"],
+                                               quantize=quantize, max_batch_size=1)
+
+    q_network = DQN(input_dim, action_dim)
+    q_network.load_state_dict(spec["state_dict"])
+    return InferencePolicy(q_network, quantize=quantize, max_batch_size=1)
+
+
+def init_worker(specs, num_players, quantize=False):
+    """
+    Process pool initializer: build the environment and every agent once per process.
+    """
+    torch.set_num_threads(1)  # One game per core; intra-op threads would oversubscribe
+
+    env = MultiAgentAzulEnv(num_players=num_players)
+    input_dim = len(encode_board_state(env.game_state))
+    action_dim = env.game_state.get_action_space_mapper().total_actions
+    _worker["env"] = env
+    _worker["agents"] = [build_agent(spec, input_dim, action_dim, quantize) for spec in specs]
+
+
+def play_arena_game(task):
+    """
+    Play one game without learning. task is (seating, seed), where seating[seat] is the
+    index of the agent in that seat. Returns (seating, final scores).
+    """
+    seating, seed = task
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    torch.manual_seed(seed)
+
+    agents = _worker["agents"]
+    seat_agents = [agents[agent_idx] for agent_idx in seating]
+    for seat, agent in enumerate(seat_agents):
+        if isinstance(agent, RandomAgent):
+            agent.rng.seed(seed * len(seating) + seat)
+
+    env = _worker["env"]
+    env.set_agents(seat_agents)
+    env.play_game(learn=False, seed=seed)
+    return seating, [board["score"] for board in env.game_state.player_boards]
+
+
+def arena_schedule(num_agents, num_players, games_per_seating, seed):
+    """
+    Every lineup of agents, each in every seat rotation, `games_per_seating` times.
+    With fewer agents than seats, lineups repeat agents cyclically.
+    """
+    if num_agents >= num_players:
+        lineups = list(itertools.combinations(range(num_agents), num_players))
+    else:
+        lineups = [tuple((first + seat) % num_agents for seat in range(num_players)) for first in range(num_agents)]
+
+    tasks = []
+    for lineup in lineups:
+        for rotation in range(num_players):
+            seating = lineup[rotation:] + lineup[:rotation]
+            for _ in range(games_per_seating):
+                tasks.append((seating, seed + len(tasks)))
+    return tasks
+
+
+def pairwise_results(games, num_agents):
+    """
+    Points (1 win, 0.5 draw) and game counts between every pair of agents, counting each
+    game of several agents as one match per pair of seated agents.
+    """
+    points = np.zeros((num_agents, num_agents))
+    counts = np.zeros((num_agents, num_agents))
+    for seating, scores in games:
+        for seat_a, seat_b in itertools.combinations(range(len(seating)), 2):
+            agent_a, agent_b = seating[seat_a], seating[seat_b]
+            if agent_a == agent_b:
+                continue
+            result = 0.5 if scores[seat_a] == scores[seat_b] else float(scores[seat_a] > scores[seat_b])
+            points[agent_a, agent_b] += result
+            points[agent_b, agent_a] += 1.0 - result
+            counts[agent_a, agent_b] += 1
+            counts[agent_b, agent_a] += 1
+    return points, counts
+
+
+def fit_elo(points, counts, prior_games=1.0, iterations=200):
+    """
+    Maximum-likelihood Bradley-Terry ratings on the Elo scale (mean ELO_BASE).
+    `prior_games` virtual draws against every other agent keep the ratings of agents
+    that won or lost every game finite.
+    """
+    num_agents = len(points)
+    off_diagonal = 1.0 - np.eye(num_agents)
+    points = points + 0.5 * prior_games * off_diagonal
+    counts = counts + prior_games * off_diagonal
+
+    strengths = np.ones(num_agents)
+    for _ in range(iterations):
+        denominators = (counts / (strengths[:, None] + strengths[None, :])).sum(axis=1)
+        strengths = points.sum(axis=1) / denominators
+        strengths /= np.exp(np.log(strengths).mean())
+
+    return ELO_BASE + 400.0 * np.log10(strengths)
+
+
+def summarize(games, names, bootstrap_samples=1000, confidence=0.95, seed=0):
+    """
+    Per-agent games played, win rate (ties split between the tied winners), score
+    distribution and Elo with a bootstrap confidence interval (games resampled with
+    replacement).
+    """
+    num_agents = len(names)
+    wins = np.zeros(num_agents)
+    played = np.zeros(num_agents)
+    scores = [[] for _ in range(num_agents)]
+    for seating, game_scores in games:
+        best = max(game_scores)
+        winners = [agent_idx for agent_idx, score in zip(seating, game_scores) if score == best]
+        for agent_idx, score in zip(seating, game_scores):
+            played[agent_idx] += 1
+            scores[agent_idx].append(score)
+        for agent_idx in winners:
+            wins[agent_idx] += 1.0 / len(winners)
+
+    elo = fit_elo(*pairwise_results(games, num_agents))
+    rng = np.random.default_rng(seed)
+    bootstrap = np.empty((bootstrap_samples, num_agents))
+    for sample in range(bootstrap_samples):
+        resampled = [games[i] for i in rng.integers(0, len(games), size=len(games))]
+        bootstrap[sample] = fit_elo(*pairwise_results(resampled, num_agents))
+    tail = (1.0 - confidence) / 2 * 100
+    elo_low, elo_high = np.percentile(bootstrap, [tail, 100 - tail], axis=0)
+
+    summary = []
+    for agent_idx, name in enumerate(names):
+        agent_scores = np.array(scores[agent_idx], dtype=float)
+        summary.append({
+            "name": name,
+            "games": int(played[agent_idx]),
+            "win_rate": float(wins[agent_idx] / played[agent_idx]) if played[agent_idx] else 0.0,
+            "score_mean": float(agent_scores.mean()) if len(agent_scores) else 0.0,
+            "score_std": float(agent_scores.std()) if len(agent_scores) else 0.0,
+            "score_percentiles": {
+                str(q): float(np.percentile(agent_scores, q)) if len(agent_scores) else 0.0
+                for q in (0, 25, 50, 75, 100)
+            },
+            "elo": float(elo[agent_idx]),
+            "elo_ci": [float(elo_low[agent_idx]), float(elo_high[agent_idx])],
+        })
+    return summary
+
+
+def print_summary(summary, confidence=0.95):
+    print(f"\n{'agent':<24}{'games':>7}{'win rate':>10}{'score':>14}{'median':>8}{'elo':>8}"
+          f"{f'{confidence:.0%} CI':>16}")
+    for row in sorted(summary, key=lambda row: -row["elo"]):
+        score = f"{row['score_mean']:.1f} ± {row['score_std']:.1f}"
+        ci = f"[{row['elo_ci'][0]:.0f}, {row['elo_ci'][1]:.0f}]"
+        print(f"{row['name']:<24}{row['games']:>7}{row['win_rate']:>10.1%}{score:>14}"
+              f"{row['score_percentiles']['50']:>8.1f}{row['elo']:>8.0f}{ci:>16}")
+
+
+def run_arena(agents, games_per_seating=10, num_workers=None, seed=0, bootstrap_samples=1000, confidence=0.95,
+              quantize=False):
+    """
+    Play a tournament between `agents` and return its summary (see summarize).
+
+    agents: "random", checkpoint paths, AzulAgent or SeatAgent objects; at least two.
+    games_per_seating: Games per lineup and seat rotation.
+    num_workers: Processes in the pool (default: one per CPU core).
+    quantize: Play the networks with int8-quantized Linear layers (see InferencePolicy).
+    """
+    if len(agents) < 2:
+        raise ValueError("The arena needs at least two agents.")
+    specs = [agent_spec(agent) for agent in agents]
+    names = [spec["name"] for spec in specs]
+    for name in set(names):  # Keep names unique in the report
+        duplicates = [idx for idx, other in enumerate(names) if other == name]
+        if len(duplicates) > 1:
+            for number, idx in enumerate(duplicates):
+                names[idx] = f"{name}#{number}"
+
+    num_players = load_game_settings()["num_players"]
+    num_workers = num_workers or os.cpu_count()
+    tasks = arena_schedule(len(specs), num_players, games_per_seating, seed)
+
+    print(f"Playing {len(tasks)} games between {len(specs)} agents on {num_workers} processes...")
+    start = time.time()
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(specs, num_players, quantize)
+    ) as executor:
+        chunksize = max(1, len(tasks) // (num_workers * 4))
+        games = list(executor.map(play_arena_game, tasks, chunksize=chunksize))
+    elapsed = time.time() - start
+    print(f"{len(games)} games in {elapsed:.1f}s ({len(games) / elapsed:.1f} games/s).")
+
+    summary = summarize(games, names, bootstrap_samples=bootstrap_samples, confidence=confidence, seed=seed)
+    print_summary(summary, confidence)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a tournament between Azul agents.")
+    parser.add_argument("agents", nargs="+", help='"random" or checkpoint paths (path#seat for Checkpointer output).')
+    parser.add_argument("--games", type=int, default=10, help="Games per lineup and seat rotation.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bootstrap", type=int, default=1000, help="Bootstrap samples for the Elo intervals.")
+    parser.add_argument("--quantize", action="store_true", help="Play networks with int8 Linear layers.")
+    parser.add_argument("--output", help="Write the summary as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    summary = run_arena(args.agents, args.games, args.workers, args.seed, args.bootstrap, quantize=args.quantize)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
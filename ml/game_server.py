@@ -0,0 +1,489 @@
+"""
+Game server: hosts many concurrent Azul games in one process behind an asyncio socket
+front end, with a DQN playing the bot seats.
+
+    python -m ml.game_server serve --checkpoint checkpoints/agent.pt --port 8765
+    python -m ml.game_server loadtest --games 1000 --concurrency 300
+
+Every pending "choose an action" request of every live game goes to one InferenceBatcher,
+which runs them through the network as a single batch once `max_batch_size` requests are
+waiting or the oldest has waited `max_delay` seconds, whichever comes first.
+
+The protocol is newline-delimited JSON. Requests carry an "op" and an optional "id",
+which the response echoes; requests of one connection are handled concurrently, so
+clients may pipeline them.
+
+    {"op": "new_game", "seed": 7, "client_seats": [0]}   Start a game; the server plays the
+                                                         other seats (no client seats: the
+                                                         server plays the whole game)
+    {"op": "move", "game": 3, "action": 42}              Play an action index (see
+                                                         ActionSpaceMapper) for the client
+    {"op": "close", "game": 3}                           Forget a game
+    {"op": "stats"}                                      Games and batching statistics
+
+new_game and move answer once a client seat is to move or the game is over, with the
+game's "state": current player, legal action indices, scores, round, whether the game is
+over and the bot moves played since the client's last move. Errors are answered as
+{"id": ..., "error": message}.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from game.GameState_class import GameState
+from ml.MultiAgentAzulEnv_class import MultiAgentAzulEnv
+from ml.DQN_class import DQN
+from ml.InferencePolicy_class import InferencePolicy
+from helper_functions.helper_functions import encode_board_state, load_game_settings
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+STREAM_LIMIT = 2 ** 20  # Longest request line, in bytes
+
+
+class InferenceBatcher:
+    def __init__(self, policy, max_batch_size=256, max_delay=0.002):
+        """
+        Collects action requests from any number of coroutines and answers them with one
+        masked, greedy network call per batch. Batches run on a single worker thread so
+        the event loop keeps reading requests (and filling the next batch) meanwhile.
+
+        policy: InferencePolicy; its max_batch_size should be at least max_batch_size.
+        max_delay: Longest time, in seconds, a request waits for its batch to fill.
+        """
+        self.policy = policy
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.pending = []  # (observation, valid action mask, future)
+        self.first_arrival = None
+        self.arrived = asyncio.Event()
+        self.full = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.task = None
+        self.batches = 0
+        self.requests = 0
+        self.inference_seconds = 0.0
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        for _, _, future in self.pending:
+            future.cancel()
+        self.pending = []
+        self.executor.shutdown(wait=True)
+
+    async def choose(self, observation, valid_action_mask):
+        """
+        Greedy legal action index for one encoded state.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if not self.pending:
+            self.first_arrival = time.perf_counter()
+            self.arrived.set()
+        self.pending.append((observation, valid_action_mask, future))
+        if len(self.pending) >= self.max_batch_size:
+            self.full.set()
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.arrived.wait()
+            remaining = self.first_arrival + self.max_delay - time.perf_counter()
+            if len(self.pending) < self.max_batch_size and remaining > 0:
+                try:
+                    await asyncio.wait_for(self.full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+            self.full.clear()
+            if self.pending:
+                self.first_arrival = time.perf_counter()  # Leftovers start the next batch's deadline
+                if len(self.pending) >= self.max_batch_size:
+                    self.full.set()
+            else:
+                self.arrived.clear()
+
+            observations = np.stack([observation for observation, _, _ in batch])
+            masks = np.stack([mask for _, mask, _ in batch])
+            start = time.perf_counter()
+            try:
+                actions = await loop.run_in_executor(self.executor, self.policy.select_action_indices, observations, masks)
+            except Exception as error:  # Fail the waiting games, keep serving
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.inference_seconds += time.perf_counter() - start
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, _, future), action_index in zip(batch, actions.tolist()):
+                if not future.done():  # The requesting game may have been closed
+                    future.set_result(action_index)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "inference_ms_per_batch": 1000 * self.inference_seconds / self.batches if self.batches else 0.0,
+        }
+
+
+class GameSession:
+    def __init__(self, game_id, num_players, client_seats, seed=None):
+        """
+        One hosted game: a MultiAgentAzulEnv (GameState, legal action mask and incremental
+        observation) and the seats its client plays.
+        """
+        self.game_id = game_id
+        self.env = MultiAgentAzulEnv(num_players, incremental_observation=True)
+        self.env.reset(seed)
+        self.mapper = self.env.game_state.action_space_mapper
+        self.client_seats = set(client_seats)
+        self.lock = asyncio.Lock()  # One request per game at a time
+        self.bot_moves = []
+
+    def is_over(self):
+        return self.env.game_state.is_game_over()
+
+    def play(self, action_index):
+        """
+        Play a legal action index for the player to move.
+        """
+        player_idx = self.env.current_player
+        valid_action_mask = self.env.get_valid_action_mask(player_idx)
+        if not 0 <= action_index < len(valid_action_mask) or not valid_action_mask[action_index]:
+            raise ValueError(f"Action {action_index} is not legal for player {player_idx}.")
+        self.env.step(self.mapper.index_to_action(action_index))
+        self.env.current_player = (player_idx + 1) % self.env.num_players
+
+    async def play_bots(self, batcher):
+        """
+        Let the network move until a client seat is to move or the game is over.
+        """
+        while not self.is_over() and self.env.current_player not in self.client_seats:
+            player_idx = self.env.current_player
+            action_index = await batcher.choose(self.env.get_state(), self.env.get_valid_action_mask(player_idx))
+            self.play(action_index)
+            self.bot_moves.append([player_idx, action_index])
+
+    def state(self):
+        player_idx = self.env.current_player
+        over = self.is_over()
+        bot_moves, self.bot_moves = self.bot_moves, []
+        return {
+            "game": self.game_id,
+            "current_player": player_idx,
+            "legal_actions": [] if over else np.flatnonzero(self.env.get_valid_action_mask(player_idx)).tolist(),
+            "scores": [board["score"] for board in self.env.game_state.player_boards],
+            "round": self.env.game_state.round_number,
+            "game_over": over,
+            "bot_moves": bot_moves,
+        }
+
+
+class GameServer:
+    def __init__(self, policy, num_players=None, max_batch_size=256, max_delay=0.002, max_games=10_000):
+        """
+        Hosts games for any number of connections and plays their bot seats with `policy`
+        (an InferencePolicy) through one InferenceBatcher.
+
+        max_games: Live games at most; new_game fails beyond it until games are closed.
+        """
+        self.num_players = num_players or load_game_settings()["num_players"]
+        self.batcher = InferenceBatcher(policy, max_batch_size, max_delay)
+        self.max_games = max_games
+        self.games = {}
+        self.game_ids = itertools.count(1)
+        self.games_started = 0
+        self.games_finished = 0
+        self.server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """
+        Listen on a Unix socket at `path`, or else on host:port (port 0 picks a free one).
+        Returns the listening address.
+        """
+        self.batcher.start()
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path, limit=STREAM_LIMIT)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port, limit=STREAM_LIMIT)
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def respond(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Requests must be JSON objects.")
+            request_id = request.get("id")
+            response = await self.handle(request)
+        except (ValueError, KeyError, TypeError) as error:
+            response = {"error": str(error)}
+        response["id"] = request_id
+        if not writer.is_closing():
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+    async def handle(self, request):
+        op = request.get("op")
+        if op == "new_game":
+            return await self.new_game(request.get("seed"), request.get("client_seats", [0]))
+        if op == "move":
+            return await self.move(self.session(request["game"]), int(request["action"]))
+        if op == "close":
+            self.games.pop(self.session(request["game"]).game_id)
+            return {"closed": request["game"]}
+        if op == "stats":
+            return self.stats()
+        raise ValueError(f"Unknown op {op!r}.")
+
+    def session(self, game_id):
+        if game_id not in self.games:
+            raise ValueError(f"Unknown game {game_id!r}.")
+        return self.games[game_id]
+
+    async def new_game(self, seed, client_seats):
+        if len(self.games) >= self.max_games:
+            raise ValueError(f"The server is full ({self.max_games} live games).")
+        if any(seat not in range(self.num_players) for seat in client_seats):
+            raise ValueError(f"Client seats must be in 0..{self.num_players - 1}, got {client_seats}.")
+        session = GameSession(next(self.game_ids), self.num_players, client_seats, seed)
+        self.games[session.game_id] = session
+        self.games_started += 1
+        async with session.lock:
+            await session.play_bots(self.batcher)
+            return self.finish_turn(session)
+
+    async def move(self, session, action_index):
+        async with session.lock:
+            if session.is_over():
+                raise ValueError(f"Game {session.game_id} is over.")
+            if session.env.current_player not in session.client_seats:
+                raise ValueError(f"It is not a client seat's turn in game {session.game_id}.")
+            session.play(action_index)
+            await session.play_bots(self.batcher)
+            return self.finish_turn(session)
+
+    def finish_turn(self, session):
+        state = session.state()
+        if state["game_over"] and self.games.pop(session.game_id, None) is not None:
+            self.games_finished += 1  # Finished games are forgotten once reported
+        return {"state": state}
+
+    def stats(self):
+        return {
+            "live_games": len(self.games),
+            "games_started": self.games_started,
+            "games_finished": self.games_finished,
+            **self.batcher.stats(),
+        }
+
+
+def build_policy(checkpoint=None, quantize=False, max_batch_size=256, seed=0):
+    """
+    Greedy InferencePolicy for the bot seats: a trained checkpoint (see
+    InferencePolicy.from_checkpoint) or, without one, a freshly initialized DQN.
+    """
+    game_state = GameState()
+    input_dim = len(encode_board_state(game_state))
+    action_dim = game_state.get_action_space_mapper().total_actions
+    if checkpoint:
+        return InferencePolicy.from_checkpoint(checkpoint, input_dim, action_dim, quantize=quantize,
+                                               max_batch_size=max_batch_size)
+    torch.manual_seed(seed)
+    return InferencePolicy(DQN(input_dim, action_dim), quantize=quantize, max_batch_size=max_batch_size)
+
+
+async def open_connection(host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+    if path is not None:
+        return await asyncio.open_unix_connection(path, limit=STREAM_LIMIT)
+    return await asyncio.open_connection(host, port, limit=STREAM_LIMIT)
+
+
+async def request(reader, writer, message):
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response
+
+
+async def load_test_client(address, game_seeds, latencies, rng):
+    """
+    Play the given games one after another over one connection, as seat 0 with random
+    legal moves, recording the round-trip time of every request.
+    """
+    reader, writer = await open_connection(*address)
+    try:
+        for seed in game_seeds:
+            start = time.perf_counter()
+            state = (await request(reader, writer, {"op": "new_game", "seed": seed, "client_seats": [0]}))["state"]
+            latencies.append(time.perf_counter() - start)
+            while not state["game_over"]:
+                message = {"op": "move", "game": state["game"], "action": rng.choice(state["legal_actions"])}
+                start = time.perf_counter()
+                state = (await request(reader, writer, message))["state"]
+                latencies.append(time.perf_counter() - start)
+        return await request(reader, writer, {"op": "stats"})
+    finally:
+        writer.close()
+
+
+async def load_test(address, num_games=1000, concurrency=200, seed=0):
+    """
+    Play `num_games` games on a running server from `concurrency` concurrent connections
+    and report throughput, request latency percentiles and the server's batching.
+    """
+    latencies = []
+    rng = random.Random(seed)
+    seeds = [seed + game for game in range(num_games)]
+    start = time.perf_counter()
+    stats = await asyncio.gather(*[
+        load_test_client(address, seeds[client::concurrency], latencies, random.Random(rng.getrandbits(64)))
+        for client in range(min(concurrency, num_games))
+    ])
+    seconds = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "games": num_games,
+        "concurrency": concurrency,
+        "seconds": seconds,
+        "games_per_s": num_games / seconds,
+        "requests_per_s": len(latencies) / seconds,
+        "latency_ms": {
+            "mean": float(latencies_ms.mean()),
+            **{f"p{q}": float(np.percentile(latencies_ms, q)) for q in (50, 90, 99, 99.9)},
+            "max": float(latencies_ms.max()),
+        },
+        "server": max(stats, key=lambda row: row["requests"]),  # The last snapshot to be taken
+    }
+
+
+def print_load_test(report):
+    latency = report["latency_ms"]
+    server = report["server"]
+    print(f"{report['games']} games from {report['concurrency']} clients in {report['seconds']:.2f}s: "
+          f"{report['games_per_s']:.1f} games/s, {report['requests_per_s']:.0f} requests/s")
+    print(f"latency ms: mean {latency['mean']:.2f}  p50 {latency['p50']:.2f}  p90 {latency['p90']:.2f}  "
+          f"p99 {latency['p99']:.2f}  p99.9 {latency['p99.9']:.2f}  max {latency['max']:.2f}")
+    print(f"server: {server['batches']} batches, {server['mean_batch_size']:.1f} requests per batch, "
+          f"{server['inference_ms_per_batch']:.2f} ms inference per batch")
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--checkpoint", help="DQN checkpoint for the bot seats (default: untrained network).")
+    parser.add_argument("--quantize", action="store_true", help="Play with int8 Linear layers.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="Listen on (or connect to) this Unix socket path instead of TCP.")
+    parser.add_argument("--max-batch", type=int, default=256, help="Requests per network call at most.")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0, help="Longest wait for a batch to fill.")
+
+
+async def serve(args):
+    policy = build_policy(args.checkpoint, args.quantize, args.max_batch)
+    server = GameServer(policy, max_batch_size=args.max_batch, max_delay=args.max_delay_ms / 1000)
+    address = await server.start(args.host, args.port, args.unix)
+    print(f"Serving Azul games on {address}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+async def run_load_test(args):
+    """
+    Load test a server at --host/--port (or --unix), or with --spawn one started in this
+    process on a free port.
+    """
+    server = None
+    address = (args.host, args.port, args.unix)
+    if args.spawn:
+        policy = build_policy(args.checkpoint, args.quantize, args.max_batch)
+        server = GameServer(policy, max_batch_size=args.max_batch, max_delay=args.max_delay_ms / 1000,
+                            max_games=max(10_000, args.concurrency))
+        host, port = (await server.start(args.host, 0))[:2]
+        address = (host, port, None)
+    try:
+        report = await load_test(address, args.games, args.concurrency, args.seed)
+    finally:
+        if server is not None:
+            await server.close()
+    print_load_test(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve concurrent Azul games with a batched DQN bot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the game server.")
+    add_server_arguments(serve_parser)
+
+    load_parser = commands.add_parser("loadtest", help="Measure throughput and latency with many concurrent games.")
+    add_server_arguments(load_parser)
+    load_parser.add_argument("--spawn", action="store_true", help="Start a server in this process to test.")
+    load_parser.add_argument("--games", type=int, default=1000)
+    load_parser.add_argument("--concurrency", type=int, default=200, help="Concurrent client connections.")
+    load_parser.add_argument("--seed", type=int, default=0)
+    load_parser.add_argument("--output", help="Write the report as JSON to this path.")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,43 @@
+import time
 from ml.MultiAgentAzulEnv_class import MultiAgentAzulEnv
 from ml.AzulAgent_class import AzulAgent
+from ml.MultiSeatAgent_class import MultiSeatAgent
+from ml.ReplayBuffer_class import ReplayBuffer
+from ml.PrioritizedReplayBuffer_class import PrioritizedReplayBuffer
+from ml.Checkpointer_class import Checkpointer
 from helper_functions.helper_functions import encode_board_state, load_game_settings
+from helper_functions.Profiler_class import profiler
 
 
-def train_multi_agent(episodes=10):
+def train_multi_agent(episodes=10, replay_capacity=0, batch_size=64, prioritized_replay=False,
+                      stacked_network=False, shared_parameters=False, parallel_games=1, profile=False, trace_path=None,
+                      checkpoint_dir=None, checkpoint_every=0, resume=False, metrics_dir=None, plot_path=None,
+                      report_every=100):
+    """
+    Train one agent per seat through self-play.
+
+    replay_capacity: Size of each agent's replay buffer; 0 (the default) trains on single
+                     transitions.
+    batch_size: Minibatch size of the replay updates.
+    prioritized_replay: Sample replay minibatches by TD-error priority instead of uniformly.
+    stacked_network: Keep all seats in one StackedDQN (MultiSeatAgent) that infers and
+                     trains every seat in a single call. Requires replay.
+    shared_parameters: With stacked_network, share one set of weights between the seats
+                       and distinguish them with a seat embedding.
+    parallel_games: With stacked_network, play this many games in lockstep so that one
+                    forward pass picks the moves of all of them (see
+                    MultiSeatAgent.play_games). Each game counts as an episode.
+    profile: Time the hot-path stages (see Profiler) and print a report after every episode.
+    trace_path: With profile, write a Chrome trace-event JSON of all episodes to this path.
+    checkpoint_dir: Directory of the training checkpoints (see Checkpointer).
+    checkpoint_every: Checkpoint every this many episodes (0 only checkpoints at the end).
+                      Checkpoints are written in the background while training continues.
+    resume: Continue from the latest checkpoint in checkpoint_dir, if there is one.
+    metrics_dir: Directory of a local MLflow file store for the per-episode metrics
+                 (rewards, scores, losses, epsilon, throughput; see MetricsLogger).
+    plot_path: Write an HTML plot of the downsampled episode rewards to this path at the end.
+    report_every: Print a one-line summary every this many episodes.
+    """
     # Load the game settings from the YAML configuration file
     print("Loading game settings...")
     settings = load_game_settings()
@@ -16,8 +50,19 @@ def train_multi_agent(episodes=10):
     print(f"Game Settings Loaded: {settings}")
     print(f"Initializing environment with {num_players} players...")
     
+    stacked = stacked_network or shared_parameters
+    if parallel_games < 1:
+        raise ValueError("parallel_games must be at least 1.")
+    if stacked and replay_capacity <= 0:
+        raise ValueError("stacked_network trains from replay buffers, set a positive replay_capacity.")
+    if prioritized_replay and replay_capacity <= 0:
+        raise ValueError("prioritized_replay needs a positive replay_capacity.")
+    if parallel_games > 1 and not stacked:
+        raise ValueError("parallel_games requires stacked_network (or shared_parameters).")
+
     # Initialize the MultiAgentAzulEnv with the specified number of players
-    env = MultiAgentAzulEnv(num_players=num_players)
+    envs = [MultiAgentAzulEnv(num_players=num_players) for _ in range(parallel_games)]
+    env = envs[0]
 
     # Encode the board state to determine input dimension
     print("Encoding board state to determine input dimension...")
@@ -33,20 +78,131 @@ def train_multi_agent(episodes=10):
 
     # Initialize agents for each player based on the game settings
     print(f"Initializing {num_players} agents...")
-    agents = [
-        AzulAgent(input_dim=input_dim, action_dim=action_dim) for _ in range(num_players)
-    ]
+    if stacked:
+        multi_seat_agent = MultiSeatAgent(
+            num_seats=num_players,
+            input_dim=input_dim,
+            action_dim=action_dim,
+            shared_parameters=shared_parameters,
+            replay_capacity=replay_capacity,
+            prioritized_replay=prioritized_replay,
+            batch_size=batch_size
+        )
+        agents = multi_seat_agent.seat_agents()
+    else:
+        replay_buffer_class = PrioritizedReplayBuffer if prioritized_replay else ReplayBuffer
+        agents = [
+            AzulAgent(
+                input_dim=input_dim,
+                action_dim=action_dim,
+                replay_buffer=replay_buffer_class(replay_capacity, input_dim, action_dim) if replay_capacity else None,
+                batch_size=batch_size
+            )
+            for _ in range(num_players)
+        ]
     env.set_agents(agents)
     print("Agents initialized and assigned to the environment.")
 
+    if stacked:
+        learners, buffers = [multi_seat_agent], multi_seat_agent.replay_buffers
+    else:
+        learners, buffers = agents, [agent.replay_buffer for agent in agents if agent.replay_buffer is not None]
+
+    start_episode = 0
+    checkpointer = None
+    if checkpoint_dir is not None:
+        checkpointer = Checkpointer(checkpoint_dir)
+        if resume:
+            training_state = checkpointer.load(learners, buffers)
+            if training_state is not None:
+                start_episode = training_state["step"]
+                print(f"Resuming after episode {start_episode}.")
+    elif resume:
+        raise ValueError("resume requires a checkpoint_dir.")
+
+    metrics = None
+    if metrics_dir is not None or plot_path is not None:
+        from ml.MetricsLogger_class import MetricsLogger
+
+        params = {
+            "episodes": episodes, "num_players": num_players, "replay_capacity": replay_capacity,
+            "batch_size": batch_size, "prioritized_replay": prioritized_replay,
+            "stacked_network": stacked_network, "shared_parameters": shared_parameters,
+            "parallel_games": parallel_games,
+        }
+        metrics = MetricsLogger(metrics_dir, params=params)
+
+    game_rewards = [[0.0] * num_players for _ in envs]
+
+    def reward_adder(episode_rewards):
+        def add_reward(player_idx, state, action_index, reward, next_state, done, next_valid_mask):
+            episode_rewards[player_idx] += reward
+        return add_reward
+
+    reward_adders = [reward_adder(episode_rewards) for episode_rewards in game_rewards]
+
     # Training loop over the specified number of episodes
-    print(f"Starting training for {episodes} episodes...\n")
-    for episode in range(episodes):
-        print(f"Starting Episode {episode + 1}...")
-
-        # Play one complete game with the agents
-        game_state = env.play_game()
-        print(f"Episode {episode + 1} complete. Game over. Collecting results...")
-        print(f"Final game state: {env.game_state.__str__()}")
+    print(f"Starting training for {episodes - start_episode} episodes...\n")
+    if profile:
+        profiler.reset(clear_trace=True)
+        profiler.enable()
+    report_start, report_episodes = time.perf_counter(), 0
+    episode = start_episode
+    while episode < episodes:
+        num_games = min(parallel_games, episodes - episode)
+        batch_start = time.perf_counter()
+        for episode_rewards in game_rewards[:num_games]:
+            episode_rewards[:] = [0.0] * num_players
+
+        # Play complete games with the agents
+        if parallel_games > 1:
+            multi_seat_agent.play_games(envs[:num_games], on_transitions=reward_adders[:num_games])
+        else:
+            env.play_game(on_transition=reward_adders[0])
+        seconds = (time.perf_counter() - batch_start) / num_games
+
+        losses = [loss for learner in learners for loss in learner.losses]
+        for learner in learners:
+            learner.losses = []
+        for game, (game_env, episode_rewards) in enumerate(zip(envs[:num_games], game_rewards)):
+            episode_end = batch_start + (game + 1) * seconds  # Games of a batch share its time equally
+            scores = [board["score"] for board in game_env.game_state.player_boards]
+            if metrics is not None:
+                episode_metrics = {"moves_per_s": len(game_env.action_history) / seconds, "episode_seconds": seconds}
+                if losses:
+                    episode_metrics["loss"] = sum(losses) / len(losses)
+                for seat, agent in enumerate(agents):
+                    episode_metrics[f"reward_seat{seat}"] = episode_rewards[seat]
+                    episode_metrics[f"score_seat{seat}"] = scores[seat]
+                    episode_metrics[f"epsilon_seat{seat}"] = agent.epsilon
+                episode_metrics["reward"] = sum(episode_rewards) / num_players
+                metrics.log(episode + 1, episode_metrics)
+
+            report_episodes += 1
+            if (episode + 1) % report_every == 0 or episode + 1 == episodes:
+                episodes_per_s = report_episodes / (episode_end - report_start)
+                print(f"Episode {episode + 1}: scores {scores}, {episodes_per_s:.2f} episodes/s")
+                report_start, report_episodes = episode_end, 0
+            if checkpointer is not None and checkpoint_every and (episode + 1) % checkpoint_every == 0:
+                checkpointer.save(episode + 1, learners, buffers)
+            episode += 1
+        if profile:
+            profiler.print_report(f"Episode {episode} profile")
+            profiler.reset()
+
+    if profile:
+        profiler.disable()
+        if trace_path is not None:
+            profiler.export_chrome_trace(trace_path)
+
+    if checkpointer is not None:
+        if start_episode < episodes and not (checkpoint_every and episodes % checkpoint_every == 0):
+            checkpointer.save(episodes, learners, buffers, blocking=True)
+        checkpointer.close()
+
+    if metrics is not None:
+        metrics.close()
+        if plot_path is not None and "reward" in metrics.metric_names():
+            metrics.plot("reward", plot_path)
 
     print(f"\nTraining complete. {episodes} episodes finished.")
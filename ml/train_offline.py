@@ -0,0 +1,55 @@
+import argparse
+import time
+from ml.AzulAgent_class import AzulAgent
+from ml.Checkpointer_class import Checkpointer
+from ml.TrajectoryStore_class import TrajectoryDataset
+from helper_functions.helper_functions import load_game_settings
+
+
+def train_offline(trajectory_dir, num_updates=10_000, batch_size=64, agents=None, seed=None, report_every=1000):
+    """
+    Train one agent per seat from a trajectory store (see TrajectoryWriter) instead of
+    from live self-play: every update samples a minibatch of that seat's stored
+    transitions. Pass `agents` to train existing agents or other DQN architectures.
+
+    Returns the agents.
+    """
+    dataset = TrajectoryDataset(trajectory_dir, seed=seed)
+    num_players = load_game_settings().get('num_players')
+    print(f"Training offline on {len(dataset)} stored transitions...")
+
+    if agents is None:
+        agents = [AzulAgent(dataset.state_dim, dataset.action_dim, batch_size=batch_size) for _ in range(num_players)]
+
+    start_time = time.time()
+    for update in range(1, num_updates + 1):
+        losses = [agent.update_batch(dataset.sample(batch_size, seat)) for seat, agent in enumerate(agents)]
+        if update % report_every == 0:
+            elapsed = time.time() - start_time
+            print(f"{update} updates ({update / elapsed:.1f}/s), loss per seat "
+                  f"{', '.join(f'{loss:.4f}' for loss in losses)}")
+
+    print(f"Offline training complete: {num_updates} updates in {time.time() - start_time:.1f}s.")
+    return agents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train agents from a stored trajectory directory.")
+    parser.add_argument("trajectory_dir", help="Directory written by a TrajectoryWriter (actor-learner --trajectory-dir).")
+    parser.add_argument("--output", required=True,
+                        help="Write the trained agents as a checkpoint to this directory (see Checkpointer).")
+    parser.add_argument("--updates", type=int, default=10_000, help="Minibatch updates per seat.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Minibatch size.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the minibatch sampling.")
+    parser.add_argument("--report-every", type=int, default=1000, help="Updates between progress lines.")
+    args = parser.parse_args(argv)
+
+    agents = train_offline(args.trajectory_dir, args.updates, args.batch_size, seed=args.seed,
+                           report_every=args.report_every)
+    checkpointer = Checkpointer(args.output)
+    checkpointer.save(args.updates, agents, [], blocking=True)
+    print(f"Agents written to {checkpointer.latest()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import time
+import tracemalloc
+import numpy as np
+import pytest
+import torch
+from ml.AzulAgent_class import AzulAgent
+from ml.MultiSeatAgent_class import MultiSeatAgent
+from ml.Checkpointer_class import Checkpointer
+from ml.InferencePolicy_class import InferencePolicy
+from ml.PrioritizedReplayBuffer_class import PrioritizedReplayBuffer
+
+STATE_DIM, ACTION_DIM = 148, 241
+
+
+def filled_buffer(capacity, count, seed=0):
+    rng = np.random.default_rng(seed)
+    buffer = PrioritizedReplayBuffer(capacity, STATE_DIM, ACTION_DIM, seed=seed)
+    buffer.add_batch(
+        rng.integers(0, 5, (count, STATE_DIM), dtype=np.uint8), rng.integers(1, ACTION_DIM, count),
+        rng.normal(size=count), rng.integers(0, 5, (count, STATE_DIM), dtype=np.uint8), np.zeros(count, dtype=bool)
+    )
+    return buffer
+
+
+def measure_save(directory, capacity):
+    """
+    Seconds and peak bytes allocated by a save() call, without the background write.
+    """
+    buffer = filled_buffer(capacity, capacity)
+    checkpointer = Checkpointer(str(directory))
+    tracemalloc.start()
+    start = time.perf_counter()
+    checkpointer.save(1, [AzulAgent(STATE_DIM, ACTION_DIM)], [buffer])
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    checkpointer.close()
+    return seconds, peak
+
+
+def test_save_cost_does_not_grow_with_buffer_size(tmp_path):
+    measure_save(tmp_path / "warmup", 1_000)  # The first save imports lazily, which tracemalloc makes slow
+    small_seconds, small_peak = measure_save(tmp_path / "small", 1_000)
+    large_seconds, large_peak = measure_save(tmp_path / "large", 200_000)  # About 70 MB of replay arrays
+    assert large_peak - small_peak < 1_000_000
+    assert large_seconds < small_seconds + 0.05
+
+
+def test_checkpoint_holds_the_buffer_as_of_save(tmp_path):
+    buffer = filled_buffer(5_000, 4_000)
+    expected = {name: array.copy() for name, array in buffer.arrays().items()}
+    expected_state = buffer.state_dict()
+
+    checkpointer = Checkpointer(str(tmp_path))
+    checkpointer.save(1, [AzulAgent(STATE_DIM, ACTION_DIM)], [buffer])
+    rng = np.random.default_rng(1)
+    for _ in range(3_000):  # Overwrite rows, wrapping around, while the checkpoint is written
+        buffer.add(rng.integers(0, 5, STATE_DIM), 7, 1.0, rng.integers(0, 5, STATE_DIM), True)
+    buffer.update_priorities(np.arange(0, 4_000, 3), rng.normal(size=1_334))
+    checkpointer.close()
+
+    restored = PrioritizedReplayBuffer(5_000, STATE_DIM, ACTION_DIM)
+    checkpointer.load([AzulAgent(STATE_DIM, ACTION_DIM)], [restored])
+    assert restored.state_dict() == expected_state
+    for name, array in restored.arrays().items():
+        assert np.array_equal(array, expected[name]), name
+    assert np.isclose(restored.sum_tree.total(), expected["priorities"].sum())
+
+
+@pytest.mark.parametrize("stacked,shared_parameters", [(False, False), (True, False), (True, True)])
+def test_policy_loads_a_seat_of_checkpointer_output(tmp_path, stacked, shared_parameters):
+    if stacked:
+        multi_seat_agent = MultiSeatAgent(3, STATE_DIM, ACTION_DIM, shared_parameters=shared_parameters)
+        agents = [multi_seat_agent]
+        seat_q_values = [lambda x, seat=seat: multi_seat_agent.q_network.forward_seat(x, seat) for seat in range(3)]
+    else:
+        agents = [AzulAgent(STATE_DIM, ACTION_DIM) for _ in range(3)]
+        seat_q_values = [agent.q_network for agent in agents]
+    checkpointer = Checkpointer(str(tmp_path))
+    checkpointer.save(1, agents, [], blocking=True)
+    checkpointer.close()
+
+    states = torch.rand(4, STATE_DIM)
+    for seat in range(3):
+        for path in (f"{tmp_path}#{seat}", f"{checkpointer.latest()}/agents.pt#{seat}"):
+            policy = InferencePolicy.from_checkpoint(path, STATE_DIM, ACTION_DIM)
+            assert torch.allclose(policy.module(states), seat_q_values[seat](states).detach(), atol=1e-5)
+    with pytest.raises(ValueError):
+        InferencePolicy.from_checkpoint(str(tmp_path), STATE_DIM, ACTION_DIM)  # Which seat?
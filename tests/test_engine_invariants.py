@@ -0,0 +1,135 @@
+import copy
+import random
+import numpy as np
+from game.GameState_class import GameState
+from ml.MultiAgentAzulEnv_class import MultiAgentAzulEnv
+from helper_functions.helper_functions import get_valid_actions, encode_board_state, evaluate_board_state
+
+NUM_GAMES = 10
+
+
+def random_playouts(num_games=NUM_GAMES, seed=0):
+    """
+    Seeded random games on an environment with incremental observations; yields the
+    environment before every move, and the random generator choosing the moves.
+    """
+    rng = random.Random(seed)
+    env = MultiAgentAzulEnv(num_players=3, incremental_observation=True)
+    for game in range(num_games):
+        env.reset(seed + game)
+        while not env.game_state.is_game_over():
+            yield env, rng
+            action_index = rng.choice(env.get_valid_action_indices())
+            env.step(env.game_state.action_space_mapper.index_to_action(action_index))
+            env.current_player = (env.current_player + 1) % env.num_players
+
+
+def legal_actions(game_state, player_idx):
+    return [action for action in get_valid_actions(game_state, player_idx) if action is not None]
+
+
+def snapshot(game_state):
+    return (
+        copy.deepcopy(game_state.player_boards), copy.deepcopy(game_state.factories), game_state.center_pool[:],
+        game_state.bag[:], game_state.discard_pile[:], game_state.round_number, game_state.current_player,
+        game_state.rng.getstate(),
+    )
+
+
+def test_zobrist_hash_matches_recompute():
+    for env, _ in random_playouts():
+        assert env.game_state.zobrist_hash == env.game_state.compute_zobrist_hash()
+
+
+def test_zobrist_hash_matches_recompute_after_undo():
+    for env, rng in random_playouts():
+        game_state = env.game_state
+        tokens = []
+        for _ in range(3):  # Undo a line three moves deep, one move at a time
+            if game_state.is_game_over():
+                break
+            action = rng.choice(legal_actions(game_state, game_state.current_player))
+            tokens.append(game_state.apply_action(action, resolve_round=True))
+        for token in reversed(tokens):
+            game_state.undo(token)
+            assert game_state.zobrist_hash == game_state.compute_zobrist_hash()
+        env.action_mask.refresh()  # Search moves bypass the environment's mask
+
+
+def test_undo_restores_the_state_two_moves_deep():
+    for env, rng in random_playouts():
+        game_state = env.game_state
+        before = snapshot(game_state)
+        observation, zobrist_hash = game_state.observation.copy(), game_state.zobrist_hash
+
+        first = game_state.apply_action(rng.choice(legal_actions(game_state, game_state.current_player)),
+                                        resolve_round=True)
+        if not game_state.is_game_over():
+            second = game_state.apply_action(rng.choice(legal_actions(game_state, game_state.current_player)),
+                                             resolve_round=True)
+            assert game_state.zobrist_hash == game_state.compute_zobrist_hash()
+            game_state.undo(second)
+        game_state.undo(first)
+
+        assert snapshot(game_state) == before
+        assert np.array_equal(game_state.observation, observation)
+        assert game_state.zobrist_hash == zobrist_hash
+        env.action_mask.refresh()  # Search moves bypass the environment's mask
+
+
+def full_state(game_state):
+    """
+    Every attribute of the game state except the evaluation caches and their change counters.
+    """
+    state = {
+        name: value if name == "observation_layout" else copy.deepcopy(value)  # The layout is shared and fixed
+        for name, value in vars(game_state).items()
+        if name not in ("evaluation_cache", "board_versions", "wall_versions", "game_over", "observation", "rng")
+    }
+    state["observation"] = game_state.observation.tolist()
+    state["rng"] = game_state.rng.getstate()
+    return state
+
+
+def test_undo_restores_the_exact_state_across_round_ends():
+    rng = random.Random(0)
+    game_state = GameState()
+    game_state.enable_incremental_observation()
+    round_ends = 0
+    for seed in range(3):
+        game_state.reset(seed)
+        while not game_state.is_game_over():
+            before = full_state(game_state)
+            actions = legal_actions(game_state, game_state.current_player)
+            for action in actions:  # Every move from here, including those that end the round
+                token = game_state.apply_action(action, resolve_round=True)
+                if token[-1] is not None:
+                    assert game_state.round_number == before["round_number"] + 1 or game_state.is_game_over()
+                    round_ends += 1
+                game_state.undo(token)
+                assert full_state(game_state) == before
+            game_state.apply_action(rng.choice(actions), resolve_round=True)
+    assert round_ends > 0
+
+
+def test_incremental_mask_matches_valid_actions():
+    for env, _ in random_playouts():
+        mapper = env.game_state.action_space_mapper
+        for player_idx in range(env.num_players):
+            expected = sorted(mapper.action_to_index(action) for action in legal_actions(env.game_state, player_idx))
+            assert np.flatnonzero(env.get_valid_action_mask(player_idx)).tolist() == expected
+
+
+def test_incremental_observation_matches_full_encode():
+    for env, _ in random_playouts():
+        assert np.array_equal(env.game_state.observation, encode_board_state(env.game_state))
+
+
+def test_cached_evaluation_matches_recompute():
+    for env, _ in random_playouts():
+        game_state = env.game_state
+        cached = [evaluate_board_state(game_state, player_idx) for player_idx in range(env.num_players)]
+        for cache in game_state.evaluation_cache:
+            cache["wall_key"] = cache["board_key"] = None
+        game_state.game_over = None
+        assert [evaluate_board_state(game_state, player_idx) for player_idx in range(env.num_players)] == cached
@@ -0,0 +1,24 @@
+import random
+from game.simulate import SimulationEngine
+
+
+def play_random_game(engine, seed):
+    """
+    Seeded random playout; returns the action indices played and the final scores.
+    """
+    engine.reset(seed)
+    rng = random.Random(seed)
+    actions = []
+    player_idx = 0
+    while not engine.is_game_over():
+        action_index = rng.choice(sorted(engine.valid_action_indices(player_idx)))
+        engine.play(player_idx, action_index)
+        actions.append(action_index)
+        player_idx = (player_idx + 1) % engine.num_players
+    return actions, engine.scores()
+
+
+def test_engines_play_the_same_game_from_the_same_seed():
+    bitboard, gamestate = SimulationEngine("bitboard"), SimulationEngine("gamestate")
+    for seed in range(40):
+        assert play_random_game(bitboard, seed) == play_random_game(gamestate, seed), f"seed {seed}"
@@ -0,0 +1,40 @@
+import random
+import pytest
+from game.GameState_class import GameState
+from helper_functions.helper_functions import (
+    get_valid_actions, evaluate_board_state, calculate_positive_attributes, calculate_negative_attributes
+)
+
+
+def uncached_evaluation(game_state, player_idx):
+    """
+    evaluate_board_state computed from the board attributes directly, without the cache.
+    """
+    boards = [
+        calculate_positive_attributes(game_state, other) + calculate_negative_attributes(game_state, other)
+        for other in range(game_state.num_players)
+    ]
+    opponents = sum(board for other, board in enumerate(boards) if other != player_idx)
+    return boards[player_idx] - 0.5 * (1 / game_state.num_players) * opponents
+
+
+def assert_cache_matches(game_state):
+    for player_idx in range(game_state.num_players):
+        assert evaluate_board_state(game_state, player_idx) == pytest.approx(uncached_evaluation(game_state, player_idx))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cached_evaluation_matches_uncached_through_moves_and_undo(seed):
+    rng = random.Random(seed)
+    game_state = GameState()
+    game_state.reset(seed)
+    while not game_state.is_game_over():
+        assert_cache_matches(game_state)
+        actions = [action for action in get_valid_actions(game_state, game_state.current_player) if action is not None]
+        # Look one move ahead and back, as a search does, before playing the real move
+        token = game_state.apply_action(rng.choice(actions), resolve_round=True)
+        assert_cache_matches(game_state)
+        game_state.undo(token)
+        assert_cache_matches(game_state)
+        game_state.apply_action(rng.choice(actions), resolve_round=True)
+    assert_cache_matches(game_state)
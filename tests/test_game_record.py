@@ -0,0 +1,55 @@
+import copy
+import io
+from game.GameState_class import GameState
+from game.GameRecord_class import GameRecord, write_game_records, read_game_records
+from ml.MultiAgentAzulEnv_class import MultiAgentAzulEnv
+from ml.RandomAgent_class import RandomAgent
+
+
+def position(game_state):
+    return (
+        game_state.zobrist_hash, copy.deepcopy(game_state.player_boards), copy.deepcopy(game_state.factories),
+        game_state.center_pool[:], game_state.bag[:], game_state.discard_pile[:], game_state.round_number,
+        game_state.current_player,
+    )
+
+
+class RecordingAgent(RandomAgent):
+    """
+    Random agent that keeps the position before each of the game's moves.
+    """
+    def __init__(self, seed, positions):
+        super().__init__(seed)
+        self.positions = positions
+
+    def select_action_index(self, state, env, player_idx):
+        self.positions.append(position(env.game_state))
+        return super().select_action_index(state, env, player_idx)
+
+
+def play_recorded_games(num_games=5):
+    env = MultiAgentAzulEnv(num_players=3, seed=7)
+    games = []
+    for game in range(num_games):
+        positions = []
+        env.set_agents([RecordingAgent(game * 3 + seat, positions) for seat in range(3)])
+        env.play_game(learn=False)
+        games.append((env.game_record(), positions + [position(env.game_state)]))
+    return games
+
+
+def test_game_record_round_trips_and_replays():
+    games = play_recorded_games()
+    records = [record for record, _ in games]
+
+    file = io.BytesIO()
+    write_game_records(file, records)
+    assert list(read_game_records(file.getvalue())) == records
+    for record in records:
+        assert GameRecord.from_bytes(record.to_bytes()) == (record, len(record.to_bytes()))
+
+    game_state = GameState()
+    for record, positions in games:
+        assert len(positions) == len(record) + 1
+        for num_moves in (0, len(record) // 2, len(record)):
+            assert position(record.replay(game_state, num_moves)) == positions[num_moves]
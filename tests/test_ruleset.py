@@ -0,0 +1,52 @@
+import copy
+import pickle
+import random
+import pytest
+from game.GameState_class import GameState
+from helper_functions.helper_functions import get_valid_actions
+
+
+def legal_actions(game_state):
+    return sorted((action for action in get_valid_actions(game_state, game_state.current_player)
+                   if action is not None), key=str)
+
+
+def mid_game_state(seed=0, moves=30):
+    game_state = GameState()
+    game_state.reset(seed)
+    rng = random.Random(seed)
+    for _ in range(moves):
+        game_state.apply_action(rng.choice(legal_actions(game_state)), resolve_round=True)
+    return game_state
+
+
+def play_out(game_state, seed):
+    rng = random.Random(seed)
+    while not game_state.is_game_over():
+        game_state.apply_action(rng.choice(legal_actions(game_state)), resolve_round=True)
+    return [board["score"] for board in game_state.player_boards], game_state.zobrist_hash
+
+
+@pytest.mark.parametrize("duplicate", [copy.deepcopy, lambda state: pickle.loads(pickle.dumps(state))])
+def test_mid_game_state_copies_and_pickles(duplicate):
+    game_state = mid_game_state()
+    duplicate_state = duplicate(game_state)
+    assert duplicate_state.ruleset is game_state.ruleset  # Still the shared, cached ruleset
+    assert duplicate_state.zobrist_hash == game_state.zobrist_hash == duplicate_state.compute_zobrist_hash()
+    assert play_out(duplicate_state, 1) == play_out(game_state, 1)
+
+
+def test_shared_ruleset_tables_are_read_only():
+    ruleset = GameState().ruleset
+    mutations = [
+        lambda: ruleset.settings["tile_colors"].append("purple"),
+        lambda: ruleset.settings.update(num_players=4),
+        lambda: ruleset.tile_color_mapping.mapping.update(purple=5),
+        lambda: ruleset.action_space_mapper.action_to_index_map.pop(None),
+        lambda: ruleset.action_space_mapper.index_to_action_map.__setitem__(0, ("center", "red", 0)),
+        lambda: ruleset.zobrist_factory[0][0].__setitem__(1, 0),
+        lambda: setattr(ruleset, "num_players", 4),
+    ]
+    for mutate in mutations:
+        with pytest.raises((TypeError, AttributeError)):
+            mutate()
@@ -0,0 +1,16 @@
+import pytest
+import torch
+from ml.StackedDQN_class import StackedDQN
+
+STATE_DIM, ACTION_DIM = 148, 241
+
+
+@pytest.mark.parametrize("shared_parameters", [False, True])
+def test_forward_seats_matches_each_row_on_its_own_seat(shared_parameters):
+    torch.manual_seed(0)
+    network = StackedDQN(4, STATE_DIM, ACTION_DIM, shared_parameters=shared_parameters)
+    states = torch.rand(23, STATE_DIM)
+    for seats in (torch.randint(0, 4, (23,)), torch.tensor([3, 1] * 11 + [3]), torch.full((23,), 2)):
+        with torch.no_grad():
+            expected = torch.cat([network.forward_seat(states[row:row + 1], int(seat)) for row, seat in enumerate(seats)])
+            assert torch.allclose(network.forward_seats(states, seats), expected, atol=1e-5)